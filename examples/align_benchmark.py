@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#benchmark for the pairwise alignment matrices in cogent.align.algorithm
+
+"""Compares the ScoreCell and array-based alignment matrices.
+
+Usage: align_benchmark.py [length [length ...]]
+
+For each length, aligns two random DNA sequences of that length with the
+original (ScoreCell) and array-based Needleman-Wunsch matrices, and reports
+the time per cell and the peak memory of each.
+
+Each run happens in a forked child process, so the peak memory (maximum
+resident set size, from the child's resource usage) belongs to that run
+alone. An empty child is run first to give the baseline for the
+interpreter itself.
+"""
+from old_cogent.align.algorithm import NeedlemanWunschMatrix, \
+    ArrayNeedlemanWunschMatrix
+from random import choice, seed
+from time import time
+from sys import argv, platform
+import os
+
+def random_seq(length, alphabet='ACGT'):
+    """Returns random sequence of the specified length."""
+    return ''.join([choice(alphabet) for i in range(length)])
+
+def run_in_child(f):
+    """Runs f() in a child process: returns (seconds, peak memory in kb)."""
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if not pid:
+        os.close(read_end)
+        start = time()
+        f()
+        os.write(write_end, str(time() - start))
+        os._exit(0)
+    os.close(write_end)
+    elapsed = float(os.read(read_end, 100))
+    os.close(read_end)
+    pid, status, usage = os.wait4(pid, 0)
+    max_rss = usage.ru_maxrss
+    if platform == 'darwin':    #reported in bytes rather than kb
+        max_rss /= 1024
+    return elapsed, max_rss
+
+def benchmark(lengths=(200, 500, 1000)):
+    """Returns lines comparing the alignment matrices at each length."""
+    seed(0)
+    baseline = run_in_child(lambda: None)[1]
+    result = ['%8s %-28s %14s %14s' % ('length', 'matrix', 'us/cell', \
+        'peak kb')]
+    for length in lengths:
+        first, second = random_seq(length), random_seq(length)
+        cells = (length + 1) * (length + 1)
+        for matrix in [NeedlemanWunschMatrix, ArrayNeedlemanWunschMatrix]:
+            elapsed, max_rss = run_in_child( \
+                lambda: matrix(first, second).alignment())
+            result.append('%8s %-28s %14.3f %14s' % (length, \
+                matrix.__name__, elapsed/cells*1e6, max_rss - baseline))
+    return result
+
+if __name__ == '__main__':
+    if len(argv) > 1:
+        print '\n'.join(benchmark(map(int, argv[1:])))
+    else:
+        print '\n'.join(benchmark())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#benchmark for the tree traversals in cogent.base.tree
+
+"""Compares recursive and stack-based traversal of TreeNode trees.
+
+Usage: tree_benchmark.py [tips]
+
+Builds a random binary tree and a caterpillar tree (each internal node has
+one tip and one internal child, as from some taxonomies and from UPGMA on
+ultrametric data), each with the specified number of tips (default
+100000), and reports the time for the preorder, postorder and tips-only
+traversals with the original recursive generator and with the stack-based
+TreeNode.traverse, and for setTipDistances and scaleBranchLengths, which 
+use the traversals. (setDescendantTips and setContainsChildCache store all
+the tips below each node, so take time proportional to the square of the
+number of tips on a caterpillar tree however the nodes are visited.)
+
+The recursive generator passes each node up through every level above it,
+so it takes time proportional to depth for each node, and fails on the
+caterpillar tree once the depth passes the recursion limit.
+"""
+from old_cogent.base.tree import TreeNode, PhyloNode
+from random import random, randrange, seed
+from time import time
+from sys import argv
+
+def recursive_traverse(node, self_before=True, self_after=False):
+    """The original recursive TreeNode.traverse, for comparison."""
+    if node:
+        if self_before:
+            yield node
+        for child in node:
+            for i in recursive_traverse(child, self_before, self_after):
+                yield i
+        if self_after:
+            yield node
+    else:
+        yield node
+
+def random_tree(num_tips):
+    """Returns random binary PhyloNode tree with num_tips tips.
+
+    Joins random pairs of subtrees, so each join is to a new root and
+    doesn't need to check ancestors.
+    """
+    nodes = [PhyloNode(i, BranchLength=random()) for i in range(num_tips)]
+    while len(nodes) > 1:
+        first = nodes.pop(randrange(len(nodes)))
+        second = nodes.pop(randrange(len(nodes)))
+        nodes.append(PhyloNode(Children=[first, second], \
+            BranchLength=random()))
+    return nodes[0]
+
+def caterpillar_tree(num_tips):
+    """Returns caterpillar PhyloNode tree with num_tips tips."""
+    node = PhyloNode(0, BranchLength=random())
+    for i in range(1, num_tips):
+        node = PhyloNode(Children=[node, PhyloNode(i, \
+            BranchLength=random())], BranchLength=random())
+    return node
+
+def time_f(f):
+    """Returns seconds taken by f(), or a note if it failed."""
+    start = time()
+    try:
+        f()
+    except RuntimeError:
+        return 'recursion limit'
+    return '%.3f' % (time() - start)
+
+def benchmark(num_tips=100000):
+    """Returns lines comparing the traversals on trees with num_tips tips."""
+    seed(0)
+    walks = [('preorder', True, False), ('postorder', False, True), \
+        ('tips', False, False)]
+    result = ['%-12s %-24s %16s %16s' % ('tree', 'walk', 'recursive (s)', \
+        'stack (s)')]
+    for name, make_tree in [('random', random_tree), \
+        ('caterpillar', caterpillar_tree)]:
+        tree = make_tree(num_tips)
+        for walk, self_before, self_after in walks:
+            old = time_f(lambda: list(recursive_traverse(tree, self_before, \
+                self_after)))
+            new = time_f(lambda: list(tree.traverse(self_before, self_after)))
+            result.append('%-12s %-24s %16s %16s' % (name, walk, old, new))
+        for method in ['setTipDistances', 'scaleBranchLengths']:
+            result.append('%-12s %-24s %16s %16s' % (name, method, '', \
+                time_f(getattr(tree, method))))
+    return result
+
+if __name__ == '__main__':
+    if len(argv) > 1:
+        print '\n'.join(benchmark(int(argv[1])))
+    else:
+        print '\n'.join(benchmark())
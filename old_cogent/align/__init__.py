@@ -4,4 +4,4 @@
 """Algos for creating alignments
 """
 
-__all__ = []
+__all__ = ['algorithm', 'progressive']
@@ -17,6 +17,16 @@ Python instead of Perl...)
 
 12/22/04 Jeremy Widmann:  Changed ScoreCell's update function.  In case of a tie
 update will pick up, diag, then left rather than diag, up, then left as it previously was."""
+from Numeric import array, zeros, take, maximum, equal, greater, where, \
+    concatenate, argmax, transpose, fromstring, sometrue, ravel, arange, \
+    matrixmultiply, log, alltrue, Int, Float64, UInt8
+from old_cogent.maths.matrix.distance import DistanceMatrix
+from itertools import imap
+from heapq import heappush, heapreplace
+try:
+    from multiprocessing import Pool
+except ImportError:     #before Python 2.6: all_pairs_align uses one process
+    Pool = None
 
 class ScoreCell(object):
     """Cell in a ScoreMatrix object. Contains score and pointer."""
@@ -63,6 +73,109 @@ def MatchScorer(match, mismatch):
             return mismatch
     return scorer
 
+class SubstitutionScorer(object):
+    """Score function that looks up scores in a substitution matrix.
+
+    Can be used as the scorer for any of the alignment functions. The 
+    array-based matrices and nw_score/sw_score also recognize it, and then
+    encode the sequences and build the score table with array lookups 
+    instead of calling it for each symbol and each pair of symbols.
+    """
+
+    def __init__(self, Matrix, Default=None):
+        """Returns new SubstitutionScorer for Matrix.
+
+        Matrix is a 2D dict of scores, {x:{y:score}}, such as the result of
+        SubstitutionMatrixParser, or an AAIndex2Record (whose Data is used).
+        Entries that are missing or None, as in the lower-triangular 
+        AAIndex2 matrices, are taken from the transposed entry.
+
+        Default, if not None, is the score for any pair including a symbol
+        that isn't in the matrix; otherwise such symbols raise KeyError.
+        """
+        if hasattr(Matrix, 'Data'):
+            Matrix = Matrix.Data
+        symbols = {}
+        for x, row in Matrix.items():
+            symbols[x] = True
+            for y in row:
+                symbols[y] = True
+        self.Order = order = sorted(symbols.keys())
+        self.Default = Default
+        if Default is None:
+            missing = 0
+        else:
+            missing = Default
+        scores = []
+        for x in order:
+            row = []
+            for y in order:
+                score = Matrix.get(x, {}).get(y)
+                if score is None:
+                    score = Matrix.get(y, {}).get(x)
+                if score is None:
+                    raise ValueError, "No score for %s and %s" % (x, y)
+                row.append(score)
+            row.append(missing)
+            scores.append(row)
+        scores.append([missing] * (len(order) + 1))
+        #integral float scores, e.g. from AAIndex, are kept as integers so 
+        #the alignment code can use exact integer arithmetic
+        self.Exact = True
+        for row in scores:
+            for score in row:
+                if score != int(score):
+                    self.Exact = False
+        if self.Exact:
+            self.Scores = array(scores, Float64).astype(Int)
+        else:
+            self.Scores = array(scores, Float64)
+        #table[y][x] is the score for x and y, as for score_table
+        self.Table = array(transpose(self.Scores))
+        self._unknown = len(order)
+        self._index = dict([(x, i) for i, x in enumerate(order)])
+        self._lookup = zeros(256, Int) + self._unknown
+        for x, i in self._index.items():
+            if isinstance(x, str) and len(x) == 1:
+                self._lookup[ord(x)] = i
+
+    def __call__(self, x, y):
+        """Returns the score for x and y."""
+        return self.Scores[self._code(x), self._code(y)]
+
+    def _code(self, x):
+        """Returns index of x in Order, checking for unknown symbols."""
+        code = self._index.get(x, self._unknown)
+        if code == self._unknown and self.Default is None:
+            raise KeyError, "Symbol %s is not in substitution matrix" % `x`
+        return code
+
+    def encode(self, seq):
+        """Returns array giving the index in Order of each symbol in seq.
+
+        Symbols not in the matrix get index len(Order), or raise KeyError if
+        there is no Default. Strings are encoded with a single lookup.
+        """
+        if isinstance(seq, str):
+            codes = take(self._lookup, fromstring(seq, UInt8))
+            if self.Default is None and len(codes) and \
+                sometrue(equal(codes, self._unknown)):
+                raise KeyError, "Sequence has symbols not in substitution matrix"
+            return codes
+        return array(map(self._code, seq), Int)
+
+def same_class(orig, aligned):
+    """Returns list of aligned items converted to the class of orig.
+
+    Remember to return sequences that are the correct class. If the class
+    subclasses str, you probably want ''.join rather than str to feed into
+    the constructor, since str() on a list prints the brackets and commas.
+    """
+    if isinstance(orig, str):
+        return orig.__class__(''.join(aligned))
+    else:
+        return orig.__class__(aligned)
+
 equality_scorer = MatchScorer(1, -1)
 default_gap = -1
 default_gap_symbol = '-'
@@ -151,20 +264,7 @@ class ScoreMatrix(list):
             self.fill()
             self.traceback()
             aln1, aln2 = self.FirstAlign, self.SecondAlign
-        #Remember to return sequences that are the correct class. If the class
-        #subclasses str, you probably want ''.join rather than str to feed into
-        #the constructor, since str() on a list prints the brackets and commas.
-        if isinstance(seq1, str):
-            first_result = seq1.__class__(''.join(aln1))
-        else:
-            first_result = seq1.__class__(aln1)
-            
-        if isinstance(seq2, str):
-            second_result = seq2.__class__(''.join(aln2))
-        else:
-            second_result = seq2.__class__(aln2)
-
-        return first_result, second_result
+        return same_class(seq1, aln1), same_class(seq2, aln2)
     
 
 class NeedlemanWunschMatrix(ScoreMatrix):
@@ -323,22 +423,1164 @@ class SmithWatermanMatrix(ScoreMatrix):
         align_2.reverse()
         self.FirstAlign, self.SecondAlign = align_1, align_2
 
-def nw_align(seq1, seq2, scorer=equality_scorer, gap=default_gap, return_score=False):
-    """Returns globally optimal alignment of seq1 and seq2."""
-    N = NeedlemanWunschMatrix(seq1, seq2, scorer, gap)
+#traceback pointers used by the array-based matrices, one byte per cell
+NO_POINTER, UP, DIAG, LEFT = 0, 1, 2, 3
+pointer_names = {NO_POINTER:None, UP:'up', DIAG:'diag', LEFT:'left'}
+
+#flags added to the pointer codes for affine gaps: set where the gap state
+#of a cell continues the gap from the previous cell rather than opening one
+EXTEND_LEFT, EXTEND_UP = 4, 8
+
+#score for gap states that can't be reached (e.g. a vertical gap in the
+#first row): low enough never to be chosen, high enough not to overflow
+unreachable_score = -2**30
+
+#default number of extra diagonals on each side for banded alignment
+default_band = 10
+
+#nw_align switches to linear-space alignment when the pointer matrix would
+#have more cells (i.e. bytes) than this
+linear_space_threshold = 50000000
+
+def encode_symbols(seq):
+    """Returns (symbols, codes) for the items in seq.
+
+    symbols is a list of the distinct items in seq in order of first
+    appearance; codes is a list giving the index in symbols of each item.
+
+    If the items can't be hashed, every position gets its own code.
+    """
+    lookup = {}
+    symbols = []
+    codes = []
+    try:
+        for item in seq:
+            if item not in lookup:
+                lookup[item] = len(symbols)
+                symbols.append(item)
+            codes.append(lookup[item])
+    except TypeError:   #unhashable items: treat each position as distinct
+        symbols = list(seq)
+        codes = range(len(symbols))
+    return symbols, codes
+
+def _is_integer(x):
+    """Returns True if x is an int or long (but not e.g. a float)."""
+    return isinstance(x, (int, long))
+
+def _is_integral(table):
+    """Returns True if every score in the Numeric array table is whole."""
+    scores = ravel(table)
+    return bool(alltrue(equal(scores, scores.astype(Int))))
+
+def score_table(scorer, symbols_1, symbols_2, gap):
+    """Returns (table, exact) for scoring pairs of symbols.
+
+    table[j][i] is scorer(symbols_1[i], symbols_2[j]), as a Numeric array.
+    
+    exact is True if gap and all the scores are integers, in which case the
+    table is an integer array and rows can be filled with running maxima
+    without any rounding differences from the cell-by-cell calculation.
+    Otherwise, the table is a float array.
+    """
+    table = [[scorer(x, y) for x in symbols_1] for y in symbols_2]
+    exact = _is_integer(gap)
+    for row in table:
+        for item in row:
+            if not _is_integer(item):
+                exact = False
+                break
+    if exact:
+        return array(table, Int), True
+    else:
+        return array(table, Float64), False
+
+def encode_pair(first, second, scorer, gap, gap_extend=None):
+    """Returns (codes_1, codes_2, table, exact) for aligning first, second.
+
+    codes_1 is an array of symbol codes for first, codes_2 a list of symbol
+    codes for second, and table and exact are as returned by score_table
+    (exact is also False if gap_extend is given and not an integer).
+
+    If scorer is a SubstitutionScorer, the codes are indices in its Order 
+    and the table is its Table, without calling scorer.
+    """
+    if isinstance(scorer, SubstitutionScorer):
+        codes_1 = scorer.encode(first)
+        codes_2 = scorer.encode(second).tolist()
+        table = scorer.Table
+        exact = scorer.Exact and _is_integer(gap)
+    else:
+        symbols_1, codes_1 = encode_symbols(first)
+        symbols_2, codes_2 = encode_symbols(second)
+        table, exact = score_table(scorer, symbols_1, symbols_2, gap)
+        codes_1 = array(codes_1, Int)
+    if gap_extend is not None and not _is_integer(gap_extend):
+        exact = False
+    return codes_1, codes_2, table, exact
+
+def gap_steps(gap, length, exact):
+    """Returns array of the scores of runs of 0 to length gaps."""
+    if exact and _is_integer(gap):
+        typecode = Int
+    else:
+        typecode = Float64
+    return array([gap * i for i in range(length + 1)], typecode)
+
+def add_left(first, best, steps, exact):
+    """Returns row of scores including moves from the left.
+
+    first is the score in column 0, and best[j-1] is the best score for
+    column j from the diagonal or from above. steps is the result of 
+    gap_steps for the row. The result is the row where 
+    result[j] = max(best[j-1], result[j-1] + gap).
+    
+    If exact, this is a running maximum over the whole row; otherwise it
+    falls back to a loop to keep exactly the same floating-point sums as the
+    cell-by-cell calculation.
+    """
+    if exact:
+        return maximum.accumulate(concatenate(([first], \
+            best - steps[1:]))) + steps
+    gap = steps[1]
+    result = [first]
+    curr = first
+    for b in best.tolist():
+        curr = max(b, gap + curr)
+        result.append(curr)
+    return array(result, Float64)
+
+def _moves(scores, diag, up):
+    """Returns pointer codes for a row, preferring up, then diag, then left."""
+    return where(equal(scores, up), UP, where(equal(scores, diag), DIAG, LEFT))
+
+def nw_last_row(codes_1, codes_2, table, gap, exact):
+    """Returns the last row of global alignment scores, keeping two rows.
+
+    codes_1 (an array) gives the symbol codes along the columns, codes_2 the
+    codes down the rows, and table[code_2][code_1] the pair scores (see
+    score_table). result[j] is the score of the best alignment of all of
+    codes_2 with the first j items of codes_1.
+    """
+    steps = gap_steps(gap, len(codes_1), exact)
+    prev = steps
+    if not len(codes_1):
+        return prev + gap * len(codes_2)
+    for row_i in range(1, len(codes_2) + 1):
+        diag = take(table[codes_2[row_i-1]], codes_1) + prev[:-1]
+        up = prev[1:] + gap
+        prev = add_left(gap * row_i, maximum(diag, up), steps, exact)
+    return prev
+
+def sw_best_score(codes_1, codes_2, table, gap, exact):
+    """Returns the best local alignment score, keeping two rows.
+
+    Parameters are as for nw_last_row.
+    """
+    best_score = 0
+    if not len(codes_1):
+        return best_score
+    steps = gap_steps(gap, len(codes_1), exact)
+    prev = steps * 0
+    for code in codes_2:
+        diag = take(table[code], codes_1) + prev[:-1]
+        up = prev[1:] + gap
+        prev = add_left(0, maximum(maximum(diag, up), 0), steps, exact)
+        row_best = prev[argmax(prev)]
+        if row_best > best_score:
+            best_score = row_best
+    return best_score
+
+def sw_score_antidiagonal(codes_1, codes_2, table, gap, gap_extend, exact):
+    """Returns the best local alignment score, filling by anti-diagonals.
+
+    The cells on each anti-diagonal (where row + column is constant) only
+    depend on the two before it, so each anti-diagonal is filled with a few
+    whole-array operations, with no loop or running maximum along it as 
+    for the left moves in a row. Only three anti-diagonals of scores are 
+    kept.
+
+    Gaps are linear if gap_extend is None, otherwise affine as for 
+    affine_nw_pointers. Other parameters are as for nw_last_row.
+    """
+    if exact:
+        typecode = Int
+    else:
+        typecode = Float64
+    rows, cols = len(codes_2) + 1, len(codes_1) + 1
+    best_score = 0
+    if rows == 1 or cols == 1:
+        return best_score
+    #the pair score for cell (i, j) is flat[row_codes[i-1] + rev_1[cols-1-j]],
+    #which is a contiguous slice of each for the cells on an anti-diagonal
+    flat = ravel(table)
+    row_codes = array(codes_2, Int) * table.shape[1]
+    rev_1 = array(codes_1, Int)[::-1]
+    #scores are indexed by row; cells outside the current anti-diagonal
+    #only ever hold the boundary values (0, or unreachable for the gaps)
+    prev_2 = zeros(rows, typecode)
+    prev_1 = zeros(rows, typecode)
+    left = zeros(rows, typecode) + unreachable_score
+    up = zeros(rows, typecode) + unreachable_score
+    for diagonal in range(2, rows + cols - 1):
+        lo = max(1, diagonal - cols + 1)
+        hi = min(rows - 1, diagonal - 1)
+        scores = take(flat, row_codes[lo-1:hi] + \
+            rev_1[cols-1-diagonal+lo:cols-diagonal+hi])
+        if gap_extend is None:
+            curr = maximum(maximum(prev_2[lo-1:hi] + scores, 0), \
+                maximum(prev_1[lo-1:hi], prev_1[lo:hi+1]) + gap)
+        else:
+            left[lo:hi+1] = maximum(prev_1[lo:hi+1] + gap, \
+                left[lo:hi+1] + gap_extend)
+            up[lo:hi+1] = maximum(prev_1[lo-1:hi] + gap, \
+                up[lo-1:hi] + gap_extend)
+            curr = maximum(maximum(prev_2[lo-1:hi] + scores, 0), \
+                maximum(left[lo:hi+1], up[lo:hi+1]))
+        prev_2[lo:hi+1] = curr
+        prev_2, prev_1 = prev_1, prev_2
+        diagonal_best = curr[argmax(curr)]
+        if diagonal_best > best_score:
+            best_score = diagonal_best
+    return best_score
+
+def nw_pointers(codes_1, codes_2, table, gap, exact):
+    """Returns (pointers, score) for global alignment of codes_1 and codes_2.
+
+    pointers is a (len(codes_2)+1) x (len(codes_1)+1) byte array of
+    traceback pointers. The first row and column are initialized with
+    index * gap penalty as in NeedlemanWunschMatrix. Parameters are as for
+    nw_last_row.
+    """
+    rows, cols = len(codes_2) + 1, len(codes_1) + 1
+    pointers = zeros((rows, cols), UInt8)
+    pointers[0, 1:] = LEFT
+    pointers[1:, 0] = UP
+    if cols == 1:
+        return pointers, gap * (rows - 1)
+    steps = gap_steps(gap, cols - 1, exact)
+    prev = steps
+    for row_i in range(1, rows):
+        diag = take(table[codes_2[row_i-1]], codes_1) + prev[:-1]
+        up = prev[1:] + gap
+        curr = add_left(gap * row_i, maximum(diag, up), steps, exact)
+        pointers[row_i, 1:] = _moves(curr[1:], diag, up).astype(UInt8)
+        prev = curr
+    return pointers, prev[-1]
+
+def sw_pointers(codes_1, codes_2, table, gap, exact):
+    """Returns (pointers, (max_score, max_row, max_col)) for local alignment.
+
+    Cells where no move scores above 0 keep score 0 and no pointer, and the
+    maximum is the first cell (by row, then column) with the highest score,
+    as in SmithWatermanMatrix. Parameters are as for nw_last_row.
+    """
+    rows, cols = len(codes_2) + 1, len(codes_1) + 1
+    pointers = zeros((rows, cols), UInt8)
+    max_score, max_row, max_col = 0, 0, 0
+    if cols == 1:
+        return pointers, (max_score, max_row, max_col)
+    steps = gap_steps(gap, cols - 1, exact)
+    prev = steps * 0
+    for row_i in range(1, rows):
+        diag = take(table[codes_2[row_i-1]], codes_1) + prev[:-1]
+        up = prev[1:] + gap
+        best = maximum(diag, up)
+        curr = add_left(0, maximum(best, 0), steps, exact)
+        scores = curr[1:]
+        left = curr[:-1] + gap
+        pointers[row_i, 1:] = where(greater(maximum(best, left), 0), \
+            _moves(scores, diag, up), NO_POINTER).astype(UInt8)
+        best_col = argmax(scores)
+        if scores[best_col] > max_score:
+            max_score = scores[best_col]
+            max_row = row_i
+            max_col = best_col + 1
+        prev = curr
+    return pointers, (max_score, max_row, max_col)
+
+def affine_left(first, best, gap, gap_extend, exact):
+    """Returns (row, left, extended) including affine gaps from the left.
+
+    first is the score in column 0, and best[j-1] is the best score for
+    column j from the diagonal or from above. left[j-1] is the best score
+    for column j ending in a gap in the first row's sequence, i.e. 
+    left[j-1] = max(row[j-1] + gap, left[j-2] + gap_extend), and 
+    row[j] = max(best[j-1], left[j-1]). extended[j-1] is 1 where left[j-1]
+    continues a gap rather than opening a new one.
+
+    If exact and gap_extend is at least gap (so a new gap never pays to
+    start right after another), left is a running maximum over the row;
+    otherwise it falls back to a loop, as in add_left.
+    """
+    if exact and gap <= gap_extend:
+        steps = array(range(len(best)), Int) * gap_extend
+        opened = concatenate(([first], best[:-1]))
+        left = maximum.accumulate(opened - steps) + steps + gap
+        row = concatenate(([first], maximum(best, left)))
+    else:
+        if exact:
+            typecode = Int
+        else:
+            typecode = Float64
+        row = [first]
+        left = []
+        curr = first
+        curr_left = unreachable_score
+        for b in best.tolist():
+            curr_left = max(curr + gap, curr_left + gap_extend)
+            curr = max(b, curr_left)
+            left.append(curr_left)
+            row.append(curr)
+        row, left = array(row, typecode), array(left, typecode)
+    prev_left = concatenate(([unreachable_score], left[:-1]))
+    return row, left, greater(prev_left + gap_extend, row[:-1] + gap)
+
+def affine_score(codes_1, codes_2, table, gap, gap_extend, exact, \
+    local=False):
+    """Returns the best alignment score with affine gaps, keeping two rows.
+
+    Gives the global alignment score, or the local one if local is True.
+    Parameters are as for affine_nw_pointers.
+    """
+    rows, cols = len(codes_2) + 1, len(codes_1) + 1
+    if exact:
+        typecode = Int
+    else:
+        typecode = Float64
+    if cols == 1:
+        if local or rows == 1:
+            return 0
+        return gap + gap_extend * (rows - 2)
+    if local:
+        prev = zeros(cols, typecode)
+    else:
+        prev = array([0] + [gap + gap_extend * i for i in range(cols - 1)], \
+            typecode)
+    prev_up = zeros(cols - 1, typecode) + unreachable_score
+    best_score = 0
+    for row_i in range(1, rows):
+        diag = take(table[codes_2[row_i-1]], codes_1) + prev[:-1]
+        up = maximum(prev[1:] + gap, prev_up + gap_extend)
+        best = maximum(diag, up)
+        if local:
+            prev = affine_left(0, maximum(best, 0), gap, gap_extend, exact)[0]
+            row_best = prev[argmax(prev)]
+            if row_best > best_score:
+                best_score = row_best
+        else:
+            prev = affine_left(gap + gap_extend * (row_i - 1), best, gap, \
+                gap_extend, exact)[0]
+        prev_up = up
+    if local:
+        return best_score
+    return prev[-1]
+
+def affine_nw_pointers(codes_1, codes_2, table, gap, gap_extend, exact):
+    """Returns (pointers, score) for global alignment with affine gaps.
+
+    A run of n gaps scores gap + (n-1) * gap_extend. Uses Gotoh's three
+    states per cell: the best score, the best ending in a gap in codes_2
+    (a LEFT move) and the best ending in a gap in codes_1 (an UP move).
+    The low two bits of each pointer give the move for the best score, as
+    in nw_pointers, and EXTEND_LEFT and EXTEND_UP are set where the gap
+    states extend a gap from the previous cell. Other parameters are as
+    for nw_last_row.
+    """
+    rows, cols = len(codes_2) + 1, len(codes_1) + 1
+    if exact:
+        typecode = Int
+    else:
+        typecode = Float64
+    pointers = zeros((rows, cols), UInt8)
+    pointers[0, 1:] = LEFT
+    pointers[0, 2:] = LEFT + EXTEND_LEFT
+    pointers[1:, 0] = UP
+    pointers[2:, 0] = UP + EXTEND_UP
+    edge = [0] + [gap + gap_extend * i for i in range(max(rows, cols) - 1)]
+    if cols == 1:
+        return pointers, edge[rows - 1]
+    prev = array(edge[:cols], typecode)
+    prev_up = zeros(cols - 1, typecode) + unreachable_score
+    for row_i in range(1, rows):
+        diag = take(table[codes_2[row_i-1]], codes_1) + prev[:-1]
+        up_opened = prev[1:] + gap
+        up_extended = prev_up + gap_extend
+        up = maximum(up_opened, up_extended)
+        curr, left, left_extended = affine_left(edge[row_i], \
+            maximum(diag, up), gap, gap_extend, exact)
+        pointers[row_i, 1:] = (_moves(curr[1:], diag, up) + \
+            EXTEND_LEFT * left_extended + \
+            EXTEND_UP * greater(up_extended, up_opened)).astype(UInt8)
+        prev, prev_up = curr, up
+    return pointers, prev[-1]
+
+def affine_sw_pointers(codes_1, codes_2, table, gap, gap_extend, exact):
+    """Returns (pointers, (max_score, max_row, max_col)) with affine gaps.
+
+    Local alignment version of affine_nw_pointers: the best score in each
+    cell is at least 0, and cells where no move scores above 0 get no move
+    in the low two bits, as in sw_pointers.
+    """
+    rows, cols = len(codes_2) + 1, len(codes_1) + 1
+    if exact:
+        typecode = Int
+    else:
+        typecode = Float64
+    pointers = zeros((rows, cols), UInt8)
+    max_score, max_row, max_col = 0, 0, 0
+    if cols == 1:
+        return pointers, (max_score, max_row, max_col)
+    prev = zeros(cols, typecode)
+    prev_up = zeros(cols - 1, typecode) + unreachable_score
+    for row_i in range(1, rows):
+        diag = take(table[codes_2[row_i-1]], codes_1) + prev[:-1]
+        up_opened = prev[1:] + gap
+        up_extended = prev_up + gap_extend
+        up = maximum(up_opened, up_extended)
+        best = maximum(diag, up)
+        curr, left, left_extended = affine_left(0, maximum(best, 0), gap, \
+            gap_extend, exact)
+        scores = curr[1:]
+        moves = where(greater(maximum(best, left), 0), \
+            _moves(scores, diag, up), NO_POINTER)
+        pointers[row_i, 1:] = (moves + EXTEND_LEFT * left_extended + \
+            EXTEND_UP * greater(up_extended, up_opened)).astype(UInt8)
+        best_col = argmax(scores)
+        if scores[best_col] > max_score:
+            max_score = scores[best_col]
+            max_row = row_i
+            max_col = best_col + 1
+        prev, prev_up = curr, up
+    return pointers, (max_score, max_row, max_col)
+
+def band_limits(len_1, len_2, band):
+    """Returns (lo, hi), the lowest and highest diagonals j - i in a band.
+
+    The band covers the diagonals from the one through the first cell to 
+    the one through the last cell of the matrix for sequences of length 
+    len_1 (columns) and len_2 (rows), plus band more on each side, clipped
+    to the matrix.
+    """
+    lo = max(min(0, len_1 - len_2) - band, -len_2)
+    hi = min(max(0, len_1 - len_2) + band, len_1)
+    return lo, hi
+
+def banded_nw_pointers(codes_1, codes_2, table, gap, exact, lo, hi):
+    """Returns (pointers, score) for global alignment within a band.
+
+    Only cells (i, j) with lo <= j - i <= hi are filled (see band_limits),
+    so time and memory are proportional to len(codes_2) * (hi - lo + 1).
+    pointers has a row for each row of the full matrix but a column for 
+    each diagonal: the pointer for cell (i, j) is at pointers[i, j - i - lo].
+    Other parameters are as for nw_last_row.
+    """
+    rows, cols = len(codes_2) + 1, len(codes_1) + 1
+    width = hi - lo + 1
+    if exact:
+        typecode = Int
+    else:
+        typecode = Float64
+    pointers = zeros((rows, width), UInt8)
+    steps = gap_steps(gap, width, exact)
+    #scores are kept by diagonal, with an extra unreachable cell at the end
+    #for moves from outside the band
+    prev = zeros(width + 1, typecode) + unreachable_score
+    prev[-lo:hi - lo + 1] = steps[:hi + 1]
+    pointers[0, 1 - lo:hi - lo + 1] = LEFT
+    for row_i in range(1, rows):
+        curr = zeros(width + 1, typecode) + unreachable_score
+        start = row_i + lo      #column of the first diagonal in the band
+        if start <= 0:
+            curr[-start] = gap * row_i
+            pointers[row_i, -start] = UP
+        k_start = max(0, 1 - start)
+        k_end = min(width, cols - start)
+        if k_start >= k_end:
+            prev = curr
+            continue
+        diag = take(table[codes_2[row_i-1]], \
+            codes_1[start + k_start - 1:start + k_end - 1]) + \
+            prev[k_start:k_end]
+        up = prev[k_start + 1:k_end + 1] + gap
+        filled = add_left(curr[k_start - 1], maximum(diag, up), \
+            steps[:k_end - k_start + 1], exact)
+        curr[k_start:k_end] = filled[1:]
+        pointers[row_i, k_start:k_end] = \
+            _moves(filled[1:], diag, up).astype(UInt8)
+        prev = curr
+    return pointers, prev[cols - rows - lo]
+
+def traceback_moves(pointers, row, col):
+    """Returns (moves, row, col) following pointers back from (row, col).
+
+    moves is the list of DIAG, LEFT and UP steps in forward order, and row
+    and col give the cell where the path starts.
+    """
+    moves = []
+    p = pointers[row, col]
+    while p:
+        moves.append(p)
+        if p == DIAG:
+            row -= 1
+            col -= 1
+        elif p == LEFT:
+            col -= 1
+        else:   #UP
+            row -= 1
+        p = pointers[row, col]
+    moves.reverse()
+    return moves, row, col
+
+def affine_traceback_moves(pointers, row, col):
+    """Returns (moves, row, col) following affine-gap pointers back.
+
+    As traceback_moves, but for the pointers from affine_nw_pointers or
+    affine_sw_pointers: after a LEFT or UP move, stays in that gap for as
+    long as the cell's EXTEND_LEFT or EXTEND_UP flag is set.
+    """
+    moves = []
+    move = pointers[row, col] & 3
+    while move:
+        moves.append(move)
+        if move == DIAG:
+            row -= 1
+            col -= 1
+            move = pointers[row, col] & 3
+        elif move == LEFT:
+            extended = pointers[row, col] & EXTEND_LEFT
+            col -= 1
+            if not extended:
+                move = pointers[row, col] & 3
+        else:   #UP
+            extended = pointers[row, col] & EXTEND_UP
+            row -= 1
+            if not extended:
+                move = pointers[row, col] & 3
+    moves.reverse()
+    return moves, row, col
+
+def banded_traceback_moves(pointers, row, col, lo):
+    """Returns (moves, row, col) following pointers from banded_nw_pointers.
+
+    As traceback_moves; lo is the lowest diagonal in the band.
+    """
+    moves = []
+    p = pointers[row, col - row - lo]
+    while p:
+        moves.append(p)
+        if p == DIAG:
+            row -= 1
+            col -= 1
+        elif p == LEFT:
+            col -= 1
+        else:   #UP
+            row -= 1
+        p = pointers[row, col - row - lo]
+    moves.reverse()
+    return moves, row, col
+
+def touches_band_edge(moves, lo, hi, len_1, len_2):
+    """Returns True if the global alignment given by moves reaches the edge
+    of the band from lo to hi, where it is not also the edge of the matrix.
+    """
+    diagonal = 0
+    for m in [DIAG] + list(moves):
+        if m == LEFT:
+            diagonal += 1
+        elif m == UP:
+            diagonal -= 1
+        if (diagonal == lo and lo > -len_2) or \
+            (diagonal == hi and hi < len_1):
+            return True
+    return False
+
+def aligned_from_moves(moves, seq_1, seq_2, start_1=0, start_2=0, \
+    gap_symbol=default_gap_symbol):
+    """Returns (align_1, align_2) lists of items from seq_1 and seq_2.
+
+    Follows moves (DIAG, LEFT or UP) starting at position start_1 in seq_1
+    and start_2 in seq_2, inserting gap_symbol whenever the movement is not
+    diagonal: LEFT puts a gap in seq_2, and UP a gap in seq_1.
+    """
+    align_1 = []
+    align_2 = []
+    i, j = start_1, start_2
+    for m in moves:
+        if m == DIAG:
+            align_1.append(seq_1[i])
+            align_2.append(seq_2[j])
+            i += 1
+            j += 1
+        elif m == LEFT:
+            align_1.append(seq_1[i])
+            align_2.append(gap_symbol)
+            i += 1
+        else:   #UP
+            align_1.append(gap_symbol)
+            align_2.append(seq_2[j])
+            j += 1
+    return align_1, align_2
+
+def hirschberg_moves(codes_1, codes_2, table, gap, exact, base_cells=100000):
+    """Returns moves for an optimal global alignment using linear memory.
+
+    Uses Hirschberg's divide-and-conquer algorithm: the rows are split in
+    half, forward scores for the top half and reverse scores for the bottom
+    half give the column where an optimal path crosses the middle, and each
+    of the two smaller problems is solved in the same way. Subproblems of 
+    at most base_cells cells (or with a single row) are solved directly 
+    with nw_pointers. Parameters are as for nw_last_row.
+
+    Memory is proportional to len(codes_1) + len(codes_2) + base_cells;
+    time is roughly twice that of filling the full matrix.
+    """
+    def align(start_1, end_1, start_2, end_2):
+        """Returns moves aligning codes_1[start_1:end_1], codes_2[...]."""
+        cols = end_1 - start_1
+        rows = end_2 - start_2
+        if not rows:
+            return [LEFT] * cols
+        if not cols:
+            return [UP] * rows
+        sub_1 = codes_1[start_1:end_1]
+        if rows == 1 or (rows + 1) * (cols + 1) <= base_cells:
+            pointers, score = nw_pointers(sub_1, codes_2[start_2:end_2], \
+                table, gap, exact)
+            return traceback_moves(pointers, rows, cols)[0]
+        mid = (start_2 + end_2) // 2
+        forward = nw_last_row(sub_1, codes_2[start_2:mid], table, gap, exact)
+        bottom = codes_2[mid:end_2]
+        bottom.reverse()
+        backward = nw_last_row(sub_1[::-1], bottom, table, gap, exact)
+        split = start_1 + argmax(forward + backward[::-1])
+        return align(start_1, split, start_2, mid) + \
+            align(split, end_1, mid, end_2)
+    
+    return align(0, len(codes_1), 0, len(codes_2))
+
+def moves_score(moves, codes_1, codes_2, table, gap, gap_extend=None):
+    """Returns total score of the alignment given by moves.
+    
+    If gap_extend is not None, each gap after the first in a run of LEFT
+    (or of UP) moves scores gap_extend rather than gap.
+    """
+    if gap_extend is None:
+        gap_extend = gap
+    score = 0
+    i = j = 0
+    prev = DIAG
+    for m in moves:
+        if m == DIAG:
+            score += table[codes_2[j]][codes_1[i]]
+            i += 1
+            j += 1
+        else:
+            if m == prev:
+                score += gap_extend
+            else:
+                score += gap
+            if m == LEFT:
+                i += 1
+            else:   #UP
+                j += 1
+        prev = m
+    return score
+
+class ArrayScoreMatrix(object):
+    """Score matrix for sequence alignment backed by Numeric arrays.
+
+    Holds the same information as ScoreMatrix, but rather than a ScoreCell
+    per cell it keeps the traceback pointers in a byte array (self.Pointers,
+    Rows x Cols, using the NO_POINTER/UP/DIAG/LEFT codes) and only two rows
+    of scores at a time. Each row is filled with whole-array operations.
+
+    The scoring function is called once per pair of distinct symbols rather
+    than once per cell, so it must depend only on the two items it is given.
+    Rows, columns, tie-breaking and MaxScore follow ScoreMatrix exactly, so
+    the alignments and scores are the same.
+
+    If GapExtend is set, gaps are affine: a run of n gaps scores 
+    GapScore + (n-1) * GapExtend, and the pointers also carry the 
+    EXTEND_LEFT and EXTEND_UP flags (see affine_nw_pointers).
+    """
+    
+    def __init__(self, First, Second, Score=equality_scorer, \
+        GapScore=default_gap, GapSymbol=default_gap_symbol, GapExtend=None):
+        """Returns new ArrayScoreMatrix object, not yet filled.
+
+        Parameters are as for ScoreMatrix; GapExtend, if not None, is the
+        score for each gap after the first in a run.
+        """
+        self.First = First          #first sequence
+        self.Second = Second        #second sequence
+        self.Cols = len(First) + 1  #need to add 1 for the start col
+        self.Rows = len(Second) + 1 #need to add 1 for the start row
+        self.Score = Score          #scoring function: f(x,y) = num
+        self.GapScore = GapScore    #gap penalty
+        self.GapSymbol = GapSymbol  #symbol for gaps
+        self.GapExtend = GapExtend  #gap extension penalty, or None
+        self.Filled = False         #whether the matrix has been filled
+        self.TracedBack = False     #whether traceback() has been done
+        self.FirstAlign = []        #first sequence, aligned, as list
+        self.SecondAlign = []       #second sequence, aligned, as list
+        self.Pointers = None        #byte array of traceback pointers
+        self.MaxScore = None        #(score, row, col) where traceback starts
+
+    def _encode(self):
+        """Returns (codes_1, codes_2, table, exact) for the two sequences.
+
+        codes_1 is an array of symbol codes for self.First, codes_2 a list
+        of symbol codes for self.Second, and table and exact are as returned
+        by score_table.
+        """
+        return encode_pair(self.First, self.Second, self.Score, \
+            self.GapScore, self.GapExtend)
+
+    def traceback(self):
+        """Sets the optimal alignment as lists in FirstAlign and SecondAlign.
+
+        Starts from the cell in MaxScore and follows the pointers set by
+        fill(), inserting gaps whenever the movement is not diagonal.
+        """
+        if not self.Filled:
+            self.fill()
+        max_score, row, col = self.MaxScore
+        if self.GapExtend is None:
+            moves, row, col = traceback_moves(self.Pointers, row, col)
+        else:
+            moves, row, col = affine_traceback_moves(self.Pointers, row, col)
+        self.FirstAlign, self.SecondAlign = aligned_from_moves(moves, \
+            self.First, self.Second, col, row, self.GapSymbol)
+        self.TracedBack = True
+
+    def alignment(self):
+        """Returns alignment of first and second sequences.
+
+        Calls fill() and traceback() if necessary.
+        
+        Converts the aligned versions to the same class as the originals.
+        """
+        if not self.TracedBack:
+            self.traceback()
+        return same_class(self.First, self.FirstAlign), \
+            same_class(self.Second, self.SecondAlign)
+
+class ArrayNeedlemanWunschMatrix(ArrayScoreMatrix):
+    """Array-based score matrix for global alignment (Needleman-Wunsch)."""
+
+    def fill(self):
+        """Fills the pointers a row at a time, keeping two rows of scores."""
+        codes_1, codes_2, table, exact = self._encode()
+        if self.GapExtend is None:
+            self.Pointers, score = nw_pointers(codes_1, codes_2, table, \
+                self.GapScore, exact)
+        else:
+            self.Pointers, score = affine_nw_pointers(codes_1, codes_2, \
+                table, self.GapScore, self.GapExtend, exact)
+        self.Filled = True
+        self.MaxScore = (score, self.Rows-1, self.Cols-1)
+
+class ArraySmithWatermanMatrix(ArrayScoreMatrix):
+    """Array-based score matrix for local alignment (Smith-Waterman)."""
+
+    def fill(self):
+        """Fills the pointers a row at a time, keeping two rows of scores."""
+        codes_1, codes_2, table, exact = self._encode()
+        if self.GapExtend is None:
+            self.Pointers, self.MaxScore = sw_pointers(codes_1, codes_2, \
+                table, self.GapScore, exact)
+        else:
+            self.Pointers, self.MaxScore = affine_sw_pointers(codes_1, \
+                codes_2, table, self.GapScore, self.GapExtend, exact)
+        self.Filled = True
+
+class LinearSpaceNeedlemanWunsch(ArrayScoreMatrix):
+    """Global alignment in linear memory (Hirschberg's algorithm).
+
+    Has the same interface as ArrayNeedlemanWunschMatrix, but never builds
+    the pointer matrix (self.Pointers stays None), so memory is proportional
+    to the sum rather than the product of the sequence lengths. See
+    hirschberg_moves for details.
+
+    The alignment is always optimal and has the same score as the one from
+    the full matrix. However, where several different alignments tie for
+    the best score, the two may pick different ones.
+
+    Only linear gap scores are supported, so GapExtend must be None.
+    """
+
+    def fill(self):
+        """Finds the moves of an optimal alignment and its score."""
+        if self.GapExtend is not None:
+            raise ValueError, "Linear-space alignment needs linear gap scores"
+        codes_1, codes_2, table, exact = self._encode()
+        gap = self.GapScore
+        self._moves = hirschberg_moves(codes_1, codes_2, table, gap, exact)
+        self.Filled = True
+        self.MaxScore = (moves_score(self._moves, codes_1, codes_2, table, \
+            gap), self.Rows-1, self.Cols-1)
+
+    def traceback(self):
+        """Sets the optimal alignment as lists in FirstAlign and SecondAlign.
+        """
+        if not self.Filled:
+            self.fill()
+        self.FirstAlign, self.SecondAlign = aligned_from_moves(self._moves, \
+            self.First, self.Second, gap_symbol=self.GapSymbol)
+        self.TracedBack = True
+
+class BandedNeedlemanWunschMatrix(ArrayScoreMatrix):
+    """Global alignment filling only a diagonal band of the matrix.
+
+    Only cells within Band diagonals either side of the strip between the
+    first and last cells are filled, so time and memory are proportional
+    to len(Second) * (2 * Band + abs(len(First) - len(Second))). The 
+    alignment is optimal if an optimal alignment stays inside the band, 
+    which is usual for very similar sequences.
+
+    After traceback, TouchedEdge is True if the alignment reaches the edge
+    of the band (other than where it is the edge of the matrix anyway): a
+    better alignment may then lie outside, so the caller can retry with a
+    wider band. (The converse doesn't hold: a very different path outside
+    the band can still score better, but not for similar sequences.)
+
+    Pointers has a column per diagonal rather than per position in First
+    (see banded_nw_pointers). Only linear gap scores are supported.
+    """
+
+    def __init__(self, First, Second, Score=equality_scorer, \
+        GapScore=default_gap, GapSymbol=default_gap_symbol, GapExtend=None, \
+        Band=default_band):
+        """Returns new BandedNeedlemanWunschMatrix object, not yet filled.
+
+        Band is the number of extra diagonals on each side of the band.
+        Other parameters are as for ArrayScoreMatrix.
+        """
+        ArrayScoreMatrix.__init__(self, First, Second, Score, GapScore, \
+            GapSymbol, GapExtend)
+        self.Band = Band
+        self.Diagonals = band_limits(len(First), len(Second), Band)
+        self.TouchedEdge = None     #set by traceback()
+
+    def fill(self):
+        """Fills the pointers in the band a row at a time."""
+        if self.GapExtend is not None:
+            raise ValueError, "Banded alignment needs linear gap scores"
+        codes_1, codes_2, table, exact = self._encode()
+        lo, hi = self.Diagonals
+        self.Pointers, score = banded_nw_pointers(codes_1, codes_2, table, \
+            self.GapScore, exact, lo, hi)
+        self.Filled = True
+        self.MaxScore = (score, self.Rows-1, self.Cols-1)
+
+    def traceback(self):
+        """Sets the alignment in FirstAlign and SecondAlign, and TouchedEdge.
+        """
+        if not self.Filled:
+            self.fill()
+        max_score, row, col = self.MaxScore
+        lo, hi = self.Diagonals
+        moves, row, col = banded_traceback_moves(self.Pointers, row, col, lo)
+        self.TouchedEdge = touches_band_edge(moves, lo, hi, self.Cols-1, \
+            self.Rows-1)
+        self.FirstAlign, self.SecondAlign = aligned_from_moves(moves, \
+            self.First, self.Second, col, row, self.GapSymbol)
+        self.TracedBack = True
+
+def nw_align(seq1, seq2, scorer=equality_scorer, gap=default_gap, \
+    return_score=False, linear_space=None, gap_extend=None, band=None):
+    """Returns globally optimal alignment of seq1 and seq2.
+
+    linear_space: if True, uses LinearSpaceNeedlemanWunsch, which needs
+    memory proportional to len(seq1) + len(seq2) rather than their product,
+    at the cost of about twice the time. If False, fills the whole pointer
+    matrix. If None (the default), uses linear space only when the matrix
+    would have more than linear_space_threshold cells.
+
+    gap_extend: if not None, uses affine gaps, where gap is the score for 
+    opening a gap and gap_extend for each further gap in the same run. 
+    Affine gaps always use the whole pointer matrix.
+
+    band: if not None, uses BandedNeedlemanWunschMatrix to fill only the 
+    cells within band diagonals of the strip from the first to the last 
+    cell, and returns (result, touched_edge), where result is as without 
+    band and touched_edge is True if the alignment reached the edge of the
+    band, so a wider band might give a better alignment.
+    """
+    if band is not None:
+        if linear_space:
+            raise ValueError, "Can't use both a band and linear space"
+        N = BandedNeedlemanWunschMatrix(seq1, seq2, scorer, gap, \
+            GapExtend=gap_extend, Band=band)
+        if return_score:
+            result = N.alignment(), N.MaxScore[0]
+        else:
+            result = N.alignment()
+        return result, N.TouchedEdge
+    if linear_space is None:
+        linear_space = gap_extend is None and \
+            (len(seq1)+1)*(len(seq2)+1) > linear_space_threshold
+    if linear_space:
+        N = LinearSpaceNeedlemanWunsch(seq1, seq2, scorer, gap, \
+            GapExtend=gap_extend)
+    else:
+        N = ArrayNeedlemanWunschMatrix(seq1, seq2, scorer, gap, \
+            GapExtend=gap_extend)
     if return_score:
         return N.alignment(), N.MaxScore[0]
     else:
         return N.alignment()
 
-def sw_align(seq1, seq2, scorer=equality_scorer, gap=default_gap, return_score=False):
-    """Returns locally optimal alignment of seq1 and seq2."""
-    S = SmithWatermanMatrix(seq1, seq2, scorer, gap)
+def sw_align(seq1, seq2, scorer=equality_scorer, gap=default_gap, \
+    return_score=False, gap_extend=None):
+    """Returns locally optimal alignment of seq1 and seq2.
+    
+    gap_extend: if not None, uses affine gaps as for nw_align.
+    """
+    S = ArraySmithWatermanMatrix(seq1, seq2, scorer, gap, \
+        GapExtend=gap_extend)
     if return_score:
         return S.alignment(), S.MaxScore[0]
     else:
         return S.alignment()
 
+def _encode_shorter_first(seq1, seq2, scorer, gap, gap_extend):
+    """Returns encode_pair result with the shorter sequence as the first.
+
+    The score table is transposed if the sequences are swapped, so scores
+    are the same as for encode_pair(seq1, seq2, ...).
+    """
+    codes_1, codes_2, table, exact = encode_pair(seq1, seq2, scorer, gap, \
+        gap_extend)
+    if len(codes_2) < len(codes_1):
+        return array(codes_2, Int), codes_1.tolist(), \
+            array(transpose(table)), exact
+    return codes_1, codes_2, table, exact
+
+def nw_score(seq1, seq2, scorer=equality_scorer, gap=default_gap, \
+    gap_extend=None):
+    """Returns the score of the globally optimal alignment of seq1 and seq2.
+
+    Same as the score from nw_align(..., return_score=True), but only keeps
+    two rows of scores the length of the shorter sequence, and doesn't 
+    find the alignment itself. gap_extend is as for nw_align.
+    """
+    codes_1, codes_2, table, exact = _encode_shorter_first(seq1, seq2, \
+        scorer, gap, gap_extend)
+    if gap_extend is None:
+        return nw_last_row(codes_1, codes_2, table, gap, exact)[-1]
+    return affine_score(codes_1, codes_2, table, gap, gap_extend, exact)
+
+def sw_score(seq1, seq2, scorer=equality_scorer, gap=default_gap, \
+    gap_extend=None):
+    """Returns the score of the locally optimal alignment of seq1 and seq2.
+
+    Same as the score from sw_align(..., return_score=True), keeping only
+    two rows of scores as for nw_score.
+    """
+    codes_1, codes_2, table, exact = _encode_shorter_first(seq1, seq2, \
+        scorer, gap, gap_extend)
+    if gap_extend is None:
+        return sw_best_score(codes_1, codes_2, table, gap, exact)
+    return affine_score(codes_1, codes_2, table, gap, gap_extend, exact, \
+        local=True)
+
+def sw_scan(query, subjects, scorer=equality_scorer, gap=default_gap, \
+    gap_extend=None, top=10):
+    """Returns the best local alignment hits of query among subjects.
+
+    subjects can be any iterable of sequences (e.g. a generator reading a
+    database), and is only read once. Each subject is scored against query
+    with sw_score_antidiagonal, using scorer, gap and gap_extend as for 
+    sw_score, keeping only the best top hits so far.
+
+    Returns list of up to top (score, index) pairs, best first, where index
+    is the position of the subject in subjects. Ties go to the earlier 
+    subject. If top is None, returns all the subjects.
+    """
+    heap = []   #(score, -index) of best hits, worst first
+    for index, subject in enumerate(subjects):
+        codes_1, codes_2, table, exact = encode_pair(query, subject, scorer, \
+            gap, gap_extend)
+        hit = (sw_score_antidiagonal(codes_1, codes_2, table, gap, \
+            gap_extend, exact), -index)
+        if top is None or len(heap) < top:
+            heappush(heap, hit)
+        elif hit > heap[0]:
+            heapreplace(heap, hit)
+    heap.sort()
+    heap.reverse()
+    return [(score, -index) for score, index in heap]
+
+#job for the worker processes of all_pairs_align, set before they are 
+#forked so the sequences and scorer need not be picklable
+_all_pairs_job = None
+
+def _all_pairs_row(i):
+    """Returns scores of sequence i against each later sequence."""
+    seqs, score_f, scorer, gap, gap_extend = _all_pairs_job
+    first = seqs[i]
+    return [score_f(first, second, scorer, gap, gap_extend) \
+        for second in seqs[i+1:]]
+
+def all_pairs_align(seqs, scorer=equality_scorer, gap=default_gap, \
+    gap_extend=None, local=False, transform=None, workers=1, progress=None, \
+    condensed=False, diagonal=0):
+    """Returns alignment scores (or values from them) for all pairs of seqs.
+
+    seqs: list of sequences, or dict of sequences such as an Alignment. The
+    sequences are taken in the order of seqs.RowOrder if present, otherwise
+    of the sorted keys, and are labeled by key (or index, for a list).
+
+    Each pair is scored with nw_score, or with sw_score if local is True,
+    using scorer, gap and gap_extend. If transform is given, the value for
+    each pair is transform(score, first, second) instead, e.g. to turn 
+    scores into distances for clustering.
+
+    workers: number of processes for the pairs; each gets a sequence (and 
+    its pairs with all later sequences) at a time. Needs the multiprocessing
+    module (Python 2.6 or later); without it, all the pairs are done in 
+    this process. The result doesn't depend on the number of workers.
+
+    progress: if given, is called as progress(done, total) with the number 
+    of pairs scored so far as each sequence's pairs come in.
+
+    Returns a DistanceMatrix labeled as above with diagonal on the diagonal
+    or, if condensed is True, a Numeric array of the upper triangle in 
+    order (0,1), (0,2) ... (0,n-1), (1,2) ... (n-2,n-1).
+    """
+    global _all_pairs_job
+    if hasattr(seqs, 'keys'):
+        names = getattr(seqs, 'RowOrder', None)
+        if names is None:
+            names = sorted(seqs.keys())
+        seqs = [seqs[name] for name in names]
+    else:
+        seqs = list(seqs)
+        names = range(len(seqs))
+    num_seqs = len(seqs)
+    total = num_seqs * (num_seqs - 1) // 2
+    values = zeros(total, Float64)
+    if local:
+        score_f = sw_score
+    else:
+        score_f = nw_score
+    _all_pairs_job = (seqs, score_f, scorer, gap, gap_extend)
+    pool = None
+    try:
+        if workers > 1 and Pool is not None and num_seqs > 2:
+            pool = Pool(workers)
+            rows = pool.imap(_all_pairs_row, range(num_seqs - 1))
+        else:
+            rows = imap(_all_pairs_row, range(num_seqs - 1))
+        done = 0
+        for i, row in enumerate(rows):
+            if transform is not None:
+                row = [transform(score, seqs[i], second) for score, second \
+                    in zip(row, seqs[i+1:])]
+            values[done:done + len(row)] = array(row, Float64)
+            done += len(row)
+            if progress is not None:
+                progress(done, total)
+    finally:
+        _all_pairs_job = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if condensed:
+        return values
+    data = {}
+    for name in names:
+        data[name] = {name:diagonal}
+    k = 0
+    for i in range(num_seqs):
+        for j in range(i + 1, num_seqs):
+            data[names[i]][names[j]] = data[names[j]][names[i]] = values[k]
+            k += 1
+    return DistanceMatrix(data, RowOrder=names, ColOrder=names)
+
+def dot_column_scores(data_1, data_2):
+    """Returns table of scores for each pair of positions of two profiles.
+
+    data_1 and data_2 are profile arrays as in Profile.Data: a row for each
+    position and a column for each character, in the same order in both.
+    result[j][i] is the dot product of data_1[i] and data_2[j], which for
+    frequency profiles is the chance that characters drawn from the two
+    positions match.
+    """
+    return matrixmultiply(data_2, transpose(data_1))
+
+def LogOddsColumnScorer(background=None, min_score=-10):
+    """Factory function returning log-odds column scorer for profile_align.
+
+    The score for a pair of positions with character frequencies p and q is
+    log(sum(p[c] * q[c] / background[c])): the log of the chance that
+    characters drawn from the two positions match, relative to the chance
+    for characters drawn from the background. background defaults to equal
+    frequencies. Scores are natural logs, and are at least min_score so that
+    positions that can never match don't swamp the rest of the alignment.
+    """
+    def scorer(data_1, data_2):
+        if background is None:
+            num_chars = data_1.shape[1]
+            freqs = zeros(num_chars, Float64) + 1.0 / num_chars
+        else:
+            freqs = array(background, Float64)
+        odds = matrixmultiply(data_2 / freqs, transpose(data_1))
+        return maximum(log(maximum(odds, 1e-300)), min_score)
+    return scorer
+
+def profile_align(first, second, gap=default_gap, \
+    column_scores=dot_column_scores, gap_extend=None, return_score=False, \
+    exact=None):
+    """Returns globally optimal mapping of the positions of two profiles.
+
+    first and second are Profile objects or their Data arrays, with the
+    same character order. column_scores(data_1, data_2) returns the table
+    of scores for each pair of positions as for dot_column_scores, e.g. 
+    dot_column_scores or a function from LogOddsColumnScorer. gap and 
+    gap_extend score a position aligned to a gap as in nw_align.
+
+    Returns a list with (i, j) for each column of the merged alignment, 
+    where i and j are the positions in first and second that it holds or
+    None for a gap; or (mapping, score) if return_score is True.
+
+    The column scores are found for all pairs at once, and the DP is filled
+    a row at a time with array operations. exact is as for score_table: if
+    None, it is True when gap and all the column scores are whole numbers.
+    """
+    data_1 = getattr(first, 'Data', first)
+    data_2 = getattr(second, 'Data', second)
+    length_1, length_2 = len(data_1), len(data_2)
+    table = column_scores(data_1, data_2)
+    codes_1, codes_2 = arange(length_1), range(length_2)
+    if exact is None:
+        exact = _is_integer(gap) and _is_integral(table)
+    if gap_extend is None:
+        pointers, score = nw_pointers(codes_1, codes_2, table, gap, exact)
+        moves = traceback_moves(pointers, length_2, length_1)[0]
+    else:
+        pointers, score = affine_nw_pointers(codes_1, codes_2, table, gap, \
+            gap_extend, False)
+        moves = affine_traceback_moves(pointers, length_2, length_1)[0]
+    mapping = []
+    i = j = 0
+    for m in moves:
+        if m == DIAG:
+            mapping.append((i, j))
+            i += 1
+            j += 1
+        elif m == LEFT:
+            mapping.append((i, None))
+            i += 1
+        else:   #UP
+            mapping.append((None, j))
+            j += 1
+    if return_score:
+        return mapping, score
+    return mapping
+
 def demo(seq1, seq2):
     result = []
     result.append("Global alignment:")
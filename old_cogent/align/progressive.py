@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+#file cogent/align/progressive.py
+
+"""Progressive multiple alignment using the pairwise alignment code.
+
+Builds a guide tree by UPGMA clustering of distances from pairwise global
+alignment scores, then works from the tips of the tree to the root, at each
+node aligning the (already aligned) groups of sequences below its two
+children to each other, profile against profile.
+
+Runs entirely in-process, so small families don't need temp files or
+external programs such as muscle or clustalw.
+"""
+from Numeric import array, zeros, take, concatenate, equal, arange, \
+    matrixmultiply, transpose, Int, Float64, NewAxis
+from old_cogent.align.algorithm import equality_scorer, default_gap, \
+    default_gap_symbol, encode_symbols, score_table, profile_align, \
+    all_pairs_align, same_class
+from old_cogent.cluster.UPGMA import UPGMA_cluster
+from old_cogent.base.tree import PhyloNode
+from old_cogent.base.align import Alignment
+
+#put on the diagonal of the distance matrix for UPGMA_cluster
+large_number = 1e305
+
+def self_score(seq, scorer=equality_scorer):
+    """Returns score of seq aligned to itself without gaps."""
+    score = 0
+    for item in seq:
+        score += scorer(item, item)
+    return score
+
+def score_distance(score, first, second, scorer=equality_scorer):
+    """Returns distance between first and second from their alignment score.
+
+    The distance is 1 - score / (mean of the sequences' self scores), so it
+    is 0 for identical sequences. It is 1 if the mean self score isn't
+    positive (e.g. both sequences are empty).
+    """
+    mean = (self_score(first, scorer) + self_score(second, scorer)) / 2.0
+    if mean <= 0:
+        return 1.0
+    return 1 - score / mean
+
+def guide_tree(seqs, scorer=equality_scorer, gap=default_gap, workers=1):
+    """Returns UPGMA tree of seqs from pairwise alignment distances.
+
+    seqs is a list of sequences. The tips of the tree are PhyloNodes whose
+    Data is the index of the sequence in seqs. Distances are found with
+    all_pairs_align and score_distance; workers is as for all_pairs_align.
+    """
+    num_seqs = len(seqs)
+    if num_seqs == 1:
+        return PhyloNode(Data=0)
+    distances = all_pairs_align(seqs, scorer, gap, transform=lambda score, \
+        first, second: score_distance(score, first, second, scorer), \
+        workers=workers, condensed=True)
+    matrix = zeros((num_seqs, num_seqs), Float64) + large_number
+    k = 0
+    for i in range(num_seqs):
+        for j in range(i + 1, num_seqs):
+            matrix[i, j] = matrix[j, i] = distances[k]
+            k += 1
+    nodes = [PhyloNode(Data=i) for i in range(num_seqs)]
+    return UPGMA_cluster(matrix, nodes, large_number)
+
+def _leaf_group(index, codes, num_symbols):
+    """Returns (members, positions, counts) for a single sequence.
+
+    members is the list of sequence indices in the group. positions has an
+    array for each member giving, for each column, the position in the
+    sequence or -1 for a gap. counts[col][symbol] is the number of members
+    with that symbol in the column.
+    """
+    length = len(codes)
+    counts = equal(array(codes, Int)[:, NewAxis], arange(num_symbols))
+    return [index], [arange(length)], counts.astype(Int)
+
+def merge_groups(first, second, table, gap, exact=None):
+    """Returns group aligning groups first and second (see _leaf_group).
+
+    Columns are scored by sum of pairs: the score of a column from first
+    against one from second is the total over every pair of members of
+    table[code_2][code_1] (see score_table), and a column against a gap
+    scores gap for every pair of members. Uses profile_align on the count
+    arrays, so the columns of each group stay together. exact is as 
+    returned by score_table with table (None to check the column scores).
+    """
+    members_1, positions_1, counts_1 = first
+    members_2, positions_2, counts_2 = second
+    length_1, length_2 = len(counts_1), len(counts_2)
+    column_scores = lambda data_1, data_2: matrixmultiply( \
+        matrixmultiply(data_2, table), transpose(data_1))
+    mapping = profile_align(counts_1, counts_2, \
+        gap * len(members_1) * len(members_2), column_scores, exact=exact)
+    #columns of each group in the merged group, with length for a gap
+    map_1, map_2 = [], []
+    for i, j in mapping:
+        if i is None:
+            i = length_1
+        if j is None:
+            j = length_2
+        map_1.append(i)
+        map_2.append(j)
+    positions = []
+    for group_positions, col_map in [(positions_1, map_1), \
+        (positions_2, map_2)]:
+        for p in group_positions:
+            positions.append(take(concatenate((p, [-1])), col_map))
+    num_symbols = counts_1.shape[1]
+    gap_row = zeros((1, num_symbols), Int)
+    counts = take(concatenate((counts_1, gap_row)), map_1) + \
+        take(concatenate((counts_2, gap_row)), map_2)
+    return members_1 + members_2, positions, counts
+
+def progressive_align(seqs, scorer=equality_scorer, gap=default_gap, \
+    gap_symbol=default_gap_symbol, workers=1, return_tree=False):
+    """Returns Alignment of seqs by progressive alignment.
+
+    seqs: list of sequences, or dict of sequences such as an Alignment.
+    Sequences are labeled by key (or index, for a list) and ordered as for
+    all_pairs_align. The aligned sequences have the same class as the
+    originals.
+
+    scorer and gap are as for nw_align, and are used both for the guide
+    tree (see guide_tree) and for aligning the groups (see merge_groups).
+    workers is passed to all_pairs_align for the guide tree distances.
+
+    If return_tree is True, returns (alignment, tree), where tree is the
+    guide tree with the names of the sequences as the Data of its tips.
+    """
+    if hasattr(seqs, 'keys'):
+        names = getattr(seqs, 'RowOrder', None)
+        if names is None:
+            names = sorted(seqs.keys())
+        seqs = [seqs[name] for name in names]
+    else:
+        seqs = list(seqs)
+        names = range(len(seqs))
+    if not seqs:
+        if return_tree:
+            return Alignment({}), None
+        return Alignment({})
+    all_items = []
+    for seq in seqs:
+        all_items.extend(seq)
+    symbols, codes = encode_symbols(all_items)
+    table, exact = score_table(scorer, symbols, symbols, gap)
+    seq_codes = []
+    start = 0
+    for seq in seqs:
+        seq_codes.append(codes[start:start + len(seq)])
+        start += len(seq)
+    tree = guide_tree(seqs, scorer, gap, workers)
+
+    def align_node(node):
+        """Returns group of the sequences below node, aligned."""
+        if not node.Children:
+            index = node.Data
+            return _leaf_group(index, seq_codes[index], len(symbols))
+        group = align_node(node.Children[0])
+        for child in node.Children[1:]:
+            group = merge_groups(group, align_node(child), table, gap, \
+                exact)
+        return group
+
+    members, positions, counts = align_node(tree)
+    aligned = {}
+    for index, p in zip(members, positions):
+        seq = seqs[index]
+        items = []
+        for i in p:
+            if i < 0:
+                items.append(gap_symbol)
+            else:
+                items.append(seq[i])
+        aligned[names[index]] = same_class(seq, items)
+    result = Alignment(aligned, RowOrder=names)
+    if return_tree:
+        for tip in tree.TerminalDescendants:
+            tip.Data = names[tip.Data]
+        if not tree.Children:
+            tree.Data = names[tree.Data]
+        return result, tree
+    return result
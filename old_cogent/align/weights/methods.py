@@ -90,7 +90,8 @@ done in place, but a copy is made.
 from __future__ import division
 from random import choice
 from RandomArray import exponential
-from Numeric import array, Float64, matrixmultiply, transpose, ones, zeros
+from Numeric import array, Float64, matrixmultiply, transpose, ones, zeros, \
+    take, diagonal
 from LinearAlgebra import inverse
 from old_cogent.base.profile import Profile
 from old_cogent.base.align import Alignment
@@ -98,6 +99,7 @@ from old_cogent.parse.tree import DndParser
 from old_cogent.util.array import hamming_distance
 from old_cogent.align.weights.util import Weights, number_of_pseudo_seqs,\
     pseudo_seqs_exact, pseudo_seqs_monte_carlo, row_to_vote, distance_matrix,\
+    unique_distance_matrix,\
     eigenvector_for_largest_eigenvalue, DNA_ORDER,RNA_ORDER,PROTEIN_ORDER,\
     SeqToProfile
 from old_cogent.align.weights.weights import WeightNode
@@ -122,16 +124,27 @@ def VA(alignment, distance_method=hamming_distance):
     normal. 0.333   0.25    0.417
 
     so: weight(ABBA) = 0.333, weight(ABCA)=0.25, etc.
+
+    Identical rows are collapsed (see unique_distance_matrix): the distance 
+    sums are found for each distinct row, counting each other distinct row
+    as many times as it occurs.
     """
     
-    distances = distance_matrix(alignment, distance_method)
-    sum_dist = sum(distances)
+    distances, unique, counts, row_map = \
+        unique_distance_matrix(alignment, distance_method)
+    reps = unique.RowOrder
+    multiplicities = array([counts[k] for k in reps])
+    #the sum of distances of a row to all the others, weighted by counts;
+    #a repeated row is at distance distances[i,i] from its other copies
+    sum_dist = matrixmultiply(distances, multiplicities) - diagonal(distances)
     #total weights are the normalized sum of distances (sum over each column,
     # divided by the total distance in the matrix
-    weights = sum_dist/sum(sum_dist)
+    weights = sum_dist/sum(sum_dist * multiplicities)
 
     #create a dictionary of {seq_id: weight}
-    weight_dict = Weights(dict(zip(alignment.RowOrder,weights)))
+    index = dict([(k, i) for i, k in enumerate(reps)])
+    weight_dict = Weights(dict([(k, weights[index[row_map[k]]]) \
+        for k in alignment.RowOrder]))
     return weight_dict
 
 
@@ -283,13 +296,17 @@ def pos_char_weights(alignment, order=DNA_ORDER):
     D                   1/3*2
     Q                   1/3*1
     S                                           1/3*1
+
+    The weights are calculated once for each distinct column (see 
+    Alignment.sitePatterns) and copied to the columns that repeat it.
     """
-    counts = alignment.columnFrequencies()
-    a = zeros([len(order), alignment.SeqLen],Float64)
+    patterns, multiplicities, site_map = alignment.sitePatterns()
+    counts = patterns.columnFrequencies()
+    a = zeros([len(order), len(counts)],Float64)
     for col, c in enumerate(counts):
         for char in c:
             a[order.index(char),col] = 1/(len(c)*c[char])
-    return Profile(a,Alphabet=order)
+    return Profile(take(a, site_map, 1),Alphabet=order)
 
 def PB(alignment, order=DNA_ORDER):
     """Returns sequence weights based on the diversity at each position.
@@ -309,17 +326,21 @@ def PB(alignment, order=DNA_ORDER):
     contributions from each position are summed to give a sequences weight.
 
     See Henikoff 1994 for a good example.
+
+    Each distinct column (see Alignment.sitePatterns) is only visited once,
+    its contributions counted as many times as it occurs.
     """
-    #calculate the contribution of each character at each position
-    pos_weights = pos_char_weights(alignment, order)
+    patterns, multiplicities, site_map = alignment.sitePatterns()
+    #calculate the contribution of each character at each distinct position
+    pos_weights = pos_char_weights(patterns, order)
     d = pos_weights.Data
     
     result = Weights()
 
-    for key,seq in alignment.items():
+    for key,seq in patterns.items():
         weight = 0
         for idx, char in enumerate(seq):
-            weight += d[order.index(char),idx]
+            weight += d[order.index(char),idx] * multiplicities[idx]
             result[key] = weight
     
     result.normalize()
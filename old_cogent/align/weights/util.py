@@ -124,28 +124,45 @@ def row_to_vote(row):
     result = array(row) - min(row) == 0
     return result/sum(result)
 
+def unique_distance_matrix(alignment, distance_method=hamming_distance):
+    """Returns (distances, unique, counts, row_map) for the distinct rows.
+
+    unique, counts and row_map are as for Alignment.uniqueRows: each 
+    distinct row is only compared once with each other one. distances is 
+    the distance matrix between the rows of unique, in its RowOrder; its 
+    diagonal holds the distance between two copies of a repeated row (0 
+    for rows that are not repeated, and for the Hamming distance).
+    """
+    unique, counts, row_map = alignment.uniqueRows()
+    reps = unique.RowOrder
+    rows = [array(unique[k]) for k in reps]
+    nr_of_seqs = len(rows)
+    distances = zeros([nr_of_seqs,nr_of_seqs])
+    for i, seq_a in enumerate(rows):
+        if counts[reps[i]] > 1:
+            distances[i,i] = distance_method(seq_a,seq_a)
+        for j in range(i+1, nr_of_seqs):
+            dist = distance_method(seq_a,rows[j])
+            distances[i,j] = dist
+            distances[j,i] = dist
+    return distances, unique, counts, row_map
+
 def distance_matrix(alignment, distance_method=hamming_distance):
     """Returns distance matrix for seqs in the alignment.
 
     Order is either the RowOrder in the alignment or the order in which
         is iterated over the rows.
 
-    Distance is the Hamming distance between two sequences
+    Distance is the Hamming distance between two sequences. Identical rows
+    are only compared once (see unique_distance_matrix).
     """
-    #change sequences into arrays
-    alignment = Alignment([(k,array(alignment[k])) for k in\
-        alignment.RowOrder],RowOrder=alignment.RowOrder)
-
-    nr_of_seqs = len(alignment)
-    distances = zeros([nr_of_seqs,nr_of_seqs])
-    for i, seq_a in enumerate(alignment.Rows):
-        for j, seq_b in enumerate(alignment.Rows):
-            if i < j:
-                dist = distance_method(seq_a,seq_b)
-                distances[i,j] = dist
-                distances[j,i] = dist
-            else: # i==j (diagonal) or i>j (lower left half)
-                continue
+    distances, unique, counts, row_map = \
+        unique_distance_matrix(alignment, distance_method)
+    index = dict([(k, i) for i, k in enumerate(unique.RowOrder)])
+    rows = [index[row_map[k]] for k in alignment.RowOrder]
+    distances = take(take(distances, rows), rows, 1)
+    for i in range(len(rows)):
+        distances[i,i] = 0
     return distances
 
 def eigenvector_for_largest_eigenvalue(matrix):
@@ -35,11 +35,17 @@ make_gap_filter. Added allowed_frac_bad_cols to options in omitGapCols.
 into strings.  Changed getIntMap to prefix integer labels with 'seq_'
 """
 from __future__ import division
-from old_cogent.base.sequence import frac_same
+from old_cogent.base.sequence import frac_same, encode_seqs, pairwise_matrix, \
+    batch_metrics, frac_same_many
 from old_cogent.base.dict2d import Dict2D
 from old_cogent.base.alphabet import *
 from old_cogent.base.stats import Freqs
-from Numeric import array, logical_and, logical_not, UInt8
+from Numeric import array, zeros, logical_and, logical_or, logical_not, \
+    fromstring, reshape, transpose, take, ravel, nonzero, where, arange, \
+    sort, argsort, searchsorted, repeat, compress, concatenate, argmax, log, \
+    ceil, put, add, equal, not_equal, greater, greater_equal, less, \
+    less_equal, maximum, minimum, sum as array_sum, Int, Float64, UInt8, \
+    NewAxis
 
 eps = 1e-6  #small number: 1-eps is almost 1, and is used for things like the
             #default number of gaps to allow in a column.
@@ -360,8 +366,54 @@ class Alignment(dict):
         """Returns list of items where f(self[row][col]) is True."""
         return self.getItems(self.getItemIndices(f, negate))
 
+    def _group_rows(self, keys):
+        """Returns (reps, index) for the distinct rows among keys.
+
+        reps is the first key with each distinct row, in order, and index 
+        maps each key to the position of its row's rep in reps. Rows are 
+        the same if they are equal and of the same class.
+        """
+        known = {}
+        reps = []
+        index = {}
+        for key in keys:
+            row = self[key]
+            try:
+                hash(row)
+                row_key = (row.__class__, row)
+            except TypeError:
+                row_key = (row.__class__, tuple(row))
+            i = known.get(row_key)
+            if i is None:
+                i = known[row_key] = len(reps)
+                reps.append(key)
+            index[key] = i
+        return reps, index
+
+    def uniqueRows(self):
+        """Returns (unique, counts, row_map) for the distinct rows.
+
+        unique is an alignment of the same class holding, under its own 
+        key, the first row (in RowOrder) with each distinct sequence; rows
+        are the same if they are equal and of the same class. counts maps 
+        each key in unique to the number of rows like it, and row_map maps 
+        every key in self to the key of its row in unique. Results found 
+        once per unique row can be expanded back to every key with row_map,
+        or weighted by counts.
+        """
+        reps, index = self._group_rows(self.RowOrder)
+        row_map = {}
+        counts = dict.fromkeys(reps, 0)
+        for key, i in index.items():
+            rep = reps[i]
+            row_map[key] = rep
+            counts[rep] += 1
+        unique = self.__class__(dict([(k, self[k]) for k in reps]), \
+            RowOrder=reps)
+        return unique, counts, row_map
+
     def getSimilar(self, target, min_similarity=0.0, max_similarity=1.0, \
-        metric=frac_same, transform=None):
+        metric=frac_same, transform=None, index=None):
         """Returns new Alignment containing sequences similar to target.
 
         target: sequence object to compare to. Can be in the alignment.
@@ -386,21 +438,42 @@ class Alignment(dict):
         WARNING: if the transformation changes the type of the sequence (e.g.
         extracting a string from an RnaSequence object), distance metrics that
         depend on instance data of the original class may fail.
-        """
-        if transform:
-            target = transform(target)
-        m = lambda x: metric(target, x)
 
-        if transform:
-            def f(x):
-                result = m(transform(x))
-                return min_similarity <= result <= max_similarity
-        else:
-            def f(x):
-                result = m(x)
-                return min_similarity <= result <= max_similarity
+        index: a KmerIndex of the alignment. If given, metric is frac_same
+        (or fracSame) and there is no transform, only the rows the index 
+        can't rule out are compared with the target.
 
-        return self.getRowsIf(f)
+        Identical rows (see uniqueRows) are only compared with the target 
+        once. If there is no transform, metric has a batch version in 
+        batch_metrics (e.g. frac_same or an unbound SequenceI.fracSame), and
+        the target and rows are strings, compares the target with all the
+        distinct rows at once.
+        """
+        batch_f = batch_metrics.get(getattr(metric, 'im_func', metric))
+        if index is not None and not transform and \
+            batch_f is frac_same_many:
+            keys = index.candidates(target, min_similarity)
+        else:
+            keys = self.RowOrder
+        reps, row_index = self._group_rows(keys)
+        rows = [self[key] for key in reps]
+        if batch_f and not transform and self._all_strings(target):
+            data, lengths = encode_seqs(rows)
+            values = batch_f(target, data, lengths).tolist()
+        else:
+            if transform:
+                target = transform(target)
+                rows = map(transform, rows)
+            values = [metric(target, x) for x in rows]
+        return self.getRows([key for key in keys \
+            if min_similarity <= values[row_index[key]] <= max_similarity])
+
+    def _all_strings(self, *extra):
+        """Returns True if all rows (and any extra items) are strings."""
+        for item in self.values() + list(extra):
+            if not isinstance(item, str):
+                return False
+        return True
 
     def _make_gaps_ok(self, allowed_gap_frac):
         """Makes the gaps_ok function used by omitGapCols and omitGapRows.
@@ -543,19 +616,31 @@ class Alignment(dict):
 
         It's often useful to pass an unbound method in as f.
 
-        Does not assume that f(x,y) == f(y,x) or that f(x,x) == 0.
+        Does not assume that f(x,y) == f(y,x) or that f(x,x) == 0. Each
+        pair is computed both ways, and the result holds the value from the
+        later of the two in the order of self.keys() for both.
+
+        f is only called once for each ordered pair of distinct rows (see 
+        uniqueRows). If f has a batch version in batch_metrics (e.g. an 
+        unbound SequenceI.fracSame) and the rows are strings, uses 
+        pairwise_matrix to compare each distinct row with all the others 
+        at once.
         """
         seqs = self.keys()
+        reps, index = self._group_rows(seqs)
+        rows = [self[i] for i in reps]
+        batch_f = batch_metrics.get(getattr(f, 'im_func', f))
+        if batch_f and self._all_strings():
+            values = pairwise_matrix(rows, batch_f).tolist()
+        else:
+            values = [[f(x, y) for y in rows] for x in rows]
         result = Dict2D()
         for i in seqs:
-            for j in seqs:
-                d = f(self[i], self[j])
-                if i not in result:
-                    result[i] = {}
-                if j not in result:
-                    result[j] = {}
-                result[i][j] = d
-                result[j][i] = d
+            result[i] = {}
+        for p, i in enumerate(seqs):
+            row_values = values[index[i]]
+            for j in seqs[:p + 1]:
+                result[i][j] = result[j][i] = row_values[index[j]]
         return result
 
     def IUPACConsensus(self, alphabet=RnaAlphabet):
@@ -580,14 +665,68 @@ class Alignment(dict):
         #Lengths were all equal
         return False
 
+    def _iter_col_keys(self):
+        """Iterates over a hashable key for each column, in order."""
+        for col in self.Cols:
+            yield tuple(col)
+
+    def _find_patterns(self):
+        """Returns (first_cols, counts, site_map): see sitePatterns.
+
+        first_cols is the index of the first column with each pattern.
+        """
+        known = {}
+        first_cols = []
+        counts = []
+        site_map = []
+        for i, key in enumerate(self._iter_col_keys()):
+            index = known.get(key)
+            if index is None:
+                index = known[key] = len(first_cols)
+                first_cols.append(i)
+                counts.append(0)
+            counts[index] += 1
+            site_map.append(index)
+        return first_cols, counts, site_map
+
+    def sitePatterns(self):
+        """Returns (patterns, counts, site_map) for the distinct columns.
+
+        patterns is an alignment of the same class with the same rows, 
+        holding each distinct column once, in order of first appearance. 
+        counts[i] is the number of columns with pattern i, and site_map[j] 
+        is the index of the pattern of column j, so results found once per 
+        pattern can be expanded back to every column with site_map.
+        """
+        first_cols, counts, site_map = self._find_patterns()
+        patterns = self.getCols(first_cols)
+        patterns.RowOrder = self.RowOrder
+        return patterns, counts, site_map
+
     def scoreMatrix(self):
         """Returns a position specific score matrix for the alignment."""
         return Dict2D(dict([(i,Freqs(col)) for i, col in enumerate(self.Cols)]))
 
     def columnFrequencies(self, constructor=Freqs):
         """Returns Freqss with item counts for each column.
+
+        If constructor is Freqs or a subclass, makes a Freqs for each 
+        distinct column (see sitePatterns) and copies it for the repeats.
         """
-        return map(constructor, self.Cols)
+        if not (isinstance(constructor, type) and \
+            issubclass(constructor, Freqs)):
+            return map(constructor, self.Cols)
+        patterns, counts, site_map = self.sitePatterns()
+        pattern_freqs = map(constructor, patterns.Cols)
+        result = []
+        used = {}
+        for i in site_map:
+            if i in used:
+                result.append(pattern_freqs[i].copy())
+            else:
+                result.append(pattern_freqs[i])
+                used[i] = True
+        return result
 
     def columnProbs(self, constructor=Freqs):
         """Returns FrequencyDistribuutions w/ prob. of each item per column.
@@ -633,11 +772,14 @@ class Alignment(dict):
         good_items.
         """
         uncertainties = []
-        #calculate column probabilities if necessary
+        site_map = None
+        #calculate column probabilities if necessary, once for each distinct
+        #column: the uncertainties are expanded back to all columns below
         if hasattr(self, 'ColumnProbs'):
             probs = self.ColumnProbs
         else:
-            probs = self.columnProbs()
+            patterns, counts, site_map = self.sitePatterns()
+            probs = patterns.columnProbs()
         #calculate uncertainty for each column
         for prob in probs:
             #if there's a list of valid symbols, need to delete everything else
@@ -650,6 +792,8 @@ class Alignment(dict):
                 #normalize the probabilities and add to the list
                 prob.normalize()
             uncertainties.append(prob.Uncertainty)
+        if site_map is not None:
+            uncertainties = [uncertainties[i] for i in site_map]
         return uncertainties
     
     def toPhylip(self):
@@ -742,6 +886,560 @@ class Alignment(dict):
         int_map = dict([(k, self[v]) for k,v in int_keys.items()])
         return int_map, int_keys
 
+class DenseAlignment(Alignment):
+    """Alignment that also keeps its rows as a rows x columns byte array.
+
+    Behaves exactly like Alignment, but when the rows are all strings (e.g.
+    Sequence objects) of the same length, Array is a UInt8 array holding 
+    the byte value of each character with a row for each sequence in 
+    RowOrder. Cols, getCols (and so getColsIf), the gap filters and the
+    column statistics then work on the array instead of looking up each 
+    item of each row. Otherwise (e.g. list rows, or a ragged alignment), 
+    Array is None and the Alignment code is used.
+
+    The array, and the column counts the consensus and uncertainty methods
+    use (see columnCounts), are made when first needed and dropped when 
+    rows are set, deleted or reordered; rows that are strings can't change 
+    in place.
+    """
+    def _reset_array(self):
+        """Forgets the array, so it is rebuilt from the rows when needed."""
+        self._array = None
+        self._col_string = None
+        self._counts = None
+        self._array_ready = False
+
+    def __setitem__(self, key, value):
+        """Sets row, forgetting the array."""
+        self._reset_array()
+        super(DenseAlignment, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        """Deletes row, forgetting the array."""
+        self._reset_array()
+        super(DenseAlignment, self).__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        """Updates rows, forgetting the array."""
+        self._reset_array()
+        super(DenseAlignment, self).update(*args, **kwargs)
+
+    def clear(self):
+        """Deletes all rows, forgetting the array."""
+        self._reset_array()
+        super(DenseAlignment, self).clear()
+
+    def pop(self, *args):
+        """Removes and returns row, forgetting the array."""
+        self._reset_array()
+        return super(DenseAlignment, self).pop(*args)
+
+    def popitem(self):
+        """Removes and returns (key, row), forgetting the array."""
+        self._reset_array()
+        return super(DenseAlignment, self).popitem()
+
+    def setdefault(self, *args):
+        """As dict setdefault, forgetting the array."""
+        self._reset_array()
+        return super(DenseAlignment, self).setdefault(*args)
+
+    def _set_row_order(self, row_order):
+        """Sets the row order, forgetting the array."""
+        self._reset_array()
+        self._row_order = row_order
+
+    RowOrder = property(Alignment._get_row_order, _set_row_order)
+
+    def _get_array(self):
+        """Returns the UInt8 rows x columns array, or None (see class doc)."""
+        if not getattr(self, '_array_ready', False):
+            rows = list(self.Rows)
+            self._array = None
+            if rows and self._all_strings():
+                length = len(rows[0])
+                for row in rows:
+                    if len(row) != length:
+                        break
+                else:
+                    self._array = reshape(fromstring(''.join(rows), UInt8), \
+                        (len(rows), length))
+            self._col_string = None
+            self._counts = None
+            self._array_ready = True
+        return self._array
+
+    Array = property(_get_array)
+
+    def _get_col_string(self):
+        """Returns string of the characters column by column, or None."""
+        if self._col_string is None and self.Array is not None:
+            self._col_string = transpose(self.Array).tostring()
+        return self._col_string
+
+    def _check_cols(self, cols):
+        """Returns list of cols as non-negative indices, as for row[i].
+
+        Raises IndexError if an index is out of range.
+        """
+        length = self.Array.shape[1]
+        result = []
+        for i in cols:
+            if i < 0:
+                i += length
+            if not 0 <= i < length:
+                raise IndexError, "Column index %s out of range" % i
+            result.append(i)
+        return result
+
+    def iterCols(self, col_order=None):
+        """Iterates over columns in the alignment, in order.
+
+        As Alignment.iterCols; each column is sliced from a string of the
+        array in column order.
+        """
+        col_string = self._get_col_string()
+        if col_string is None:
+            for col in super(DenseAlignment, self).iterCols(col_order):
+                yield col
+            return
+        num_rows, length = self.Array.shape
+        if not col_order:
+            col_order = xrange(length)
+        else:
+            col_order = self._check_cols(col_order)
+        for col in col_order:
+            start = col * num_rows
+            yield list(col_string[start:start + num_rows])
+
+    Cols = property(iterCols)
+
+    def _iter_col_keys(self):
+        """Iterates over a hashable key for each column, in order.
+
+        The keys are slices of the string of the array in column order.
+        """
+        col_string = self._get_col_string()
+        if col_string is None:
+            for key in super(DenseAlignment, self)._iter_col_keys():
+                yield key
+            return
+        num_rows = self.Array.shape[0]
+        for start in xrange(0, len(col_string), num_rows):
+            yield col_string[start:start + num_rows]
+
+    def getCols(self, cols, negate=False, row_constructor=None):
+        """Returns new Alignment containing only specified cols.
+
+        As Alignment.getCols, but takes the columns from the array at once.
+        """
+        if self.Array is None:
+            return super(DenseAlignment, self).getCols(cols, negate, \
+                row_constructor)
+        if row_constructor is None:
+            row_constructor = self.RowConstructor
+        num_rows, length = self.Array.shape
+        if negate:
+            col_lookup = dict.fromkeys(cols)
+            cols = [i for i in range(length) if i not in col_lookup]
+        else:
+            cols = self._check_cols(cols)
+        kept = take(self.Array, cols, 1).tostring()
+        width = len(cols)
+        result = {}
+        for i, key in enumerate(self.RowOrder):
+            result[key] = row_constructor(list(kept[i * width:(i+1) * width]))
+        return self.__class__(result)
+
+    def _gap_mask(self, use_alphabets=True):
+        """Returns UInt8 array that is 1 at the gaps in Array.
+
+        If use_alphabets is True, the gaps in each row are the Gaps of its
+        Alphabet, falling back to self.GapChars, as in omitGapRows and
+        omitGapRuns. Otherwise the gaps are self.GapChars for every row, as
+        for the column lists in omitGapCols.
+        """
+        array = self.Array
+        if not use_alphabets:
+            table = fromstring(mark_table(self.GapChars), UInt8)
+            return reshape(take(table, ravel(array)), array.shape)
+        groups = {}
+        for i, row in enumerate(self.Rows):
+            try:
+                gaps = row.Alphabet.Gaps
+            except AttributeError:
+                gaps = self.GapChars
+            groups.setdefault(id(gaps), (gaps, []))[1].append(i)
+        mask = zeros(array.shape, UInt8)
+        for gaps, rows in groups.values():
+            table = fromstring(mark_table(gaps), UInt8)
+            rows_array = take(array, rows)
+            rows_mask = reshape(take(table, ravel(rows_array)), \
+                rows_array.shape)
+            for i, row_mask in zip(rows, rows_mask):
+                mask[i] = row_mask
+        return mask
+
+    def omitGapCols(self, allowed_gap_frac=1-eps, del_rows=False, \
+        allowed_frac_bad_cols=0, row_constructor=None):
+        """Returns new alignment where all cols have <= allowed_gap_frac gaps.
+
+        As Alignment.omitGapCols, but finds the gappy columns, and with
+        del_rows the rows with data in them, from gap masks of the array.
+        """
+        array = self.Array
+        if array is None:
+            return super(DenseAlignment, self).omitGapCols(allowed_gap_frac, \
+                del_rows, allowed_frac_bad_cols, row_constructor)
+        if row_constructor is None:
+            row_constructor = self.RowConstructor
+        num_rows, length = array.shape
+        col_gaps = array_sum(self._gap_mask(False), 0).astype(Float64)
+        bad_cols = nonzero(greater(col_gaps / num_rows, allowed_gap_frac))
+        if not del_rows:
+            return self.getCols(bad_cols.tolist(), negate=True, \
+                row_constructor=row_constructor)
+        non_gaps = logical_not(take(self._gap_mask(), bad_cols, 1))
+        bad_counts = array_sum(non_gaps, 1).tolist()
+        rows_to_delete = {}
+        for key, count in zip(self.RowOrder, bad_counts):
+            if count and float(count) / length >= allowed_frac_bad_cols:
+                rows_to_delete[key] = True
+        good_rows = self.getRows(rows_to_delete, negate=True)
+        cols_to_keep = dict.fromkeys(range(length))
+        for c in bad_cols.tolist():
+            del cols_to_keep[c]
+        return good_rows.getCols(cols=cols_to_keep.keys(), \
+            row_constructor=row_constructor)
+
+    def omitGapRows(self, allowed_gap_frac=0):
+        """Returns new alignment with rows that have <= allowed_gap_frac.
+
+        As Alignment.omitGapRows, but counts the gaps in all rows at once.
+        """
+        array = self.Array
+        if array is None or not array.shape[1]:
+            return super(DenseAlignment, self).omitGapRows(allowed_gap_frac)
+        row_gaps = array_sum(self._gap_mask(), 1).astype(Float64)
+        ok = less_equal(row_gaps / array.shape[1], allowed_gap_frac).tolist()
+        return self.getRows([key for key, row_ok in zip(self.RowOrder, ok) \
+            if row_ok])
+
+    def omitGapRuns(self, allowed_run=1):
+        """Returns new alignment where all rows have runs of gaps <=allowed_run.
+
+        As Alignment.omitGapRuns, but finds the longest run of gaps in all 
+        rows at once: the run ending at each position is its distance from 
+        the last non-gap, found with a running maximum along the rows.
+        """
+        array = self.Array
+        if array is None or not array.shape[1]:
+            return super(DenseAlignment, self).omitGapRuns(allowed_run)
+        mask = self._gap_mask()
+        positions = arange(1, array.shape[1] + 1)
+        last_non_gap = maximum.accumulate(where(mask, 0, positions), 1)
+        longest = maximum.reduce(positions - last_non_gap, 1)
+        ok = logical_or(equal(longest, 0), less_equal(longest, allowed_run))
+        return self.getRows([key for key, row_ok in zip(self.RowOrder, \
+            ok.tolist()) if row_ok])
+
+    def columnCounts(self):
+        """Returns (symbols, counts) for the characters in each column.
+
+        symbols is the sorted list of characters in the alignment; 
+        counts[col][i] is the number of times symbols[i] is in column col. 
+        The counts are found at once for all the distinct columns (see 
+        sitePatterns), expanded to every column, and kept until the array 
+        is dropped. Returns None if Array is None.
+        """
+        array = self.Array
+        if array is None:
+            return None
+        if self._counts is None:
+            first_cols, multiplicities, site_map = self._find_patterns()
+            array = take(array, first_cols, 1)
+            codes = sort(ravel(array))
+            if len(codes):
+                is_new = concatenate(([1], not_equal(codes[1:], codes[:-1])))
+                codes = compress(is_new, codes).tolist()
+            else:
+                codes = []
+            counts = zeros((array.shape[1], len(codes)), Int)
+            for i, code in enumerate(codes):
+                counts[:, i] = array_sum(equal(array, code), 0)
+            self._counts = ([chr(c) for c in codes], take(counts, site_map))
+        return self._counts
+
+    def iterColumnFrequencies(self, constructor=Freqs):
+        """Iterates over the Freqs for each column, making them as needed.
+
+        constructor is called with a dict of the counts of each character in
+        the column (see columnCounts).
+        """
+        col_counts = self.columnCounts()
+        if col_counts is None:
+            for col in self.Cols:
+                yield constructor(col)
+            return
+        symbols, counts = col_counts
+        for col in counts.tolist():
+            result = {}
+            for s, count in zip(symbols, col):
+                if count:
+                    result[s] = count
+            yield constructor(result)
+
+    def columnFrequencies(self, constructor=Freqs):
+        """Returns Freqss with item counts for each column.
+
+        If constructor is Freqs or a subclass, makes each column's Freqs 
+        from the cached column counts (see columnCounts).
+        """
+        if self.Array is None or not (isinstance(constructor, type) and \
+            issubclass(constructor, Freqs)):
+            return super(DenseAlignment, self).columnFrequencies(constructor)
+        return list(self.iterColumnFrequencies(constructor))
+
+    def majorityConsensus(self, transform=None, constructor=Freqs):
+        """Returns list containing most frequent item at each position.
+
+        As Alignment.majorityConsensus, but finds the most frequent item in
+        each column from the column counts. Where several items tie, the 
+        column's Freqs picks one, so the result is the same as Alignment's.
+        """
+        if hasattr(self, 'ColumnFrequencies') or self.Array is None or \
+            not (isinstance(constructor, type) and \
+            issubclass(constructor, Freqs)):
+            return super(DenseAlignment, self).majorityConsensus(transform, \
+                constructor)
+        symbols, counts = self.columnCounts()
+        consensus = []
+        if symbols:
+            best = argmax(counts, 1)
+            best_counts = maximum.reduce(counts, 1)
+            num_best = array_sum(equal(counts, best_counts[:, NewAxis]), 1)
+            for i, (b, n) in enumerate(zip(best.tolist(), num_best.tolist())):
+                if n == 1:
+                    consensus.append(symbols[b])
+                else:
+                    col = list(self.iterCols([i]))[0]
+                    consensus.append(constructor(col).Mode)
+        if transform == str:
+            return ''.join(consensus)
+        elif transform:
+            return transform(consensus)
+        else:
+            return consensus
+
+    def IUPACConsensus(self, alphabet=RnaAlphabet):
+        """Returns string containing IUPAC consensus sequence of the alignment.
+
+        As Alignment.IUPACConsensus, but only looks up each distinct set of
+        characters (from the column counts) once.
+        """
+        col_counts = self.columnCounts()
+        if col_counts is None:
+            return super(DenseAlignment, self).IUPACConsensus(alphabet)
+        symbols, counts = col_counts
+        degen = alphabet.degenerateFromSequence
+        num_symbols = len(symbols)
+        present = greater(counts, 0).astype(UInt8).tostring()
+        known = {}
+        consensus = []
+        for i in range(counts.shape[0]):
+            pattern = present[i * num_symbols:(i + 1) * num_symbols]
+            if pattern not in known:
+                known[pattern] = degen([s for s, p in zip(symbols, pattern) \
+                    if p != '\x00'])
+            consensus.append(known[pattern])
+        return ''.join(consensus)
+
+    def uncertainties(self, good_items=None):
+        """Returns Shannon uncertainty at each position.
+
+        As Alignment.uncertainties, but finds the uncertainties of all the
+        columns at once from the column counts.
+        """
+        col_counts = self.columnCounts()
+        if hasattr(self, 'ColumnProbs') or col_counts is None:
+            return super(DenseAlignment, self).uncertainties(good_items)
+        symbols, counts = col_counts
+        if good_items:
+            keep = [i for i, s in enumerate(symbols) if s in good_items]
+            counts = take(counts, keep, 1)
+        if not counts.shape[1]:
+            return [0] * counts.shape[0]
+        counts = counts.astype(Float64)
+        totals = array_sum(counts, 1)
+        probs = counts / where(totals, totals, 1)[:, NewAxis]
+        logs = log(where(probs, probs, 1)) / log(2)
+        return (-array_sum(probs * logs, 1)).tolist()
+
+def kmer_counts(seq, k):
+    """Returns dict of {kmer: number of times in seq} for the k-mers in seq.
+
+    k-mers are slices of seq if seq is a string, tuples otherwise.
+    """
+    result = {}
+    is_string = isinstance(seq, str)
+    for i in range(len(seq) - k + 1):
+        kmer = seq[i:i + k]
+        if not is_string:
+            kmer = tuple(kmer)
+        result[kmer] = result.get(kmer, 0) + 1
+    return result
+
+class KmerIndex(object):
+    """Index of the k-mers in the rows of an alignment, for getSimilar.
+
+    Build once for an alignment and pass as the index to its getSimilar to
+    skip the rows that can't be similar enough to the target. Uses the 
+    q-gram lemma: each mismatch between two sequences changes at most k of
+    the k-mers starting at the positions they share, so sequences of 
+    (shorter) length m with at most e mismatches share at least
+    m - k + 1 - k*e k-mers. Only valid for frac_same (and fracSame), which
+    count matches over the length of the shorter sequence.
+
+    Each k-mer is coded as a number, its items being digits in base the 
+    number of distinct items in the alignment. The index keeps sorted 
+    arrays of the k-mer codes in each row, with the row and the number of 
+    times it has the k-mer, so a target's k-mers are looked up all at once.
+
+    Longer k-mers are shared by chance less often, so fewer unrelated rows
+    are looked at, but the bound gets weaker: it rules nothing out once 
+    k*e > m - k, e.g. for 1500 long sequences with k=8 and min_similarity 
+    below 0.875.
+
+    The index is a snapshot: rebuild it if the alignment changes.
+    """
+    def __init__(self, alignment, k=8):
+        """Returns new KmerIndex of the rows of alignment, using k-mers of k.
+
+        Raises ValueError if the codes of the k-mers (and rows) are too big
+        to hold exactly.
+        """
+        self.K = k
+        self.RowOrder = list(alignment.RowOrder)
+        rows = [alignment[key] for key in self.RowOrder]
+        num_rows = len(rows)
+        self.Lengths = array(map(len, rows), Int)
+        items = {}
+        for row in rows:
+            items.update(dict.fromkeys(row))
+        self.Symbols = dict([(s, i) for i, s in enumerate(sorted(items))])
+        self.Base = max(len(self.Symbols), 1)
+        if float(self.Base) ** k * max(num_rows, 1) >= 2 ** 53:
+            raise ValueError, "k-mers of %s items can't be coded exactly" % k
+        self._kmers = zeros(0, Float64)
+        self._rows = zeros(0, Int)
+        self._counts = zeros(0, Int)
+        width = max([0] + self.Lengths.tolist()) - k + 1
+        if width < 1 or not num_rows:
+            return
+        #code each item by its index in Symbols
+        if self._all_strings(rows):
+            table = zeros(256, Int)
+            for s, i in self.Symbols.items():
+                table[ord(s)] = i
+            data = encode_seqs(rows)[0]
+            codes = reshape(take(table, ravel(data)), data.shape)
+        else:
+            codes = zeros((num_rows, width + k - 1), Int)
+            for i, row in enumerate(rows):
+                if len(row):
+                    codes[i, :len(row)] = [self.Symbols[s] for s in row]
+        kmers = zeros((num_rows, width), Float64)
+        for i in range(k):
+            kmers = kmers * self.Base + codes[:, i:i + width]
+        valid = ravel(less_equal(arange(k, width + k)[NewAxis, :], \
+            self.Lengths[:, NewAxis]))
+        row_ids = ravel(zeros((num_rows, width), Int) + \
+            arange(num_rows)[:, NewAxis])
+        kmers = compress(valid, ravel(kmers))
+        row_ids = compress(valid, row_ids)
+        if not len(kmers):
+            return
+        order = argsort(kmers * num_rows + row_ids)
+        kmers = take(kmers, order)
+        row_ids = take(row_ids, order)
+        is_new = concatenate(([1], logical_or(not_equal(kmers[1:], \
+            kmers[:-1]), not_equal(row_ids[1:], row_ids[:-1]))))
+        starts = nonzero(is_new)
+        self._kmers = take(kmers, starts)
+        self._rows = take(row_ids, starts)
+        self._counts = concatenate((starts[1:], [len(kmers)])) - starts
+
+    def _all_strings(self, rows):
+        """Returns True if all the rows are strings."""
+        for row in rows:
+            if not isinstance(row, str):
+                return False
+        return True
+
+    def sharedCounts(self, target):
+        """Returns array of the number of k-mers each row shares with target.
+
+        A k-mer that is n times in target and m times in a row counts 
+        min(n, m) times. Only the rows with each k-mer of target are visited.
+        """
+        shared = zeros(len(self.RowOrder), Int)
+        codes = []
+        target_counts = []
+        for kmer, count in kmer_counts(target, self.K).items():
+            code = 0
+            for item in kmer:
+                if item not in self.Symbols:
+                    break
+                code = code * self.Base + self.Symbols[item]
+            else:
+                codes.append(code)
+                target_counts.append(count)
+        if not codes or not len(self._kmers):
+            return shared
+        codes = array(codes, Float64)
+        starts = searchsorted(self._kmers, codes).tolist()
+        ends = searchsorted(self._kmers, codes + 0.5).tolist()
+        found = [arange(start, end) for start, end in zip(starts, ends) \
+            if end > start]
+        if not found:
+            return shared
+        found = concatenate(found)
+        sizes = array(ends) - array(starts)
+        counts = minimum(take(self._counts, found), \
+            repeat(array(target_counts), sizes))
+        rows = take(self._rows, found)
+        #total the counts for each row
+        order = argsort(rows)
+        rows = take(rows, order)
+        totals = add.accumulate(take(counts, order))
+        last = nonzero(concatenate((not_equal(rows[1:], rows[:-1]), [1])))
+        totals = take(totals, last)
+        totals = totals - concatenate(([0], totals[:-1]))
+        put(shared, take(rows, last), totals)
+        return shared
+
+    def candidates(self, target, min_similarity):
+        """Returns keys of rows whose frac_same with target may be enough.
+
+        Every row with frac_same(target, row) >= min_similarity is included,
+        in RowOrder; rows the q-gram bound rules out are left out.
+        """
+        if min_similarity <= 0:
+            return self.RowOrder[:]
+        lengths = minimum(self.Lengths, len(target))
+        denominators = where(lengths, lengths, 1).astype(Float64)
+        #smallest number of matches giving frac_same >= min_similarity
+        needed = ceil(lengths * min_similarity).astype(Int)
+        needed = where(greater_equal((needed - 1) / denominators, \
+            min_similarity), needed - 1, needed)
+        needed = where(less(needed / denominators, min_similarity), \
+            needed + 1, needed)
+        bound = lengths - self.K + 1 - self.K * (lengths - needed)
+        ok = logical_and(logical_and(lengths, less_equal(needed, lengths)), \
+            greater_equal(self.sharedCounts(target), bound))
+        return [key for key, key_ok in zip(self.RowOrder, ok.tolist()) \
+            if key_ok]
+
 def make_gap_filter(template, gap_fraction, gap_run):
     """Returns f(seq) -> True if no gap runs and acceptable gap fraction.
 
@@ -41,6 +41,7 @@ from old_cogent.util.transform import allchars, keep_chars
 from sets import Set, ImmutableSet
 from random import choice
 from string import maketrans, upper
+from Numeric import array, fromstring, nonzero, where, add, Int, UInt8
 
 class FoundMatch(Exception):
     """Raised when a match is found in a deep loop to skip many levels"""
@@ -210,8 +211,33 @@ def PairMaker(pairs=None, monomers=None, gaps=None, degenerates=None):
     return result
 
 
+def mark_table(symbols, inverse=False):
+    """Returns translation table marking the single characters in symbols.
+
+    The table maps each character in symbols to '\\x01' and every other 
+    character to '\\x00', or the other way round if inverse is True. 
+    Translating a string with it and then using find(), count() etc. does
+    a per-character test on the whole string at once.
+    """
+    if inverse:
+        marks = ['\x01'] * 256
+        mark = '\x00'
+    else:
+        marks = ['\x00'] * 256
+        mark = '\x01'
+    for i in symbols:
+        if len(i) == 1:
+            marks[ord(i)] = mark
+    return ''.join(marks)
+
 def first_(attrname, inverse=False):
     def first(self, sequence):
+        if isinstance(sequence, str):
+            index = sequence.translate(self._marks(attrname, inverse)).find(\
+                '\x01')
+            if index < 0:
+                return None
+            return index
         attr = getattr(self, attrname)
         for i, s in enumerate(sequence):
             if (not inverse and s in attr) \
@@ -262,6 +288,8 @@ class Alphabet(object):
             self._add_lowercase()
         self._make_all()
         self._make_comp_table()
+        self._make_code_tables()
+        self._mark_tables = {}
         self.GapString = ''.join(self.Gaps.keys())
         self.stripDegenerate = FunctionWrapper(
             keep_chars(self.GapString+self.Order))
@@ -322,6 +350,57 @@ class Alphabet(object):
         if self.Complements:
             self.ComplementTable = maketrans(''.join(self.Complements.keys()), 
                                              ''.join(self.Complements.values()))
+
+    def _make_code_tables(self):
+        """Sets tables for encoding sequences as one byte per character.
+
+        The code of each character is its index in self.Codes, a string of
+        all 256 characters: self.Order first, then the other symbols in
+        self.All (sorted), then every other character. Codes below
+        self.NumSymbols are symbols self knows about. self.EncodeTable is 
+        the translation table from characters to codes, and self.Codes is
+        itself the table from codes back to characters. IsGapCode and
+        IsDegenerateCode are Int arrays that are 1 at the codes of gaps and
+        of degenerate symbols respectively.
+        """
+        symbols = list(self.Order)
+        others = [i for i in self.All if len(i) == 1 and i not in symbols]
+        others.sort()
+        symbols.extend(others)
+        self.NumSymbols = len(symbols)
+        known = dict.fromkeys(symbols)
+        symbols.extend([i for i in allchars if i not in known])
+        self.Codes = ''.join(symbols)
+        self.EncodeTable = maketrans(self.Codes, allchars)
+        self.IsGapCode = array([i in self.Gaps for i in self.Codes], Int)
+        self.IsDegenerateCode = array([i in self.Degenerates for i in \
+            self.Codes], Int)
+
+    def _marks(self, attrname, inverse=False):
+        """Returns mark_table for self.attrname, made on first use.
+
+        The tables are cached, so they will be stale if attrname changes
+        afterwards (see the note in __init__ about changing Alphabets).
+        """
+        key = (attrname, inverse)
+        table = self._mark_tables.get(key)
+        if table is None:
+            table = mark_table(getattr(self, attrname), inverse)
+            self._mark_tables[key] = table
+        return table
+
+    def encode(self, sequence):
+        """Returns UInt8 array of the codes of the characters in sequence.
+
+        See _make_code_tables for the codes; sequence can be any string, 
+        and decode(result) gives it back.
+        """
+        return fromstring(str(sequence).translate(self.EncodeTable), UInt8)
+
+    def decode(self, codes):
+        """Returns string of the characters for codes (see encode)."""
+        return array(codes, UInt8).tostring().translate(self.Codes)
+
     def complement(self, item):
         """Returns complement of item, using data from self.Complements.
        
@@ -394,37 +473,10 @@ class Alphabet(object):
     
     firstNonValidStrict = first_('Order', inverse=True)
 
-    def firstGap(self, sequence):
-        """Returns the index of the first gap in the sequence, or None."""
-        gap = self.Gaps
-        for i, s in enumerate(sequence):
-            if s in gap:
-                return i
-        return None
-
-    def firstDegenerate(self, sequence):
-        """Returns the index of first degenerate symbol in sequence, or None."""
-        degen = self.Degenerates
-        for i, s in enumerate(sequence):
-            if s in degen:
-                return i
-        return None
-
-    def firstInvalid(self, sequence):
-        """Returns the index of first invalid symbol in sequence, or None."""
-        all = self.All
-        for i, s in enumerate(sequence):
-            if not s in all:
-                return i
-        return None
-
-    def firstNonStrict(self, sequence):
-        """Returns the index of first non-strict symbol in sequence, or None."""
-        monomers = self.Monomers
-        for i, s in enumerate(sequence):
-            if not s in monomers:
-                return i
-        return None
+    firstGap = first_('Gaps')
+    firstDegenerate = first_('Degenerates')
+    firstInvalid = first_('All', inverse=True)
+    firstNonStrict = first_('Monomers', inverse=True)
 
     def disambiguate(self, sequence, method='strip'):
         """Returns a non-degenerate sequence from a degenerate one.
@@ -468,15 +520,35 @@ class Alphabet(object):
                 return not x in gap
             return sequence.__class__(filter(not_gap, sequence))
 
+    def _gap_mask(self, sequence):
+        """Returns UInt8 array that is 1 at the gaps in sequence."""
+        if isinstance(sequence, str):
+            return fromstring(sequence.translate(self._marks('Gaps')), UInt8)
+        return array(map(self.isGap, sequence), UInt8)
+
     def gapList(self, sequence):
         """Returns list of indices of all gaps in the sequence, or []."""
-        gaps = self.Gaps
-        return [i for i, s in enumerate(sequence) if s in gaps]
+        return nonzero(self._gap_mask(sequence)).tolist()
 
     def gapVector(self, sequence):
         """Returns list of bool indicating gap or non-gap in sequence."""
+        if isinstance(sequence, str):
+            return map(bool, map(ord, sequence.translate(self._marks('Gaps'))))
         return map(self.isGap, sequence)
 
+    def gapMapArrays(self, sequence):
+        """Returns arrays mapping between gapped and ungapped positions.
+
+        First element is an Int array a such that a[ungapped_coord] =
+        gapped_coord. Second element is an Int array b such that 
+        b[gapped_coord] = ungapped_coord, or -1 at the gaps. These hold the
+        same information as the dicts from gapMaps in far less space.
+        """
+        is_base = 1 - self._gap_mask(sequence).astype(Int)
+        gapped = nonzero(is_base)
+        ungapped = where(is_base, add.accumulate(is_base) - 1, -1)
+        return gapped, ungapped
+
     def gapMaps(self, sequence):
         """Returns tuple containing dicts mapping between gapped and ungapped.
 
@@ -490,20 +562,15 @@ class Alphabet(object):
         'if pos in d' to avoid KeyErrors if looking up all elements in a gapped
         sequence.
         """
-        ungapped = {}
-        gapped = {}
-        num_gaps = 0
-        for i, is_gap in enumerate(self.gapVector(sequence)):
-            if is_gap:
-                num_gaps += 1
-            else:
-                ungapped[i] = i - num_gaps
-                gapped[i - num_gaps] = i
-        return gapped, ungapped
-        
+        gapped = self.gapMapArrays(sequence)[0].tolist()
+        return dict(zip(range(len(gapped)), gapped)), \
+            dict(zip(gapped, range(len(gapped))))
+
 
     def countGaps(self, sequence):
         """Counts the gaps in the specified sequence."""
+        if isinstance(sequence, str):
+            return sequence.translate(self._marks('Gaps')).count('\x01')
         gaps = self.Gaps
         gap_count = 0
         for s in sequence:
@@ -513,6 +580,8 @@ class Alphabet(object):
 
     def countDegenerate(self, sequence):
         """Counts the degenerate bases in the specified sequence."""
+        if isinstance(sequence, str):
+            return sequence.translate(self._marks('Degenerates')).count('\x01')
         degen = self.Degenerates
         degen_count = 0
         for s in sequence:
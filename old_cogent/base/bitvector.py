@@ -110,6 +110,10 @@ from string import maketrans
 from operator import and_, or_, xor
 from math import log
 from sys import maxint
+from bisect import bisect_right
+from mmap import mmap, ACCESS_READ
+from Numeric import array, fromstring, ravel, transpose, concatenate, \
+    zeros, UInt8
 
 _bits_in_int = int(round(log(maxint, 2)))
 
@@ -821,3 +825,181 @@ class PackedBases(LongBitvector):
             num2base = self._dna_bases
         return ''.join([num2base[i] for i in bits])
 
+def _code_table(bases, codes):
+    """Returns translation table mapping bases to codes, others to chr(0)."""
+    table = [chr(0)] * 256
+    for base, code in zip(bases, codes):
+        table[ord(base)] = code
+    return ''.join(table)
+
+class PackedSequence(object):
+    """Stores a nucleotide sequence as 2 bits per base in a byte string.
+
+    Uses the same encoding as PackedBases (A == 00, G == 01, U/T == 10, 
+    C == 11), four bases to a byte with the first base in the high bits.
+    Unlike PackedBases, the packed data is a string (or a read-only mmap 
+    from load_packed) rather than a long, so subsequences can be unpacked 
+    without touching the rest of the data, and len() is in bases.
+
+    Other characters (N, degenerate symbols, gaps) are kept in a separate 
+    list of exceptions: Exceptions is a list of (start, end, char) for each
+    run of the same character, and the packed data holds A at those 
+    positions. The case of A, C, G, T and U is not kept, as in PackedBases.
+
+    Rna controls whether str() and slicing produce RNA or DNA.
+    """
+    _sequence_to_codes = _code_table('AGUTCagutc', '\x00\x01\x02\x02\x03' \
+        '\x00\x01\x02\x02\x03')
+    _rna_bases = maketrans('\x00\x01\x02\x03', 'AGUC')
+    _dna_bases = maketrans('\x00\x01\x02\x03', 'AGTC')
+    _exception_runs = re.compile(r'([^ACGTUacgtu])\1*')
+
+    def __init__(self, sequence='', Rna=True):
+        """Packs the bases in sequence, keeping other characters as runs."""
+        sequence = str(sequence)
+        self.Rna = Rna
+        self._length = len(sequence)
+        self.Exceptions = [(m.start(), m.end(), m.group(1)) for m in \
+            self._exception_runs.finditer(sequence)]
+        codes = fromstring(sequence.translate(self._sequence_to_codes), UInt8)
+        padding = -len(codes) % 4
+        if padding:
+            codes = concatenate((codes, zeros(padding, UInt8)))
+        packed = (codes[0::4] << 6) | (codes[1::4] << 4) | \
+            (codes[2::4] << 2) | codes[3::4]
+        self._set_data(packed.astype(UInt8).tostring(), 0)
+
+    def _set_data(self, data, offset):
+        """Sets the packed data (string or mmap) and the start of self in it.
+        
+        Also indexes the exceptions by their end positions for slicing.
+        """
+        self._data = data
+        self._offset = offset
+        self._exception_ends = [end for start, end, char in self.Exceptions]
+
+    def __len__(self):
+        """Returns the number of bases."""
+        return self._length
+
+    def __str__(self):
+        """Returns the whole sequence as a string."""
+        return self[0:self._length]
+
+    def __getitem__(self, index):
+        """Returns base at index, or string of bases in slice."""
+        if isinstance(index, slice):
+            start, end, step = index.indices(self._length)
+            if step != 1:
+                return str(self)[index]
+            return self._unpack(start, end)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError, "PackedSequence index out of range"
+        return self._unpack(index, index + 1)
+
+    def __getslice__(self, start, end):
+        """Returns string of bases from start to end (Python 2 slicing)."""
+        return self[slice(max(start, 0), max(end, 0))]
+
+    def _unpack(self, start, end):
+        """Returns string of bases from start to end (0 <= start, end <= len).
+
+        Reads only the bytes that hold these bases, then puts back the
+        exceptions that overlap them.
+        """
+        if end <= start:
+            return ''
+        first_byte = self._offset + start // 4
+        packed = fromstring(self._data[first_byte:self._offset + \
+            (end + 3) // 4], UInt8)
+        codes = ravel(transpose(array([packed >> 6, (packed >> 4) & 3, \
+            (packed >> 2) & 3, packed & 3])))
+        if self.Rna:
+            table = self._rna_bases
+        else:
+            table = self._dna_bases
+        skip = start % 4
+        bases = codes.astype(UInt8).tostring().translate(table)[skip:\
+            skip + end - start]
+        exceptions = self.Exceptions
+        i = bisect_right(self._exception_ends, start)
+        if i == len(exceptions) or exceptions[i][0] >= end:
+            return bases
+        pieces = []
+        curr = start
+        while i < len(exceptions) and exceptions[i][0] < end:
+            run_start, run_end, char = exceptions[i]
+            run_start, run_end = max(run_start, start), min(run_end, end)
+            pieces.append(bases[curr - start:run_start - start])
+            pieces.append(char * (run_end - run_start))
+            curr = run_end
+            i += 1
+        pieces.append(bases[curr - start:])
+        return ''.join(pieces)
+
+    def toFile(self, outfile, name):
+        """Writes self to open file outfile, labeled with name.
+
+        Writes a header line (name, length, number of exceptions, number of
+        packed bytes, Rna), a line for each exception and then the packed
+        data. name must not contain tabs or newlines.
+        """
+        num_bytes = (self._length + 3) // 4
+        outfile.write('%s\t%s\t%s\t%s\t%s\n' % (name, self._length, \
+            len(self.Exceptions), num_bytes, int(self.Rna)))
+        for start, end, char in self.Exceptions:
+            outfile.write('%s\t%s\t%s\n' % (start, end, ord(char)))
+        outfile.write(self._data[self._offset:self._offset + num_bytes])
+
+def save_packed(seqs, filename):
+    """Writes seqs to filename as PackedSequences, to be read by load_packed.
+
+    seqs: dict of name -> sequence, where each sequence is a PackedSequence
+    or anything that can be packed (which is then packed as RNA).
+    """
+    outfile = open(filename, 'wb')
+    try:
+        for name, seq in seqs.items():
+            if not isinstance(seq, PackedSequence):
+                seq = PackedSequence(seq)
+            seq.toFile(outfile, name)
+    finally:
+        outfile.close()
+
+def load_packed(filename):
+    """Returns dict of name -> PackedSequence from a file from save_packed.
+
+    The file is memory-mapped read-only, and the sequences unpack bases from
+    the map as they are sliced, so opening even a very large file only reads
+    the headers and exceptions. Processes that load the same file share the
+    pages of the map through the operating system's cache.
+    """
+    infile = open(filename, 'rb')
+    try:
+        seqs = {}
+        headers = []
+        while True:
+            line = infile.readline()
+            if not line:
+                break
+            name, length, num_exceptions, num_bytes, rna = \
+                line.rstrip('\n').split('\t')
+            seq = PackedSequence(Rna=bool(int(rna)))
+            seq._length = int(length)
+            exceptions = []
+            for i in range(int(num_exceptions)):
+                start, end, char = infile.readline().split()
+                exceptions.append((int(start), int(end), chr(int(char))))
+            seq.Exceptions = exceptions
+            headers.append((seq, infile.tell()))
+            seqs[name] = seq
+            infile.seek(int(num_bytes), 1)
+        if headers:
+            data = mmap(infile.fileno(), 0, access=ACCESS_READ)
+            for seq, offset in headers:
+                seq._set_data(data, offset)
+    finally:
+        infile.close()
+    return seqs
@@ -90,9 +90,15 @@ from old_cogent.parse.record import MappedRecord
 from old_cogent.util.misc import Delegator, ConstrainedString, ConstrainedList, \
     ConstrainedContainer, ConstraintError, DistanceFromMatrix
 from old_cogent.base.info import Info as InfoClass
-from old_cogent.base.alphabet import DnaAlphabet, RnaAlphabet, ProteinAlphabet
+from old_cogent.base.alphabet import DnaAlphabet, RnaAlphabet, ProteinAlphabet, \
+    mark_table
 from string import maketrans
 from operator import eq, ne
+from Numeric import array, zeros, take, compress, nonzero, sometrue, \
+    greater_equal, equal, not_equal, less, minimum, maximum, where, \
+    logical_and, logical_or, logical_not, fromstring, reshape, ravel, \
+    sort, concatenate, arange, sum as array_sum, ArrayType, NewAxis, Int, \
+    Float64, UInt8
 
 #standard distance functions: left  because generally useful
 frac_same = for_seq(f=eq, aggregator=sum, normalizer=per_shortest)
@@ -727,6 +733,279 @@ class MutableProteinSequence(MutableSequence):
         """Returns immutable version of self."""
         return ProteinSequence(self, Info=self.Info)
 
+class EncodedSequence(object):
+    """Holds a sequence as an array with one byte per position.
+
+    Data is a UInt8 array of the codes of the characters (see 
+    Alphabet.encode), so a sequence takes about a byte per position rather
+    than the string or list of strings of a Sequence or MutableSequence.
+
+    EncodedSequence(seq) encodes a Sequence, MutableSequence or string, and
+    toSequence() turns it back into a Sequence: both are done by string 
+    translation. Data may also be an array of codes or another
+    EncodedSequence, which are used without re-encoding.
+
+    The Alphabet and the class returned by toSequence() are class data: 
+    use EncodedRnaSequence etc., or set Alphabet in a subclass, since the 
+    generic class has no alphabet to encode with.
+    """
+    Alphabet = None
+    SequenceClass = Sequence
+
+    def __init__(self, data='', Info=None):
+        """Returns new EncodedSequence holding the codes for data."""
+        if self.Alphabet is None:
+            raise TypeError, "EncodedSequence needs an Alphabet: use a subclass"
+        if Info is None:
+            Info = getattr(data, 'Info', None)
+        self.Info = Info
+        if isinstance(data, EncodedSequence):
+            self.Data = data.Data
+        elif isinstance(data, ArrayType):
+            self.Data = array(data, UInt8)
+        else:
+            self.Data = self.Alphabet.encode(data)
+
+    def __len__(self):
+        """Returns number of positions."""
+        return len(self.Data)
+
+    def __str__(self):
+        """Returns the sequence as a string."""
+        return self.Alphabet.decode(self.Data)
+
+    def __iter__(self):
+        """Iterates over the characters of the sequence."""
+        return iter(str(self))
+
+    def __getitem__(self, index):
+        """Returns character at index, or EncodedSequence for a slice."""
+        if isinstance(index, slice):
+            return self.__class__(self.Data[index], Info=self.Info)
+        return self.Alphabet.Codes[self.Data[index]]
+
+    def __getslice__(self, start, end):
+        """Returns EncodedSequence for the slice (Python 2 slicing)."""
+        return self[slice(max(start, 0), max(end, 0))]
+
+    def __cmp__(self, other):
+        """Compares equal to a sequence or string with the same characters."""
+        return cmp(str(self), str(other))
+
+    def __hash__(self):
+        """Hashes as the string of the sequence does."""
+        return hash(str(self))
+
+    def toSequence(self):
+        """Returns the sequence as an object of self.SequenceClass."""
+        return self.SequenceClass(str(self), Info=self.Info)
+
+    def _gap_mask(self):
+        """Returns Int array that is 1 at gap positions."""
+        return take(self.Alphabet.IsGapCode, self.Data)
+
+    def isGapped(self):
+        """Returns True if sequence contains gaps."""
+        return bool(sometrue(self._gap_mask()))
+
+    def isValid(self):
+        """Returns True if sequence contains no items absent from alphabet."""
+        return not sometrue(greater_equal(self.Data, self.Alphabet.NumSymbols))
+
+    def gapList(self):
+        """Returns list of indices of all gaps in the sequence, or []."""
+        return nonzero(self._gap_mask()).tolist()
+
+    def gapVector(self):
+        """Returns vector of True or False according to which pos are gaps."""
+        return map(bool, self._gap_mask().tolist())
+
+    def countGaps(self):
+        """Counts the gaps in the specified sequence."""
+        return int(array_sum(self._gap_mask()))
+
+    def countDegenerate(self):
+        """Counts the degenerate bases in the specified sequence."""
+        return int(array_sum(take(self.Alphabet.IsDegenerateCode, self.Data)))
+
+    def degap(self):
+        """Returns EncodedSequence with all the gaps deleted."""
+        return self.__class__(compress(1 - self._gap_mask(), self.Data), \
+            Info=self.Info)
+
+class EncodedDnaSequence(EncodedSequence):
+    """Holds a DNA sequence as one byte per position."""
+    Alphabet = DnaAlphabet
+    SequenceClass = DnaSequence
+
+class EncodedRnaSequence(EncodedSequence):
+    """Holds an RNA sequence as one byte per position."""
+    Alphabet = RnaAlphabet
+    SequenceClass = RnaSequence
+
+class EncodedProteinSequence(EncodedSequence):
+    """Holds a Protein sequence as one byte per position."""
+    Alphabet = ProteinAlphabet
+    SequenceClass = ProteinSequence
+
+def encode_seqs(seqs):
+    """Returns (data, lengths) holding seqs as one array of character codes.
+
+    data is a UInt8 array with a row for each sequence, holding the byte
+    values of its characters padded with 0 to the length of the longest;
+    lengths is an Int array of the sequence lengths. The batch distance
+    functions (frac_same_many etc.) compare a sequence with every row at
+    once. Items of seqs must be strings or sequences of characters.
+    """
+    strings = map(str, seqs)
+    lengths = array(map(len, strings), Int)
+    data = zeros((len(strings), max([0] + lengths.tolist())), UInt8)
+    for i, s in enumerate(strings):
+        if s:
+            data[i, :len(s)] = fromstring(s, UInt8)
+    return data, lengths
+
+def _batch_setup(target, data, lengths):
+    """Returns (codes, rows, valid, shortest) for comparing target with data.
+
+    codes is target as a UInt8 array and rows is data, both cut to the 
+    shorter of target and data; valid is 1 where target and each row both
+    have a character; shortest is min(len(target), length) for each row.
+    """
+    target = str(target)
+    width = min(len(target), data.shape[1])
+    codes = fromstring(target[:width], UInt8)
+    valid = less(arange(width)[NewAxis, :], lengths[:, NewAxis])
+    return codes, data[:, :width], valid, minimum(lengths, len(target))
+
+def _per_count(totals, counts):
+    """Returns totals / counts as Float64, with 0 where counts is 0."""
+    return where(counts, totals.astype(Float64) / maximum(counts, 1), 0.0)
+
+def _batch_gap_masks(target, codes, rows, gaps):
+    """Returns (target_gaps, row_gaps): 1 at gaps in codes and rows.
+
+    gaps defaults to target.Alphabet.Gaps, as in SequenceI.fracSameNonGaps.
+    """
+    if gaps is None:
+        gaps = target.Alphabet.Gaps
+    table = fromstring(mark_table(gaps), UInt8)
+    return take(table, codes), reshape(take(table, ravel(rows)), rows.shape)
+
+def frac_same_many(target, data, lengths):
+    """Returns array of fracSame of target with each sequence in data.
+
+    data and lengths are from encode_seqs. As SequenceI.fracSame, compares
+    to the end of the shorter sequence, giving 0 if either is empty.
+    """
+    codes, rows, valid, shortest = _batch_setup(target, data, lengths)
+    same = array_sum(logical_and(equal(rows, codes), valid), 1)
+    return _per_count(same, shortest)
+
+def frac_diff_many(target, data, lengths):
+    """Returns array of fracDiff of target with each sequence in data.
+
+    As frac_same_many, but counts the positions that differ.
+    """
+    codes, rows, valid, shortest = _batch_setup(target, data, lengths)
+    diff = array_sum(logical_and(not_equal(rows, codes), valid), 1)
+    return _per_count(diff, shortest)
+
+def _non_gap_counts(target, data, lengths, gaps):
+    """Returns (rows, codes, both, count) for the gap-aware batch functions.
+
+    both is 1 where target and the row both have a non-gap character, and
+    count is the number of such positions in each row.
+    """
+    codes, rows, valid, shortest = _batch_setup(target, data, lengths)
+    target_gaps, row_gaps = _batch_gap_masks(target, codes, rows, gaps)
+    both = logical_and(valid, logical_not(logical_or(row_gaps, target_gaps)))
+    return codes, rows, both, array_sum(both, 1)
+
+def frac_same_non_gaps_many(target, data, lengths, gaps=None):
+    """Returns array of fracSameNonGaps of target with each seq in data.
+
+    As SequenceI.fracSameNonGaps, skips positions where either sequence
+    has a gap (by default, one of target.Alphabet.Gaps) and gives 0 if
+    there are no positions left.
+    """
+    codes, rows, both, count = _non_gap_counts(target, data, lengths, gaps)
+    same = array_sum(logical_and(equal(rows, codes), both), 1)
+    return _per_count(same, count)
+
+def frac_diff_non_gaps_many(target, data, lengths, gaps=None):
+    """Returns array of fracDiffNonGaps of target with each seq in data.
+
+    As frac_same_non_gaps_many, but counts the positions that differ.
+    """
+    codes, rows, both, count = _non_gap_counts(target, data, lengths, gaps)
+    diff = array_sum(logical_and(not_equal(rows, codes), both), 1)
+    return _per_count(diff, count)
+
+def frac_similar_many(target, data, lengths, similar_pairs):
+    """Returns array of fracSimilar of target with each sequence in data.
+
+    similar_pairs is as for SequenceI.fracSimilar: (i, j) is a key if the
+    characters i (in target) and j are similar.
+    """
+    codes, rows, valid, shortest = _batch_setup(target, data, lengths)
+    table = zeros(256 * 256, UInt8)
+    for pair in similar_pairs:
+        if len(pair) == 2 and len(pair[0]) == len(pair[1]) == 1:
+            table[ord(pair[0]) * 256 + ord(pair[1])] = 1
+    pairs = codes.astype(Int) * 256 + rows
+    similar = reshape(take(table, ravel(pairs)), pairs.shape)
+    return _per_count(array_sum(logical_and(similar, valid), 1), shortest)
+
+def distance_many(target, data, lengths, function=None):
+    """Returns array of distance from target to each sequence in data.
+
+    As SequenceI.distance: the sum of function(i, j) over the positions up
+    to the end of the shorter sequence, where function defaults to 
+    counting the differences. function is called once for each distinct
+    pair of characters that occurs, and the values are summed as Float64.
+    """
+    codes, rows, valid, shortest = _batch_setup(target, data, lengths)
+    if function is None:
+        return array_sum(logical_and(not_equal(rows, codes), valid), 1\
+            ).astype(Float64)
+    pairs = where(valid, codes.astype(Int) * 256 + rows, 256 * 256)
+    flat = sort(ravel(pairs))
+    if len(flat):
+        distinct = compress(concatenate(([1], not_equal(flat[1:], \
+            flat[:-1]))), flat)
+    else:
+        distinct = flat
+    table = zeros(256 * 256 + 1, Float64)
+    for pair in distinct.tolist():
+        if pair < 256 * 256:
+            table[pair] = function(chr(pair // 256), chr(pair % 256))
+    values = reshape(take(table, ravel(pairs)), pairs.shape)
+    return array_sum(values, 1)
+
+def pairwise_matrix(seqs, batch_f, *args):
+    """Returns Float64 array of batch_f results for each pair of seqs.
+
+    batch_f is one of the batch functions such as frac_same_many, and args
+    are its extra arguments. result[i][j] is the value for seqs[i] as the
+    target against seqs[j]. Encodes seqs once, then compares each sequence
+    with all of them at once.
+    """
+    data, lengths = encode_seqs(seqs)
+    result = zeros((len(seqs), len(seqs)), Float64)
+    for i, seq in enumerate(seqs):
+        result[i] = batch_f(seq, data, lengths, *args)
+    return result
+
+#batch versions of the per-pair metrics, for Alignment.getSimilar and
+#Alignment.distanceMatrix
+batch_metrics = {frac_same:frac_same_many, frac_diff:frac_diff_many,
+    SequenceI.fracSame.im_func:frac_same_many, 
+    SequenceI.fracDiff.im_func:frac_diff_many,
+    SequenceI.fracSameNonGaps.im_func:frac_same_non_gaps_many,
+    SequenceI.fracDiffNonGaps.im_func:frac_diff_non_gaps_many,
+    SequenceI.distance.im_func:distance_many}
+
 def SequenceCleaner(constructor=Sequence, validator=None, coercer=None, 
     translator=None):
     """Returns a factory function that produces valid Sequence objects.
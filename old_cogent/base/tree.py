@@ -63,8 +63,10 @@ of attributes.
 from copy import deepcopy
 from old_cogent.util.misc import ClassChecker, Delegator, ConstrainedList, \
     ConstraintError
-from Numeric import array, resize, sqrt, zeros, nonzero, take
+from Numeric import array, resize, sqrt, zeros, nonzero, take, arange, \
+    compress, less, less_equal, where, put, Int, Float64, UInt8, NewAxis
 from MLab import mean, std as stdev
+from old_cogent.maths.matrix.distance import DistanceMatrix
 from random import choice
 
 class TreeError(Exception):
@@ -78,7 +80,13 @@ class DuplicateNodeError(TreeError):
 class TreeNode(ConstrainedList, Delegator):
     """Holds information about generic tree: nodes forward to self.Data."""
 
-    _exclude_from_copy = dict.fromkeys(['_handler', '_data', '_parent'])
+    _exclude_from_copy = dict.fromkeys(['_handler', '_data', '_parent', \
+        '_index_token'])
+
+    #set by indices such as LcaIndex on each node they cover, and cleared on
+    #a node and its ancestors when the children change, so that an index can
+    #tell from its root whether it needs rebuilding
+    _index_token = None
     
     def __init__(self, Data=None, Children=None, Parent=None):
         """Returns new TreeNode, intialized with Data and maybe Children/Parent.
@@ -191,7 +199,8 @@ class TreeNode(ConstrainedList, Delegator):
         """Mutator for parent: cleans up ref from old parent."""
         if Parent is self:
             raise TreeError, "Can't make node %s its own parent." % `self`
-        if hasattr(Parent, 'Ancestors'):
+        #a node with no children can't be an ancestor of Parent
+        if self and hasattr(Parent, 'Ancestors'):
             for a in Parent.Ancestors:
                 if a is self:
                     raise TreeError, "Can't make node %s its own ancestor." \
@@ -235,10 +244,12 @@ class TreeNode(ConstrainedList, Delegator):
             if curr_parent is self:
                 raise DuplicateNodeError, "Node %s is already a child of %s" %\
                     (item, self)
-            for a in self.Ancestors:
-                if a is item:
-                    raise TreeError, \
-                "Can't make %s a child of its descendant %s" % (item, self)
+            #a node with no children can't be an ancestor of self
+            if item or not isinstance(item, TreeNode):
+                for a in self.Ancestors:
+                    if a is item:
+                        raise TreeError, \
+                    "Can't make %s a child of its descendant %s" % (item, self)
                 
             if curr_parent is not None:
                 curr_parent.removeNode(item)
@@ -247,8 +258,22 @@ class TreeNode(ConstrainedList, Delegator):
             #no parent: need to turn item into a node, using item as data
             new_node = self.__class__(Data=item)
         new_node._parent = self #direct access to avoid circular ref
+        self._clear_index_tokens()
         return new_node
 
+    def _clear_index_tokens(self):
+        """Clears the index tokens of self and its ancestors.
+        
+        Stops at the first node whose token is already clear, since its 
+        ancestors must have been cleared with it: a change takes time 
+        proportional to the nodes indexed since the last change, not to
+        the depth of the tree.
+        """
+        curr = self
+        while curr is not None and curr._index_token is not None:
+            curr.__dict__['_index_token'] = None
+            curr = curr._parent
+
     def removeNode(self, target):
         """Removes node by identity instead of value.
         
@@ -272,6 +297,7 @@ class TreeNode(ConstrainedList, Delegator):
                 self[i]._parent = None
         else:
             self[index]._parent = None
+        self._clear_index_tokens()
         super(TreeNode, self).__delitem__(index)
         
     def __delslice__(self, start, stop):
@@ -395,23 +421,27 @@ class TreeNode(ConstrainedList, Delegator):
         """Removes item at specified index, resetting parent."""
         item = super(TreeNode, self).pop(index)
         item._parent = None
+        self._clear_index_tokens()
         return item
 
     def remove(self, item):
         """Removes first instance of item from self."""
         position = self.index(item)
         self[position]._parent = None
+        self._clear_index_tokens()
         super(TreeNode, self).remove(item)
 
     def _get_ancestors(self):
         """Returns all ancestors back to the root."""
         result = []
         curr = self
-        while curr.Parent is not curr: #may not be its own parent
-            if curr.Parent is None:
+        parent = curr.Parent
+        while parent is not curr: #may not be its own parent
+            if parent is None:
                 break
-            result.append(curr.Parent)
-            curr = curr.Parent
+            result.append(parent)
+            curr = parent
+            parent = curr.Parent
         return result
 
     Ancestors = property(_get_ancestors)
@@ -420,6 +450,8 @@ class TreeNode(ConstrainedList, Delegator):
         """Finds last common ancestor of self and other, or None.
         
         if require_identity, tests by identity instead of equality
+
+        For many queries on the same tree, LcaIndex is much faster.
         """
         #detect trivial case
         if self is other:
@@ -512,13 +544,9 @@ class TreeNode(ConstrainedList, Delegator):
 
     def _get_terminal_descendants(self):
         """Returns all terminal descendants of self in a flat list."""
-        result = []
-        for i in self:
-            if not i:
-                result.append(i)
-            else:
-                result.extend(i.TerminalDescendants)
-        return result
+        if not self:
+            return []
+        return list(self.iterTips())
 
     TerminalDescendants = property(_get_terminal_descendants)
 
@@ -537,22 +565,60 @@ class TreeNode(ConstrainedList, Delegator):
         This is a depth-first traversal. Since the trees are not binary,
         preorder and postorder traversals are possible, but inorder traversals
         would depend on the data in the tree and are not handled here.
+
+        The walk keeps its own stack of nodes rather than recursing, so it 
+        takes constant time per node and works on trees of any depth. As 
+        with a loop over each node's children, changes to the children of a
+        node are seen if they come before the walk reaches them.
         """
-        if self:
-            if self_before:
-                yield self
-            for child in self:
-                for i in child.traverse(self_before, self_after):
-                    yield i
-            if self_after:
-                yield self
-        else:
+        if not self:
+            yield self
+            return
+        if self_before:
             yield self
+        #each item is [node, index of next child to visit]
+        stack = [[self, 0]]
+        while stack:
+            top = stack[-1]
+            node, index = top
+            if index < len(node):
+                top[1] = index + 1
+                child = node[index]
+                if child:
+                    if self_before:
+                        yield child
+                    stack.append([child, 0])
+                else:
+                    yield child
+            else:
+                stack.pop()
+                if self_after:
+                    yield node
 
+    def preorder(self):
+        """Returns iterator over self and its descendants, parents first."""
+        return self.traverse(self_before=True, self_after=False)
+
+    def postorder(self):
+        """Returns iterator over self and its descendants, children first."""
+        return self.traverse(self_before=False, self_after=True)
+
+    def iterTips(self):
+        """Returns iterator over the terminal nodes in self, in order.
         
-                
-        
-            
+        Unlike TerminalDescendants, includes self if self is terminal.
+        """
+        return self.traverse(self_before=False, self_after=False)
+
+    def levelorder(self):
+        """Returns iterator over self and its descendants, level by level.
+
+        Yields self, then its children, then their children, and so on.
+        """
+        queue = [self]
+        for node in queue:
+            yield node
+            queue.extend(node)
 
     def _get_siblings(self):
         """Returns all nodes that are children of the same parent as self.
@@ -671,7 +737,7 @@ class TreeNode(ConstrainedList, Delegator):
 
     def setDescendantTips(self):
         """Sets n.DescendantTips on each node."""
-        for n in self.traverse(self_before=False, self_after=True):
+        for n in self.postorder():
             if not n.Children:
                 n.DescendantTips = [n]
             else:
@@ -764,14 +830,18 @@ class TreeNode(ConstrainedList, Delegator):
 
         Need to call before containsChild() will work 
         """
-        for n in self.traverse(self_before=False, self_after=True):
-            setattr(n, "LeafSet", set([x.Data for x in n.TerminalDescendants]))
-            setattr(n, "NumLeaves", len(n.LeafSet))
+        for n in self.postorder():
+            #a terminal node has no terminal descendants, so an empty LeafSet
+            leaf_set = set()
             total_nodes = 1
-
-            if n.Children:
-                for ix, child in enumerate(n.Children):
-                    total_nodes += child.TotalNodes
+            for child in n:
+                if child:
+                    leaf_set.update(child.LeafSet)
+                else:
+                    leaf_set.add(child.Data)
+                total_nodes += child.TotalNodes
+            setattr(n, "LeafSet", leaf_set)
+            setattr(n, "NumLeaves", len(leaf_set))
             setattr(n, "TotalNodes", total_nodes) 
 
     def containsChild(self, other_leaf_key):
@@ -892,7 +962,10 @@ class PhyloNode(TreeNode):
         self.__dict__['Weight'] = Weight
 
     def distance(self, other):
-        """Returns total distance using self.BranchLength, 0 if not found"""
+        """Returns total distance using self.BranchLength, 0 if not found
+        
+        For many queries on the same tree, LcaIndex is much faster.
+        """
         #detect trivial case
         if other is None:
             raise ValueError, "Distance undefined when other node is None."
@@ -974,7 +1047,7 @@ class PhyloNode(TreeNode):
 
     def setTipDistances(self):
         """Sets distance from each node to the most distant tip."""
-        for node in self.traverse(self_before=False, self_after=True):
+        for node in self.postorder():
             if node.Children:
                 node.TipDistance = max([c.BranchLength + c.TipDistance for \
                     c in node.Children])
@@ -990,15 +1063,15 @@ class PhyloNode(TreeNode):
         up precisely the same.
         """
         self.setTipDistances()
-        orig_max = max([n.TipDistance for n in self.traverse()])
+        orig_max = max([n.TipDistance for n in self.preorder()])
         if not ultrametric: #easy case -- just scale and round
-            for node in self.traverse():
+            for node in self.preorder():
                 curr = node.BranchLength
                 if curr is not None:
                     node.ScaledBranchLength =  \
                         max(1, int(round(1.0*curr/orig_max*max_length)))
         else:   #hard case -- need to make sure they all line up at the end
-            for node in self.traverse(self_before=False, self_after=True):
+            for node in self.postorder():
                 if not node.Children:   #easy case: ignore tips
                     node.DistanceUsed = 0
                     continue
@@ -1011,7 +1084,7 @@ class PhyloNode(TreeNode):
                     c.ScaledBranchLength = distance - c.DistanceUsed
                 node.DistanceUsed = distance
         #reset the BranchLengths
-        for node in self.traverse(self_before=True, self_after=False):
+        for node in self.preorder():
             if node.BranchLength is not None:
                 node.BranchLength = node.ScaledBranchLength
             if hasattr(node, 'ScaledBranchLength'):
@@ -1041,7 +1114,7 @@ class PhyloNode(TreeNode):
         """
         mean_name = prop_name+'WeightedMean'
         stdev_name = prop_name+'WeightedStdev'
-        for n in self.traverse(self_before=False, self_after=True):
+        for n in self.postorder():
             if not n.Children:
                 setattr(n, mean_name, f(n))
                 setattr(n, stdev_name, 0)
@@ -1060,7 +1133,447 @@ class PhyloNode(TreeNode):
                     /len(child_vals))
                 setattr(n, stdev_name, std)
 
-    
+    def _tip_spans(self):
+        """Returns (tips, tip root distances, spans) for tipToTipDistances.
+
+        tips are the terminal descendants of self in order, and each span 
+        is (start, end, stop, distance) for a child of an internal node: 
+        the child's tips are tips[start:end], the tips of its later siblings
+        are tips[end:stop], and distance is from self to the internal node 
+        (so the tips in the two ranges have that node as last common 
+        ancestor).
+        """
+        distances = {id(self):0}
+        for node in self.preorder():
+            for child in node:
+                distances[id(child)] = distances[id(node)] + \
+                    (child.BranchLength or 0)
+        tips = []
+        tip_distances = []
+        ranges = {}
+        spans = []
+        for node in self.postorder():
+            if not node.Children:
+                ranges[id(node)] = (len(tips), len(tips) + 1)
+                tips.append(node)
+                tip_distances.append(distances[id(node)])
+                continue
+            distance = distances[id(node)]
+            stop = ranges[id(node[-1])][1]
+            for child in node[:-1]:
+                start, end = ranges[id(child)]
+                spans.append((start, end, stop, distance))
+            ranges[id(node)] = (ranges[id(node[0])][0], stop)
+        return tips, array(tip_distances, Float64), spans
+
+    def _tip_distance_rows(self, tip_distances, spans, first, last):
+        """Returns distances from tips first to last-1 to all the tips."""
+        num_tips = len(tip_distances)
+        lca_distances = zeros((last - first, num_tips), Float64)
+        for start, end, stop, distance in spans:
+            row_start, row_end = max(start, first), min(end, last)
+            if row_start < row_end:
+                lca_distances[row_start-first:row_end-first, end:stop] = \
+                    distance
+            row_start, row_end = max(end, first), min(stop, last)
+            if row_start < row_end:
+                lca_distances[row_start-first:row_end-first, start:end] = \
+                    distance
+        rows = tip_distances[first:last]
+        put(lca_distances, arange(last - first) * (num_tips + 1) + first, \
+            rows)
+        return rows[:, NewAxis] + tip_distances[NewAxis, :] - \
+            2 * lca_distances
+
+    def tipToTipDistances(self, condensed=False, block_size=None):
+        """Returns distances between all pairs of tips of self.
+
+        The distance between two tips is the total BranchLength on the path
+        between them, as for distance (None counts as 0), found for all the
+        pairs at once from the distances of the tips to self and to each 
+        internal node.
+
+        Returns a DistanceMatrix labeled by the Data of the tips or, if 
+        condensed is True, a Numeric array of the upper triangle in order 
+        (0,1), (0,2) ... (0,n-1), (1,2) ... (n-2,n-1) for the tips in the 
+        order of TerminalDescendants.
+
+        block_size: if given, the distances are worked out for that many 
+        tips at a time, so that (apart from the result) memory is only 
+        needed for block_size rows of the matrix rather than all of it.
+        """
+        tips, tip_distances, spans = self._tip_spans()
+        num_tips = len(tips)
+        if not block_size:
+            block_size = num_tips
+        if condensed:
+            result = zeros(num_tips * (num_tips - 1) // 2, Float64)
+            done = 0
+        else:
+            names = [tip.Data for tip in tips]
+            data = {}
+        for first in range(0, num_tips, block_size):
+            last = min(first + block_size, num_tips)
+            rows = self._tip_distance_rows(tip_distances, spans, first, last)
+            for i in range(first, last):
+                row = rows[i - first]
+                if condensed:
+                    result[done:done + num_tips - i - 1] = row[i + 1:]
+                    done += num_tips - i - 1
+                else:
+                    data[names[i]] = dict(zip(names, row.tolist()))
+        if condensed:
+            return result
+        return DistanceMatrix(data, RowOrder=names, ColOrder=names)
+
+
+def _float_column(values):
+    """Returns (Float64 array of values, UInt8 array 1 where not None)."""
+    present = array([v is not None for v in values], UInt8)
+    return array([v or 0 for v in values], Float64), present
+
+class CompactTree(object):
+    """Holds a whole tree as flat arrays, with the nodes numbered in preorder.
+
+    Node 0 is the root, and the descendants of node i are the nodes from 
+    i+1 up to (but not including) End[i]. For each node i:
+
+    Parent[i]: index of the parent (-1 for the root).
+    FirstChild[i]: index of the first child (-1 for a tip).
+    NextSibling[i]: index of the next child of the parent (-1 for the last).
+    End[i]: index after the last descendant.
+    BranchLength[i], Weight[i]: the PhyloNode values (0 where None), and
+        HasBranchLength[i], HasWeight[i]: 1 where the value is not None.
+    Data[i]: the Data of the node (e.g. its name).
+    Order[i]: the position of the node in the lists it was made from.
+
+    NodeClass is the class of the nodes made by toTreeNode. The arrays and 
+    the Data list take far less memory than a TreeNode for each node, and 
+    traverse, ancestors, children and terminalDescendants are walks over 
+    the arrays.
+    """
+    def __init__(self, parents, data=None, branch_lengths=None, \
+        weights=None, node_class=TreeNode):
+        """Returns new CompactTree from the parent of each node.
+
+        parents: list of the index (in the list) of the parent of each 
+        node, -1 for the root, or None for nodes left out of the tree 
+        (along with their descendants). Children keep their order in the 
+        list. Raises TreeError unless there is exactly one root.
+
+        data, branch_lengths, weights: lists with the Data, BranchLength 
+        and Weight of each node, in the same order as parents.
+        """
+        num_nodes = len(parents)
+        roots = [i for i, p in enumerate(parents) if p == -1]
+        if len(roots) != 1:
+            raise TreeError, "Tree must have one root: found %s" % len(roots)
+        #link the children of each node, in order
+        first = [-1] * num_nodes
+        last = [-1] * num_nodes
+        next = [-1] * num_nodes
+        for i, p in enumerate(parents):
+            if p is None or p == -1:
+                continue
+            if first[p] < 0:
+                first[p] = i
+            else:
+                next[last[p]] = i
+            last[p] = i
+        #number the nodes in preorder
+        order = []
+        stack = [roots[0]]
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            children = []
+            child = first[i]
+            while child >= 0:
+                children.append(child)
+                child = next[child]
+            children.reverse()
+            stack.extend(children)
+        new_index = dict([(old, new) for new, old in enumerate(order)])
+        num_nodes = len(order)
+        parent = [-1] + [new_index[parents[i]] for i in order[1:]]
+        first_child = [-1] * num_nodes
+        next_sibling = [-1] * num_nodes
+        for new, old in enumerate(order):
+            if first[old] >= 0:
+                first_child[new] = new_index[first[old]]
+            if next[old] >= 0:
+                next_sibling[new] = new_index[next[old]]
+        sizes = [1] * num_nodes
+        for i in range(num_nodes - 1, 0, -1):
+            sizes[parent[i]] += sizes[i]
+        self.Order = array(order, Int)
+        self.Parent = array(parent, Int)
+        self.FirstChild = array(first_child, Int)
+        self.NextSibling = array(next_sibling, Int)
+        self.End = arange(num_nodes) + array(sizes, Int)
+        if data is None:
+            self.Data = [None] * num_nodes
+        else:
+            self.Data = [data[i] for i in order]
+        if branch_lengths is None:
+            branch_lengths = [None] * len(parents)
+        if weights is None:
+            weights = [None] * len(parents)
+        self.BranchLength, self.HasBranchLength = \
+            _float_column([branch_lengths[i] for i in order])
+        self.Weight, self.HasWeight = \
+            _float_column([weights[i] for i in order])
+        self.NodeClass = node_class
+
+    def fromTreeNode(cls, root):
+        """Returns new CompactTree holding the tree below root.
+
+        Keeps the Data of each node, the BranchLength and Weight of 
+        PhyloNodes, and the class of root as NodeClass.
+        """
+        parents, data, branch_lengths, weights = [], [], [], []
+        stack = [(root, -1)]
+        while stack:
+            node, parent = stack.pop()
+            index = len(parents)
+            parents.append(parent)
+            data.append(node.Data)
+            branch_lengths.append(node.__dict__.get('BranchLength'))
+            weights.append(node.__dict__.get('Weight'))
+            for child in reversed(node):
+                stack.append((child, index))
+        return cls(parents, data, branch_lengths, weights, root.__class__)
+
+    fromTreeNode = classmethod(fromTreeNode)
+
+    def __len__(self):
+        """Returns the number of nodes in the tree."""
+        return len(self.Data)
+
+    def toTreeNode(self, node=0):
+        """Returns tree of NodeClass objects for node and its descendants.
+
+        BranchLength and Weight are set if NodeClass is a PhyloNode.
+        """
+        is_phylo = issubclass(self.NodeClass, PhyloNode)
+        end = self.End[node]
+        parents = self.Parent[node:end].tolist()
+        data = self.Data[node:end]
+        if is_phylo:
+            lengths = self._values(self.BranchLength, self.HasBranchLength, \
+                node, end)
+            weights = self._values(self.Weight, self.HasWeight, node, end)
+        made = []
+        for i in range(end - node):
+            if is_phylo:
+                new_node = self.NodeClass(data[i], BranchLength=lengths[i], \
+                    Weight=weights[i])
+            else:
+                new_node = self.NodeClass(data[i])
+            if i:
+                made[parents[i] - node].append(new_node)
+            made.append(new_node)
+        return made[0]
+
+    def _values(self, values, present, start, end):
+        """Returns list of values[start:end], with None where not present."""
+        result = []
+        for value, is_present in zip(values[start:end].tolist(), \
+            present[start:end].tolist()):
+            if is_present:
+                result.append(value)
+            else:
+                result.append(None)
+        return result
+
+    def children(self, node):
+        """Returns list of the indices of the children of node, in order."""
+        result = []
+        child = self.FirstChild[node]
+        while child >= 0:
+            result.append(child)
+            child = self.NextSibling[child]
+        return result
+
+    def ancestors(self, node):
+        """Returns list of the indices of the ancestors of node, to the root.
+        """
+        result = []
+        parent = self.Parent[node]
+        while parent >= 0:
+            result.append(parent)
+            parent = self.Parent[parent]
+        return result
+
+    def terminalDescendants(self, node=0):
+        """Returns list of the indices of the tips below node, in order.
+
+        As for TreeNode TerminalDescendants, a tip has no terminal 
+        descendants.
+        """
+        start, end = node + 1, self.End[node]
+        return compress(less(self.FirstChild[start:end], 0), \
+            arange(start, end)).tolist()
+
+    def traverse(self, node=0, self_before=True, self_after=False):
+        """Returns iterator over the indices of node and its descendants.
+
+        self_before and self_after are as for TreeNode traverse: if neither
+        is True, only the tips are included, and a tip is only included 
+        once. The preorder, which is just the node numbering, comes from a
+        range; otherwise the open nodes are kept on a list.
+        """
+        end = self.End[node]
+        if self_before and not self_after:
+            return iter(xrange(node, end))
+        return self._walk(node, end, self_before, self_after)
+
+    def _walk(self, node, end, self_before, self_after):
+        """Iterates over nodes from node to end: see traverse."""
+        ends = self.End[node:end].tolist()
+        first = self.FirstChild[node:end].tolist()
+        open_nodes = []
+        for i in xrange(node, end):
+            while open_nodes and i >= ends[open_nodes[-1] - node]:
+                closed = open_nodes.pop()
+                if self_after:
+                    yield closed
+            if first[i - node] < 0:
+                yield i
+            else:
+                if self_before:
+                    yield i
+                open_nodes.append(i)
+        while open_nodes:
+            closed = open_nodes.pop()
+            if self_after:
+                yield closed
+
+class LcaIndex(object):
+    """Answers last common ancestor queries on a tree in constant time.
+
+    Built from an Euler tour of the tree below root (the list of nodes met
+    walking round the tree, with the depth of each) and a sparse table 
+    holding, for each position and each power of two, the position of the 
+    shallowest node in that many tour entries. The last common ancestor of 
+    a and b is the shallowest node between their first places in the tour, 
+    found from two overlapping entries of the table.
+
+    Distances come from the distance of each node to root, summing 
+    BranchLength (None counts as 0, as for PhyloNode distance). 
+
+    The index is rebuilt on the next query if the tree below root has been
+    changed since it was built: each rebuild marks every node with a new 
+    token, and adding or removing children clears the tokens up to the 
+    root (see TreeNode._index_token). Changes to other trees don't cause a
+    rebuild, but two indices over the same nodes replace each other's 
+    tokens and so rebuild in turn. Changes to BranchLength are not tracked:
+    call rebuild() after making them.
+    """
+    _rebuilds = 0   #source of a new token for each rebuild
+
+    def __init__(self, root):
+        """Returns new LcaIndex for root and its descendants."""
+        self.Root = root
+        self.rebuild()
+
+    def rebuild(self):
+        """Makes the Euler tour and sparse table for the current tree."""
+        nodes = [self.Root]
+        depths = [0]
+        root_distances = [0]
+        euler = [0]
+        stack = [[self.Root, 0, 0]]     #node, next child, index of node
+        while stack:
+            top = stack[-1]
+            node, next_child, index = top
+            if next_child < len(node):
+                top[1] += 1
+                child = node[next_child]
+                child_index = len(nodes)
+                nodes.append(child)
+                depths.append(depths[index] + 1)
+                root_distances.append(root_distances[index] + \
+                    (getattr(child, 'BranchLength', None) or 0))
+                euler.append(child_index)
+                stack.append([child, 0, child_index])
+            else:
+                stack.pop()
+                if stack:
+                    euler.append(stack[-1][2])
+        LcaIndex._rebuilds += 1
+        self._token = LcaIndex._rebuilds
+        for node in nodes:
+            node.__dict__['_index_token'] = self._token
+        first = [0] * len(nodes)
+        for position in range(len(euler) - 1, -1, -1):
+            first[euler[position]] = position
+        self.Nodes = nodes
+        self.Depths = array(depths, Int)
+        self.RootDistances = array(root_distances, Float64)
+        self._ids = dict([(id(node), i) for i, node in enumerate(nodes)])
+        self._first = first
+        self._euler = array(euler, Int)
+        euler_depths = take(self.Depths, self._euler)
+        #table[k][i] is position of shallowest node in euler[i:i+2**k]
+        num_positions = len(euler)
+        table = [arange(num_positions)]
+        logs = [0, 0]
+        width = 1
+        while 2 * width <= num_positions:
+            last = table[-1]
+            left, right = last[:-width], last[width:]
+            table.append(where(less_equal(take(euler_depths, left), \
+                take(euler_depths, right)), left, right))
+            logs.extend([len(table) - 1] * (2 * width))
+            width *= 2
+        self._table = table
+        self._logs = logs
+        self._euler_depths = euler_depths
+
+    def _index(self, node):
+        """Returns index of node in self.Nodes, rebuilding if tree changed.
+        
+        Raises TreeError if node is not in the tree.
+        """
+        if self.Root._index_token != self._token:
+            self.rebuild()
+        try:
+            return self._ids[id(node)]
+        except KeyError:
+            raise TreeError, "Node %s is not in the indexed tree." % `node`
+
+    def _lca_index(self, first, second):
+        """Returns index of the last common ancestor of two node indices."""
+        start, end = self._first[first], self._first[second]
+        if start > end:
+            start, end = end, start
+        level = self._logs[end - start + 1]
+        row = self._table[level]
+        left, right = row[start], row[end - (1 << level) + 1]
+        if self._euler_depths[right] < self._euler_depths[left]:
+            left = right
+        return self._euler[left]
+
+    def lastCommonAncestor(self, first, second):
+        """Returns the last common ancestor of nodes first and second."""
+        i, j = self._index(first), self._index(second)
+        return self.Nodes[self._lca_index(i, j)]
+
+    def distance(self, first, second):
+        """Returns total BranchLength on the path between first and second.
+        """
+        i, j = self._index(first), self._index(second)
+        distances = self.RootDistances
+        return distances[i] + distances[j] - \
+            2 * distances[self._lca_index(i, j)]
+
+    def separation(self, first, second):
+        """Returns number of edges separating first and second."""
+        i, j = self._index(first), self._index(second)
+        depths = self.Depths
+        return depths[i] + depths[j] - 2 * depths[self._lca_index(i, j)]
+
 if __name__ == '__main__':
     from old_cogent.parse.tree import DndParser
     s = '((a:7.9,((b:0.1,c:0.1):0.1,d:0.2):7.7):0.1,e:8.0)'
@@ -17,7 +17,7 @@ Package created 10/9/03 by Rob Knight.
 __all__ = [ 'aaindex', 'bpseq', 'clustal', 'cutg', 'fasta', 
             'locuslink', 'ncbi_taxonomy',
             'rdb', 'record', 'record_finder', 
-            'sprinzl', 'tree', 'unigene']
+            'sprinzl', 'substitution_matrix', 'tree', 'unigene']
 
 """Need to add:
 
@@ -14,7 +14,7 @@ written by Jason Carnes 7-25-2003; last modification 8-19-2003
 integrated into PyEvolve. Now uses cogent.base.tree.TreeNode, providing many
 additional capabilities.
 """
-from old_cogent.base.tree import TreeNode
+from old_cogent.base.tree import TreeNode, CompactTree
 from string import strip
 
 class MissingParentError(Exception):
@@ -216,6 +216,70 @@ class NcbiTaxonomy(object):
         except ValueError:
             return self.ByName[item]
 
+class NcbiCompactTaxonomy(object):
+    """Holds a taxonomy tree as a CompactTree, plus lookup by id or name.
+
+    Takes the same arguments as NcbiTaxonomy, but keeps the whole tree in 
+    the arrays of self.Tree, so is suitable for the full NCBI taxonomy. The 
+    Data of each node is its NcbiTaxon (with the Name set), ById and ByName 
+    map to node indices in self.Tree, and self.Root is 0. 
+    self.Tree.toTreeNode(i) gives the NcbiTaxonNode tree below node i.
+
+    Children are ordered by taxon id. Taxa whose parents don't exist (and 
+    their descendants) are left out of the tree: unless strict is True, 
+    the taxa are put in self.Deadbeats keyed by parent id.
+    """
+    def __init__(self, taxa, names, strict=False):
+        """Creates new compact taxonomy, using data in taxa and names."""
+        ids = sorted(taxa.keys())
+        positions = dict([(t_id, i) for i, t_id in enumerate(ids)])
+        parents = []
+        data = []
+        deadbeats = {}
+        for t_id in ids:
+            t = taxa[t_id]
+            name_rec = names.get(t_id, None)
+            if name_rec:
+                t.Name = name_rec.Name
+            else:
+                t.Name = 'Unknown'
+            data.append(t)
+            if t.ParentId == t.TaxonId:
+                parents.append(-1)
+            elif t.ParentId in positions:
+                parents.append(positions[t.ParentId])
+            elif strict:
+                raise MissingParentError, \
+                    "Node %s has parent %s, which isn't in taxa." % \
+                    (t_id, t.ParentId)
+            else:
+                deadbeats[t.ParentId] = t
+                parents.append(None)
+        self.Tree = CompactTree(parents, data, node_class=NcbiTaxonNode)
+        self.ById = {}
+        self.ByName = {}
+        for i, t in enumerate(self.Tree.Data):
+            self.ById[t.TaxonId] = i
+            self.ByName[t.Name] = i
+        self.Deadbeats = deadbeats
+        self.Root = 0
+
+    def __getitem__(self, item):
+        """If item is int, returns taxon by id: otherwise, searches by name.
+
+        Returns the index of the node in self.Tree.
+        Will raise KeyError if not present.
+        """
+        try:
+            return self.ById[int(item)]
+        except ValueError:
+            return self.ByName[item]
+
+    def getRankedDescendants(self, node, rank):
+        """Returns indices of node and its descendants with specified rank."""
+        data = self.Tree.Data
+        return [i for i in self.Tree.traverse(node) if data[i].Rank == rank]
+
 class NcbiTaxonNode(TreeNode):
     """Provides some additional methods specific to Ncbi taxa."""
             
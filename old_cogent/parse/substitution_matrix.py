@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+#file cogent/parse/substitution_matrix.py
+
+"""Parser for substitution matrices such as BLOSUM and PAM.
+
+Reads the format used for the matrices distributed with NCBI BLAST: comment
+lines starting with #, a header line giving the symbol for each column, and
+then a line for each row giving its symbol followed by its scores, e.g.
+
+#  Matrix made by matblas from blosum62.iij
+   A  R  N
+A  4 -1 -2
+R -1  5  0
+N -2  0  6
+
+The result can be passed to old_cogent.align.algorithm.SubstitutionScorer.
+"""
+from old_cogent.parse.record import RecordError
+
+def _number(field):
+    """Returns field as an int if possible, otherwise as a float."""
+    try:
+        return int(field)
+    except ValueError:
+        return float(field)
+
+def SubstitutionMatrixParser(lines):
+    """Returns 2D dict of scores, {row_symbol:{col_symbol:score}}, from lines.
+
+    Scores are ints where possible, otherwise floats. Raises RecordError if
+    a row has the wrong number of scores or a score isn't a number.
+    """
+    cols = None
+    result = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split()
+        if cols is None:
+            cols = fields
+            continue
+        row, scores = fields[0], fields[1:]
+        if len(scores) != len(cols):
+            raise RecordError, "Row %s has %s scores, but there are %s columns"\
+                % (row, len(scores), len(cols))
+        try:
+            result[row] = dict(zip(cols, map(_number, scores)))
+        except ValueError:
+            raise RecordError, "Row %s has a score that isn't a number" % row
+    return result
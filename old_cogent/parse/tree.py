@@ -39,9 +39,10 @@ ignored if they are within single quotes. This is so that Arb files where
 group names contain tokens can be read. Arb places the nodes names within
 single quotes if there are symbols.
 """
-from old_cogent.base.tree import PhyloNode
+from old_cogent.base.tree import TreeNode, PhyloNode
 from old_cogent.parse.record import RecordError
 from string import strip, maketrans
+import re
 
 _dnd_token_str = '(:),;'
 _dnd_tokens = dict.fromkeys(_dnd_token_str)
@@ -74,43 +75,100 @@ def bad_dnd_tokens(s, is_valid_name):
         yield t
         
 
+#a label (in which delimiters between single quotes don't count) followed by
+#a delimiter: written so that each character can only be matched one way, so
+#failing to match (e.g. at an unclosed quote) is quick
+_dnd_token_pattern = re.compile(
+    r"([^'(:),;]*(?:'[^']*'[^'(:),;]*)*)([(:),;])")
+
 def DndTokenizer(data):
     """Tokenizes data into a stream of punctuation, labels and lengths.
     
-    Note: data should all be a single sequence, e.g. a single string.
+    Note: data should all be a single sequence, e.g. a single string; other
+    sequences are joined into a string first. Text after the last 
+    punctuation (or after an unclosed quote) is ignored.
     """
-    in_quotes = False
-    saved = []
-    for d in data:
-        if d == "'":
-            in_quotes = not(in_quotes)
-        if d in _dnd_tokens and not in_quotes:
-            curr = ''.join(saved).strip()
-            if curr:
-                yield curr
-            yield d
-            saved = []
-        else:
-            saved.append(d)
+    if not isinstance(data, basestring):
+        data = ''.join(data)
+    match = _dnd_token_pattern.match
+    pos = 0
+    while True:
+        m = match(data, pos)
+        if m is None:
+            return
+        curr = m.group(1).strip()
+        if curr:
+            yield curr
+        yield m.group(2)
+        pos = m.end()
 
 def DndParser(lines, constructor=PhyloNode):
     """Returns tree from the Clustal .dnd file format, and anything equivalent.
     
-    Will work even if lines is a single string, but will inefficiently
-    re-join it into a string. Better to pass in as a list of one string.
+    lines can be a single string, or e.g. a list of lines or an open file,
+    which will be joined into a string.
 
     Tree is made up of cogent.base.tree.PhyloNode objects, with branch lengths
     (by default, although you can pass in an alternative constructor 
     explicitly).
+
+    For a file with many trees, use MultiDndParser.
+    """
+    if isinstance(lines, basestring):
+        data = lines
+    else:
+        data = ''.join(lines)
+    return _dnd_tree(DndTokenizer(data), data.count('('), data.count(')'), \
+        constructor)
+
+def MultiDndParser(lines, constructor=PhyloNode):
+    """Yields each tree in lines, a file of trees separated by ';'.
+
+    Reads lines one at a time, so only one tree needs to be held in memory
+    at once. Each tree is the same as DndParser would give for its text, 
+    and constructor is as for DndParser. A tree is allowed to span several
+    lines, and a line to hold several trees. Trees with no data (e.g. ';;')
+    are skipped; the last tree doesn't need a ';'.
+    """
+    match = _dnd_token_pattern.match
+    tokens = []
+    left_count = right_count = 0
+    pending = ''
+    for line in lines:
+        pending += line
+        pos = 0
+        while True:
+            m = match(pending, pos)
+            if m is None:
+                break
+            label, delimiter = m.group(1), m.group(2)
+            #quoted parens count, as for DndParser
+            left_count += label.count('(') + (delimiter == '(')
+            right_count += label.count(')') + (delimiter == ')')
+            label = label.strip()
+            if label:
+                tokens.append(label)
+            tokens.append(delimiter)
+            pos = m.end()
+            if delimiter == ';':
+                if len(tokens) > 1:
+                    yield _dnd_tree(tokens, left_count, right_count, \
+                        constructor)
+                tokens = []
+                left_count = right_count = 0
+        pending = pending[pos:]
+    if tokens:
+        yield _dnd_tree(tokens, left_count, right_count, constructor)
+
+def _dnd_tree(tokens, left_count, right_count, constructor):
+    """Returns tree from tokens: see DndParser.
+
+    left_count and right_count are the numbers of '(' and ')' in the data.
     """
-    data = ''.join(lines)
-    left_count = data.count('(')
-    right_count = data.count(')')
     if left_count != right_count:
         raise RecordError, "Found %s left parens but %s right parens." % \
             (left_count, right_count)
     
-    tokens = DndTokenizer(data)
     curr_node = None
     state = 'PreColon'
     state1 = 'PreClosed'
@@ -152,6 +210,11 @@ def _new_child(old_node, constructor):
     new_node = constructor()
     new_node.Parent = old_node
     if old_node is not None:
+        #setting Parent already appended a TreeNode: checking Children would
+        #compare new_node with every earlier child
+        if isinstance(old_node, TreeNode) and old_node and \
+            old_node[-1] is new_node:
+            return new_node
         if new_node not in old_node.Children:
             old_node.Children.append(new_node)
     return new_node
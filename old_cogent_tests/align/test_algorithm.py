@@ -0,0 +1,730 @@
+#!/usr/bin/env python
+#file cogent_tests/align/test_algorithm.py
+
+"""Unit tests for the pairwise alignment code in cogent.align.algorithm.
+"""
+from old_cogent.util.unit_test import TestCase, main
+from old_cogent.base.sequence import Rna, MutableRna, RnaSequence
+from old_cogent.align.algorithm import MatchScorer, equality_scorer, \
+    encode_symbols, score_table, nw_last_row, hirschberg_moves, moves_score,\
+    aligned_from_moves, NeedlemanWunschMatrix, ArrayNeedlemanWunschMatrix, \
+    ArraySmithWatermanMatrix, LinearSpaceNeedlemanWunsch, NO_POINTER, UP, \
+    DIAG, LEFT, EXTEND_LEFT, EXTEND_UP, nw_align, sw_align, band_limits, \
+    BandedNeedlemanWunschMatrix, nw_score, sw_score, SubstitutionScorer, \
+    all_pairs_align, sw_score_antidiagonal, sw_scan, encode_pair, \
+    profile_align, dot_column_scores, LogOddsColumnScorer
+from old_cogent.parse.aaindex import AAIndex2Record
+from Numeric import array, zeros, log, Float64
+from random import Random
+
+def gotoh_score(first, second, scorer, gap, gap_extend, local=False):
+    """Returns best affine-gap alignment score, filling cell by cell.
+
+    Straightforward three-matrix version used to check the array code.
+    """
+    low = -1e100
+    rows, cols = len(second) + 1, len(first) + 1
+    best = [[0] * cols for i in range(rows)]
+    left = [[low] * cols for i in range(rows)]
+    up = [[low] * cols for i in range(rows)]
+    for i in range(1, rows):
+        if not local:
+            best[i][0] = up[i][0] = gap + (i-1) * gap_extend
+    for j in range(1, cols):
+        if not local:
+            best[0][j] = left[0][j] = gap + (j-1) * gap_extend
+    result = 0
+    for i in range(1, rows):
+        for j in range(1, cols):
+            left[i][j] = max(best[i][j-1] + gap, left[i][j-1] + gap_extend)
+            up[i][j] = max(best[i-1][j] + gap, up[i-1][j] + gap_extend)
+            best[i][j] = max(best[i-1][j-1] + scorer(first[j-1], \
+                second[i-1]), left[i][j], up[i][j])
+            if local:
+                best[i][j] = max(best[i][j], 0)
+                result = max(result, best[i][j])
+    if local:
+        return result
+    return best[-1][-1]
+
+class encode_symbols_tests(TestCase):
+    """Tests of the encode_symbols function."""
+
+    def test_encode_symbols(self):
+        """encode_symbols should give codes in order of first appearance"""
+        self.assertEqual(encode_symbols(''), ([], []))
+        self.assertEqual(encode_symbols('abcab'), (list('abc'), [0,1,2,0,1]))
+        self.assertEqual(encode_symbols([3,3,1]), ([3,1], [0,0,1]))
+
+    def test_encode_symbols_unhashable(self):
+        """encode_symbols should give each unhashable item its own code"""
+        self.assertEqual(encode_symbols([[1],[1]]), ([[1],[1]], [0,1]))
+
+class linearSpaceTests(TestCase):
+    """Tests of the functions used for linear-space global alignment."""
+
+    def setUp(self):
+        """Define some sequence pairs to align."""
+        self.pairs = [('ACGTT', 'AGT'), ('AGCTAGCT', 'GCTTAG'), ('', 'ACG'),
+            ('ACG', ''), ('AAAA', 'CCCC'), ('GATTACAGATTACA', 'GTACTTGACA'),
+            ('TTTTTTTTAC', 'ACTTTT')]
+        self.scorers = [(equality_scorer, -1), (MatchScorer(1.5,-0.5), -0.75)]
+
+    def _encoded(self, first, second, scorer, gap):
+        """Returns codes_1, codes_2, table, exact for first and second."""
+        symbols_1, codes_1 = encode_symbols(first)
+        symbols_2, codes_2 = encode_symbols(second)
+        table, exact = score_table(scorer, symbols_1, symbols_2, gap)
+        return array(codes_1), codes_2, table, exact
+
+    def test_score_table(self):
+        """score_table should score each pair of symbols"""
+        table, exact = score_table(MatchScorer(2,-1), 'ab', 'bca', -1)
+        self.assertEqual(table, [[-1,2],[-1,-1],[2,-1]])
+        self.assertEqual(exact, True)
+        table, exact = score_table(MatchScorer(2,-1), 'ab', 'bca', -0.5)
+        self.assertEqual(exact, False)
+
+    def test_nw_last_row(self):
+        """nw_last_row should match last row of the full score matrix"""
+        for first, second in self.pairs:
+            for scorer, gap in self.scorers:
+                codes_1, codes_2, table, exact = \
+                    self._encoded(first, second, scorer, gap)
+                orig = NeedlemanWunschMatrix(first, second, scorer, gap)
+                orig.fill()
+                self.assertFloatEqual(nw_last_row(codes_1, codes_2, table, \
+                    gap, exact), [cell.Score for cell in orig[-1]])
+
+    def test_hirschberg_moves(self):
+        """hirschberg_moves should give an optimal alignment"""
+        for first, second in self.pairs:
+            for scorer, gap in self.scorers:
+                codes_1, codes_2, table, exact = \
+                    self._encoded(first, second, scorer, gap)
+                #base_cells of 1 forces splitting down to single rows
+                moves = hirschberg_moves(codes_1, codes_2, table, gap, exact,\
+                    base_cells=1)
+                aln_1, aln_2 = aligned_from_moves(moves, first, second)
+                self.assertEqual(''.join(aln_1).replace('-', ''), first)
+                self.assertEqual(''.join(aln_2).replace('-', ''), second)
+                self.assertFloatEqual(moves_score(moves, codes_1, codes_2, \
+                    table, gap), nw_align(first, second, scorer, gap, \
+                    return_score=True)[1])
+
+    def test_aligned_from_moves(self):
+        """aligned_from_moves should insert gaps for LEFT and UP"""
+        self.assertEqual(aligned_from_moves([DIAG, LEFT, UP, DIAG], 'abc', \
+            'xyz'), (list('ab-c'), list('x-yz')))
+        self.assertEqual(aligned_from_moves([LEFT], 'abc', 'xyz', 2, 3, '.'),\
+            (['c'], ['.']))
+
+class ArrayNeedlemanWunschMatrixTests(TestCase):
+    """Tests of the array-based global alignment matrix."""
+
+    def test_init(self):
+        """ArrayNeedlemanWunschMatrix should not fill on init"""
+        m = ArrayNeedlemanWunschMatrix('ACG', 'AG')
+        self.assertEqual(m.Rows, 3)
+        self.assertEqual(m.Cols, 4)
+        self.assertEqual(m.Filled, False)
+        self.assertEqual(m.Pointers, None)
+
+    def test_fill(self):
+        """ArrayNeedlemanWunschMatrix fill should set pointers and score"""
+        m = ArrayNeedlemanWunschMatrix('ACG', 'AG')
+        m.fill()
+        self.assertEqual(m.MaxScore, (1, 2, 3))
+        self.assertEqual(m.Pointers.shape, (3, 4))
+        self.assertEqual(list(m.Pointers[0]), [NO_POINTER, LEFT, LEFT, LEFT])
+        self.assertEqual(list(m.Pointers[:,0]), [NO_POINTER, UP, UP])
+        self.assertEqual(m.Pointers[1,1], DIAG)
+
+    def test_fill_then_alignment(self):
+        """ArrayNeedlemanWunschMatrix alignment should trace back after fill"""
+        m = ArrayNeedlemanWunschMatrix('ACGTT', 'AGT')
+        m.fill()
+        self.assertEqual(m.alignment(), ('ACGTT', 'A-G-T'))
+        self.assertEqual(m.alignment(), \
+            NeedlemanWunschMatrix('ACGTT', 'AGT').alignment())
+
+    def test_alignment(self):
+        """ArrayNeedlemanWunschMatrix should give same result as ScoreCells"""
+        pairs = [('ACGTT', 'AGT'), ('AGCTAGCT', 'GCTTAG'), ('', 'ACG'),
+            ('ACG', ''), ('', ''), ('AAAA', 'CCCC'), ('UCAGG', 'UCAGG')]
+        scorers = [(equality_scorer, -1), (MatchScorer(2,-1), -1),
+            (MatchScorer(1.5,-0.5), -0.75), (MatchScorer(3,-2), -2)]
+        for first, second in pairs:
+            for scorer, gap in scorers:
+                orig = NeedlemanWunschMatrix(first, second, scorer, gap)
+                new = ArrayNeedlemanWunschMatrix(first, second, scorer, gap)
+                self.assertEqual(new.alignment(), orig.alignment())
+                self.assertEqual(new.MaxScore, orig.MaxScore)
+
+    def test_alignment_float(self):
+        """ArrayNeedlemanWunschMatrix should handle non-integer scores"""
+        m = ArrayNeedlemanWunschMatrix('AGCTAGCT', 'GCTTAG', \
+            MatchScorer(1.5, -0.5), -0.75)
+        self.assertEqual(m.alignment(), ('AGCT-AGCT', '-GCTTAG--'))
+        self.assertFloatEqual(m.MaxScore[0], 4.5)
+
+    def test_alignment_classes(self):
+        """ArrayNeedlemanWunschMatrix should return same class as input"""
+        first, second = ArrayNeedlemanWunschMatrix(Rna('UCAG'), \
+            MutableRna('UAG')).alignment()
+        self.assertEqual(first, 'UCAG')
+        self.assertEqual(second, 'U-AG')
+        assert isinstance(first, RnaSequence)
+        self.assertEqual(str(second), 'U-AG')
+
+class LinearSpaceNeedlemanWunschTests(TestCase):
+    """Tests of the linear-space global alignment."""
+
+    def test_alignment(self):
+        """LinearSpaceNeedlemanWunsch should align without pointer matrix"""
+        m = LinearSpaceNeedlemanWunsch('ACGTT', 'AGT')
+        self.assertEqual(m.alignment(), ('ACGTT', 'A-G-T'))
+        self.assertEqual(m.MaxScore, (1, 3, 5))
+        self.assertEqual(m.Pointers, None)
+        m = LinearSpaceNeedlemanWunsch('', 'ACG')
+        self.assertEqual(m.alignment(), ('---', 'ACG'))
+        self.assertEqual(m.MaxScore, (-3, 3, 0))
+
+    def test_fill_then_alignment(self):
+        """LinearSpaceNeedlemanWunsch alignment should trace back after fill"""
+        m = LinearSpaceNeedlemanWunsch('ACGTT', 'AGT')
+        m.fill()
+        self.assertEqual(m.alignment(), ('ACGTT', 'A-G-T'))
+
+class BandedNeedlemanWunschMatrixTests(TestCase):
+    """Tests of global alignment within a diagonal band."""
+
+    def test_band_limits(self):
+        """band_limits should cover both corners and be clipped to matrix"""
+        self.assertEqual(band_limits(10, 10, 2), (-2, 2))
+        self.assertEqual(band_limits(10, 7, 2), (-2, 5))
+        self.assertEqual(band_limits(7, 10, 2), (-5, 2))
+        self.assertEqual(band_limits(3, 4, 10), (-4, 3))
+        self.assertEqual(band_limits(0, 0, 1), (0, 0))
+
+    def test_fill(self):
+        """BandedNeedlemanWunschMatrix should keep a pointer per diagonal"""
+        m = BandedNeedlemanWunschMatrix('ACGTTA', 'AGTTA', Band=1)
+        m.fill()
+        self.assertEqual(m.Diagonals, (-1, 2))
+        self.assertEqual(m.Pointers.shape, (6, 4))
+        self.assertEqual(list(m.Pointers[0]), [NO_POINTER, NO_POINTER, LEFT, \
+            LEFT])
+        self.assertEqual(m.MaxScore, (4, 5, 6))
+        m.traceback()
+        self.assertEqual(m.alignment(), ('ACGTTA', 'A-GTTA'))
+        self.assertEqual(m.TouchedEdge, False)
+
+    def test_fill_then_alignment(self):
+        """BandedNeedlemanWunschMatrix alignment should trace back after fill"""
+        m = BandedNeedlemanWunschMatrix('ACGTT', 'AGT', Band=2)
+        m.fill()
+        self.assertEqual(m.alignment(), ('ACGTT', 'A-G-T'))
+        self.assertEqual(m.TouchedEdge, False)
+
+    def test_wide_band(self):
+        """BandedNeedlemanWunschMatrix should match full matrix if band wide"""
+        pairs = [('ACGTT', 'AGT'), ('AGCTAGCT', 'GCTTAG'), ('', 'ACG'),
+            ('ACG', ''), ('', ''), ('AAAA', 'CCCC'), ('GATTACAGATTACA', 
+            'GTACTTGACA')]
+        scorers = [(equality_scorer, -1), (MatchScorer(2,-1), -1),
+            (MatchScorer(1.5,-0.5), -0.75)]
+        for first, second in pairs:
+            for scorer, gap in scorers:
+                full = ArrayNeedlemanWunschMatrix(first, second, scorer, gap)
+                banded = BandedNeedlemanWunschMatrix(first, second, scorer, \
+                    gap, Band=max(len(first), len(second)))
+                self.assertEqual(banded.alignment(), full.alignment())
+                self.assertEqual(banded.MaxScore, full.MaxScore)
+                self.assertEqual(banded.TouchedEdge, False)
+
+    def test_touched_edge(self):
+        """BandedNeedlemanWunschMatrix should report reaching the band edge"""
+        first = 'ACGTAGGCTAGCTTACGATCGATCG'
+        second = 'ACGTAGGCTAGCTTAGATCGATCG'
+        self.assertEqual(nw_align(first, second, return_score=True, band=2),\
+            (nw_align(first, second, return_score=True), False))
+        #shifting one sequence forces the alignment to the band edge
+        first = 'TTTTTTACGTAGGCTAGCTTACGATCG'
+        second = 'ACGTAGGCTAGCTTACGATCGGGGGGG'
+        alignment, score = nw_align(first, second, return_score=True)
+        result, touched = nw_align(first, second, return_score=True, band=3)
+        self.assertEqual(touched, True)
+        assert result[1] < score
+        self.assertEqual(nw_align(first, second, return_score=True, \
+            band=6), ((alignment, score), True))
+        self.assertEqual(nw_align(first, second, return_score=True, \
+            band=7), ((alignment, score), False))
+
+    def test_affine(self):
+        """BandedNeedlemanWunschMatrix should refuse affine gaps"""
+        m = BandedNeedlemanWunschMatrix('ACG', 'AG', GapExtend=-1)
+        self.assertRaises(ValueError, m.fill)
+
+class ArraySmithWatermanMatrixTests(TestCase):
+    """Tests of the array-based local alignment matrix."""
+
+    def test_alignment(self):
+        """ArraySmithWatermanMatrix should find best local alignment"""
+        m = ArraySmithWatermanMatrix('GGTTACGTTAA', 'TACGAT')
+        self.assertEqual(m.alignment(), ('TACG', 'TACG'))
+        self.assertEqual(m.MaxScore, (4, 4, 7))
+        m = ArraySmithWatermanMatrix('AGCTAGCT', 'GCTTAG', \
+            MatchScorer(2,-1), -1)
+        self.assertEqual(m.alignment(), ('GCT-AG', 'GCTTAG'))
+        self.assertEqual(m.MaxScore, (9, 6, 6))
+
+    def test_fill_then_alignment(self):
+        """ArraySmithWatermanMatrix alignment should trace back after fill"""
+        m = ArraySmithWatermanMatrix('GGTTACGTTAA', 'TACGAT')
+        m.fill()
+        self.assertEqual(m.alignment(), ('TACG', 'TACG'))
+
+    def test_alignment_no_match(self):
+        """ArraySmithWatermanMatrix should return empty alignment if no match"""
+        m = ArraySmithWatermanMatrix('AAAA', 'CCCC')
+        self.assertEqual(m.alignment(), ('', ''))
+        self.assertEqual(m.MaxScore, (0, 0, 0))
+        self.assertEqual(m.Pointers, [[0]*5]*5)
+
+class affineGapTests(TestCase):
+    """Tests of global and local alignment with affine gaps."""
+
+    def setUp(self):
+        """Define a corpus of random sequence pairs and scoring schemes."""
+        r = Random(1)
+        self.pairs = [('', ''), ('', 'ACG'), ('ACG', ''), ('A', 'A'),
+            ('AAAA', 'CCCC'), ('ACGTTTTACG', 'ACGACG')]
+        for i in range(30):
+            self.pairs.append((
+                ''.join([r.choice('ACGT') for j in range(r.randint(1, 25))]),
+                ''.join([r.choice('ACGT') for j in range(r.randint(1, 25))])))
+        #(scorer, gap open, gap extend): includes float scores and an open 
+        #penalty smaller than the extension penalty
+        self.scorers = [(MatchScorer(1, -1), -3, -1), 
+            (MatchScorer(2, -1), -5, -2), (MatchScorer(1.5, -0.5), -2.25, -0.5),
+            (MatchScorer(1, -1), -1, -2), (MatchScorer(1, -1), -1, -1)]
+
+    def _check(self, (first, second), alignment, score, local):
+        """Checks that alignment is part of first and second with score."""
+        aln_1, aln_2 = alignment
+        self.assertEqual(len(aln_1), len(aln_2))
+        if local:
+            assert aln_1.replace('-', '') in first
+            assert aln_2.replace('-', '') in second
+        else:
+            self.assertEqual(aln_1.replace('-', ''), first)
+            self.assertEqual(aln_2.replace('-', ''), second)
+        return score
+
+    def _rescore(self, alignment, scorer, gap, gap_extend):
+        """Returns affine score of an alignment given as two strings.
+
+        Adjacent gaps in the same sequence count as one run, which only
+        matches the alignment score if gap_extend is at least gap.
+        """
+        total = 0
+        prev = None
+        for x, y in zip(*alignment):
+            if x == '-' or y == '-':
+                curr = x == '-'
+                if curr == prev:
+                    total += gap_extend
+                else:
+                    total += gap
+            else:
+                curr = None
+                total += scorer(x, y)
+            prev = curr
+        return total
+
+    def test_nw_affine(self):
+        """nw_align with gap_extend should match the reference scores"""
+        for pair in self.pairs:
+            for scorer, gap, gap_extend in self.scorers:
+                alignment, score = nw_align(pair[0], pair[1], scorer, gap, \
+                    return_score=True, gap_extend=gap_extend)
+                self._check(pair, alignment, score, False)
+                self.assertFloatEqual(score, gotoh_score(pair[0], pair[1], \
+                    scorer, gap, gap_extend))
+                if gap <= gap_extend:
+                    self.assertFloatEqual(self._rescore(alignment, scorer, \
+                        gap, gap_extend), score)
+
+    def test_sw_affine(self):
+        """sw_align with gap_extend should match the reference scores"""
+        for pair in self.pairs:
+            for scorer, gap, gap_extend in self.scorers:
+                alignment, score = sw_align(pair[0], pair[1], scorer, gap, \
+                    return_score=True, gap_extend=gap_extend)
+                self._check(pair, alignment, score, True)
+                self.assertFloatEqual(score, gotoh_score(pair[0], pair[1], \
+                    scorer, gap, gap_extend, local=True))
+                if gap <= gap_extend:
+                    self.assertFloatEqual(self._rescore(alignment, scorer, \
+                        gap, gap_extend), score)
+
+    def test_affine_same_as_linear(self):
+        """affine gaps with gap_extend equal to gap should act as linear"""
+        for first, second in self.pairs:
+            self.assertEqual(nw_align(first, second, gap=-1, gap_extend=-1, \
+                return_score=True), nw_align(first, second, gap=-1, \
+                return_score=True))
+            self.assertEqual(sw_align(first, second, gap=-1, gap_extend=-1, \
+                return_score=True), sw_align(first, second, gap=-1, \
+                return_score=True))
+
+    def test_affine_prefers_one_long_gap(self):
+        """affine gaps should join gaps into one run where it pays"""
+        self.assertEqual(nw_align('ACGTTTTACG', 'ACGACG', MatchScorer(1,-1), \
+            -3, gap_extend=-1), ('ACGTTTTACG', 'ACG----ACG'))
+        m = ArrayNeedlemanWunschMatrix('ACGTTTTACG', 'ACGACG', \
+            MatchScorer(1,-1), -3, GapExtend=-1)
+        m.fill()
+        self.assertEqual(m.MaxScore, (0, 6, 10))
+        self.assertEqual(list(m.Pointers[0][:3]), [NO_POINTER, LEFT, \
+            LEFT + EXTEND_LEFT])
+        self.assertEqual(list(m.Pointers[:,0][:3]), [NO_POINTER, UP, \
+            UP + EXTEND_UP])
+
+    def test_affine_linear_space(self):
+        """nw_align should refuse linear space with affine gaps"""
+        self.assertRaises(ValueError, nw_align, 'ACG', 'AG', \
+            linear_space=True, gap_extend=-1)
+
+class SubstitutionScorerTests(TestCase):
+    """Tests of scoring with a substitution matrix."""
+
+    def setUp(self):
+        """Define a small substitution matrix."""
+        self.matrix = {'A':{'A':4, 'R':-1, 'N':-2},
+            'R':{'A':-1, 'R':5, 'N':0},
+            'N':{'A':-2, 'R':0, 'N':6}}
+        self.pairs = [('', ''), ('', 'ARN'), ('ARNNA', 'RNA'), 
+            ('AAARRRNNN', 'NNNRRRAAA'), ('NARRANARNRA', 'RANNARANA')]
+
+    def _function(self, matrix):
+        """Returns scorer that calls a function for each pair."""
+        return lambda x, y: matrix[x][y]
+
+    def test_init(self):
+        """SubstitutionScorer should build score array from 2D dict"""
+        s = SubstitutionScorer(self.matrix)
+        self.assertEqual(s.Order, ['A', 'N', 'R'])
+        self.assertEqual(s.Scores, [[4,-2,-1,0],[-2,6,0,0],[-1,0,5,0],
+            [0,0,0,0]])
+        self.assertEqual(s.Table, s.Scores)
+        self.assertEqual(s.Exact, True)
+        self.assertEqual(s('A', 'R'), -1)
+        self.assertRaises(KeyError, s, 'A', 'X')
+        self.assertEqual(SubstitutionScorer(self.matrix, Default=-3)('X', \
+            'A'), -3)
+
+    def test_init_lower_triangle(self):
+        """SubstitutionScorer should fill in missing entries by symmetry"""
+        record = AAIndex2Record('X', 'test', None, None, None, None, None,
+            {'A':{'A':4.0, 'R':None}, 'R':{'A':-1.5, 'R':5.0}})
+        s = SubstitutionScorer(record)
+        self.assertEqual(s.Scores, [[4,-1.5,0],[-1.5,5,0],[0,0,0]])
+        self.assertEqual(s.Exact, False)
+        #integral floats should give exact integer scores
+        record.Data['R']['A'] = -1.0
+        s = SubstitutionScorer(record)
+        self.assertEqual(s.Exact, True)
+        self.assertEqual(s('A', 'R'), -1)
+        self.assertRaises(ValueError, SubstitutionScorer, {'A':{'R':1}})
+
+    def test_encode(self):
+        """SubstitutionScorer encode should give index of each symbol"""
+        s = SubstitutionScorer(self.matrix)
+        self.assertEqual(s.encode('NRA'), [1,2,0])
+        self.assertEqual(s.encode(list('NRA')), [1,2,0])
+        self.assertEqual(s.encode(''), [])
+        self.assertRaises(KeyError, s.encode, 'NXA')
+        self.assertRaises(KeyError, s.encode, list('NXA'))
+        s = SubstitutionScorer(self.matrix, Default=0)
+        self.assertEqual(s.encode('NXA'), [1,3,0])
+        self.assertEqual(s.encode(list('NXA')), [1,3,0])
+
+    def test_align(self):
+        """Alignment with SubstitutionScorer should match function scorer"""
+        s = SubstitutionScorer(self.matrix)
+        f = self._function(self.matrix)
+        for first, second in self.pairs:
+            self.assertEqual(nw_align(first, second, s, -4, True), \
+                nw_align(first, second, f, -4, True))
+            self.assertEqual(sw_align(first, second, s, -4, True), \
+                sw_align(first, second, f, -4, True))
+            self.assertEqual(nw_align(first, second, s, -6, True, \
+                gap_extend=-1), nw_align(first, second, f, -6, True, \
+                gap_extend=-1))
+            self.assertEqual(nw_score(first, second, s, -4), \
+                nw_align(first, second, f, -4, True)[1])
+            self.assertEqual(sw_score(second, first, s, -4), \
+                sw_align(second, first, f, -4, True)[1])
+
+class scoreOnlyTests(TestCase):
+    """Tests of nw_score and sw_score."""
+
+    def setUp(self):
+        """Define sequence pairs and scoring schemes."""
+        r = Random(2)
+        self.pairs = [('', ''), ('', 'ACG'), ('ACG', ''), ('AAAA', 'CCCC'), 
+            ('ACGTT', 'AGT'), ('AGT', 'ACGTT')]
+        for i in range(20):
+            self.pairs.append((
+                ''.join([r.choice('ACGT') for j in range(r.randint(1, 20))]),
+                ''.join([r.choice('ACGT') for j in range(r.randint(1, 20))])))
+        def asymmetric(x, y):
+            """Scores x against y differently from y against x."""
+            if x == y:
+                return 2
+            elif x < y:
+                return -1
+            return -3
+        self.scorers = [(equality_scorer, -1), (MatchScorer(1.5,-0.5), -0.75),
+            (asymmetric, -2)]
+
+    def test_nw_score(self):
+        """nw_score should match the score from nw_align"""
+        for first, second in self.pairs:
+            for scorer, gap in self.scorers:
+                self.assertFloatEqual(nw_score(first, second, scorer, gap), \
+                    nw_align(first, second, scorer, gap, True)[1])
+                self.assertFloatEqual(nw_score(first, second, scorer, gap, \
+                    gap_extend=gap/2), nw_align(first, second, scorer, gap, \
+                    True, gap_extend=gap/2)[1])
+
+    def test_sw_score(self):
+        """sw_score should match the score from sw_align"""
+        for first, second in self.pairs:
+            for scorer, gap in self.scorers:
+                self.assertFloatEqual(sw_score(first, second, scorer, gap), \
+                    sw_align(first, second, scorer, gap, True)[1])
+                self.assertFloatEqual(sw_score(first, second, scorer, gap, \
+                    gap_extend=gap/2), sw_align(first, second, scorer, gap, \
+                    True, gap_extend=gap/2)[1])
+
+class antidiagonalTests(TestCase):
+    """Tests of anti-diagonal local alignment scoring and scanning."""
+
+    def setUp(self):
+        """Define some sequences to scan."""
+        self.subjects = ['TTTT', 'GGACGTTAC', '', 'ACGTT', 'CAGT', 'ACGTTACG',
+            'GGACGTTAC']
+
+    def test_sw_score_antidiagonal(self):
+        """sw_score_antidiagonal should match sw_score"""
+        r = Random(5)
+        pairs = [('', ''), ('', 'ACG'), ('A', 'A'), ('AAAA', 'CCCC')]
+        for i in range(30):
+            pairs.append((
+                ''.join([r.choice('ACGT') for j in range(r.randint(1, 25))]),
+                ''.join([r.choice('ACGT') for j in range(r.randint(1, 25))])))
+        scorers = [(equality_scorer, -1, None), (MatchScorer(2,-1), -3, -1),
+            (MatchScorer(1.5,-0.5), -0.75, None), 
+            (MatchScorer(1.5,-0.5), -2.25, -0.5)]
+        for first, second in pairs:
+            for scorer, gap, gap_extend in scorers:
+                codes_1, codes_2, table, exact = encode_pair(first, second, \
+                    scorer, gap, gap_extend)
+                self.assertFloatEqual(sw_score_antidiagonal(codes_1, \
+                    codes_2, table, gap, gap_extend, exact), sw_score(first, \
+                    second, scorer, gap, gap_extend))
+
+    def test_sw_scan(self):
+        """sw_scan should return best hits in order, earliest first on ties"""
+        self.assertEqual(sw_scan('ACGTTAC', self.subjects, top=3), \
+            [(7, 1), (7, 5), (7, 6)])
+        self.assertEqual(sw_scan('ACGTTAC', iter(self.subjects), top=5), \
+            [(7, 1), (7, 5), (7, 6), (5, 3), (2, 0)])
+        self.assertEqual(sw_scan('ACGTTAC', self.subjects, top=None), \
+            [(7, 1), (7, 5), (7, 6), (5, 3), (2, 0), (2, 4), (0, 2)])
+        self.assertEqual(sw_scan('ACGTTAC', [], top=3), [])
+        self.assertEqual(sw_scan('ACGTTAC', self.subjects, gap=-2, \
+            gap_extend=-1, top=1), [(7, 1)])
+
+class all_pairs_align_tests(TestCase):
+    """Tests of the all_pairs_align function."""
+
+    def setUp(self):
+        """Define some sequences."""
+        self.seqs = ['ACGTT', 'AGT', 'GATTACA', '', 'ACGTTA']
+        self.pairs = [(i, j) for i in range(5) for j in range(i+1, 5)]
+
+    def test_condensed(self):
+        """all_pairs_align should give upper triangle of pair scores"""
+        seqs = self.seqs
+        self.assertEqual(all_pairs_align(seqs, condensed=True), \
+            [nw_score(seqs[i], seqs[j]) for i, j in self.pairs])
+        self.assertEqual(all_pairs_align(seqs, MatchScorer(2, -1), -2, \
+            local=True, condensed=True), [sw_score(seqs[i], seqs[j], \
+            MatchScorer(2, -1), -2) for i, j in self.pairs])
+        self.assertEqual(all_pairs_align(seqs, gap=-3, gap_extend=-1, \
+            condensed=True), [nw_score(seqs[i], seqs[j], gap=-3, \
+            gap_extend=-1) for i, j in self.pairs])
+        self.assertEqual(all_pairs_align([], condensed=True), [])
+        self.assertEqual(all_pairs_align(['A'], condensed=True), [])
+
+    def test_distance_matrix(self):
+        """all_pairs_align should give DistanceMatrix labeled by key"""
+        seqs = dict(zip('abcde', self.seqs))
+        result = all_pairs_align(seqs, diagonal=1e305)
+        self.assertEqual(result.RowOrder, list('abcde'))
+        self.assertEqual(result['a']['b'], nw_score('ACGTT', 'AGT'))
+        self.assertEqual(result['b']['a'], nw_score('ACGTT', 'AGT'))
+        self.assertEqual(result['c']['c'], 1e305)
+        result = all_pairs_align(self.seqs)
+        self.assertEqual(result.RowOrder, range(5))
+        self.assertEqual(result[4][2], nw_score('GATTACA', 'ACGTTA'))
+
+    def test_transform_progress(self):
+        """all_pairs_align should apply transform and report progress"""
+        def distance(score, first, second):
+            return max(len(first), len(second)) - score
+        calls = []
+        def progress(done, total):
+            calls.append((done, total))
+        seqs = self.seqs
+        self.assertEqual(all_pairs_align(seqs, transform=distance, \
+            progress=progress, condensed=True), [distance(nw_score(seqs[i], \
+            seqs[j]), seqs[i], seqs[j]) for i, j in self.pairs])
+        self.assertEqual(calls, [(4, 10), (7, 10), (9, 10), (10, 10)])
+
+    def test_workers(self):
+        """all_pairs_align should give same result with several workers"""
+        r = Random(4)
+        seqs = [''.join([r.choice('ACGT') for j in range(r.randint(0, 30))]) \
+            for i in range(12)]
+        calls = []
+        def progress(done, total):
+            calls.append(done)
+        self.assertEqual(all_pairs_align(seqs, workers=3, progress=progress, \
+            condensed=True), all_pairs_align(seqs, condensed=True))
+        self.assertEqual(calls[-1], 66)
+
+class profile_align_tests(TestCase):
+    """Tests of profile_align and the column scorers."""
+
+    def one_hot(self, seq):
+        """Returns profile array with a 1 for each character of seq."""
+        if not seq:
+            return zeros((0, 4), Float64)
+        return array([[float(c == i) for i in 'ACGT'] for c in seq])
+
+    def test_dot_column_scores(self):
+        """dot_column_scores should give match chance for each pair"""
+        first = array([[0.5, 0.5, 0, 0], [0, 0, 0, 1]])
+        second = array([[1, 0, 0, 0], [0.5, 0, 0, 0.5], [0, 0, 1, 0]])
+        self.assertFloatEqual(dot_column_scores(first, second), \
+            [[0.5, 0], [0.25, 0.5], [0, 0]])
+
+    def test_log_odds_column_scores(self):
+        """LogOddsColumnScorer should give log odds, at least min_score"""
+        first = self.one_hot('AC')
+        second = self.one_hot('A')
+        self.assertFloatEqual(LogOddsColumnScorer()(first, second), \
+            [[log(4), -10]])
+        self.assertFloatEqual(LogOddsColumnScorer([0.5, 0.25, 0.125, \
+            0.125], -3)(first, second), [[log(2), -3]])
+
+    def test_profile_align(self):
+        """profile_align of one-hot profiles should match nw_align"""
+        scorer = MatchScorer(1, 0)
+        for seq_1, seq_2 in [('ACGTT', 'AGT'), ('GATTACA', 'GCATGCT'), \
+            ('', 'ACG'), ('ACG', '')]:
+            mapping, score = profile_align(self.one_hot(seq_1), \
+                self.one_hot(seq_2), return_score=True)
+            self.assertFloatEqual(score, nw_score(seq_1, seq_2, scorer))
+            aligned_1 = ''.join([i is None and '-' or seq_1[i] for i, j \
+                in mapping])
+            aligned_2 = ''.join([j is None and '-' or seq_2[j] for i, j \
+                in mapping])
+            self.assertEqual((aligned_1, aligned_2), nw_align(seq_1, seq_2, \
+                scorer))
+        self.assertEqual(profile_align(self.one_hot('ACGTT'), \
+            self.one_hot('AGT')), [(0, 0), (1, None), (2, 1), (3, None), \
+            (4, 2)])
+
+    def test_profile_align_affine(self):
+        """profile_align should use affine gaps and accept Profile objects"""
+        class profile(object):
+            def __init__(self, Data):
+                self.Data = Data
+        seq_1, seq_2 = 'ACGTTTTACG', 'ACGACG'
+        mapping, score = profile_align(profile(self.one_hot(seq_1)), \
+            profile(self.one_hot(seq_2)), -3, gap_extend=-1, \
+            return_score=True)
+        self.assertFloatEqual(score, nw_score(seq_1, seq_2, MatchScorer(1, \
+            0), -3, gap_extend=-1))
+        self.assertEqual(mapping, [(0, 0), (1, 1), (2, 2), (3, None), \
+            (4, None), (5, None), (6, None), (7, 3), (8, 4), (9, 5)])
+
+    def test_profile_align_float(self):
+        """profile_align of frequency profiles should find the best score"""
+        rand = Random(7)
+        def random_profile(length):
+            rows = []
+            for i in range(length):
+                row = [rand.random() for c in 'ACGT']
+                rows.append([x / sum(row) for x in row])
+            return array(rows, Float64)
+        gap = -0.37
+        for length_1, length_2 in [(6, 6), (9, 5), (4, 11), (12, 12)]:
+            first = random_profile(length_1)
+            second = random_profile(length_2)
+            table = dot_column_scores(first, second)
+            scorer = lambda i, j: table[j][i]
+            best = gotoh_score(range(length_1), range(length_2), scorer, \
+                gap, gap)
+            mapping, score = profile_align(first, second, gap, \
+                return_score=True)
+            self.assertFloatEqual(score, best)
+            mapping_score = 0
+            for i, j in mapping:
+                if i is None or j is None:
+                    mapping_score += gap
+                else:
+                    mapping_score += table[j][i]
+            self.assertFloatEqual(mapping_score, best)
+            #a profile aligned to itself should line up every column
+            self.assertEqual(profile_align(first, first, gap), \
+                [(i, i) for i in range(length_1)])
+
+class alignFunctionTests(TestCase):
+    """Tests of the nw_align and sw_align convenience functions."""
+
+    def test_nw_align(self):
+        """nw_align should return global alignment and optionally score"""
+        self.assertEqual(nw_align('ACGTT', 'AGT'), ('ACGTT', 'A-G-T'))
+        self.assertEqual(nw_align('ACGTT', 'AGT', return_score=True), \
+            (('ACGTT', 'A-G-T'), 1))
+        self.assertEqual(nw_align(list('ACG'), list('AG')), \
+            (list('ACG'), list('A-G')))
+
+    def test_nw_align_linear_space(self):
+        """nw_align should use linear space when asked or above threshold"""
+        self.assertEqual(nw_align('ACGTT', 'AGT', return_score=True, \
+            linear_space=True), (('ACGTT', 'A-G-T'), 1))
+        import old_cogent.align.algorithm as algorithm
+        orig_threshold = algorithm.linear_space_threshold
+        try:
+            algorithm.linear_space_threshold = 10
+            self.assertEqual(nw_align('ACGTT', 'AGT', return_score=True), \
+                (('ACGTT', 'A-G-T'), 1))
+        finally:
+            algorithm.linear_space_threshold = orig_threshold
+
+    def test_sw_align(self):
+        """sw_align should return local alignment and optionally score"""
+        self.assertEqual(sw_align('TTACGTT', 'ACG'), ('ACG', 'ACG'))
+        self.assertEqual(sw_align('TTACGTT', 'ACG', return_score=True), \
+            (('ACG', 'ACG'), 3))
+
+if __name__ == '__main__':
+    main()
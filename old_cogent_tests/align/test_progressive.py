@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#file cogent_tests/align/test_progressive.py
+
+"""Unit tests for progressive multiple alignment in cogent.align.progressive.
+"""
+from old_cogent.util.unit_test import TestCase, main
+from old_cogent.base.sequence import Rna, RnaSequence
+from old_cogent.base.align import Alignment
+from old_cogent.align.algorithm import MatchScorer, nw_align, encode_symbols,\
+    score_table
+from old_cogent.align.progressive import self_score, score_distance, \
+    guide_tree, _leaf_group, merge_groups, progressive_align
+
+class progressiveTests(TestCase):
+    """Tests of the progressive alignment functions."""
+
+    def setUp(self):
+        """Define a small family of sequences."""
+        self.family = {'a':'ACGTACGTTA', 'b':'ACGTACGTA', 'c':'ACGACGTTA',
+            'd':'TTGCATGCA', 'e':'TTGCATCA'}
+
+    def test_self_score(self):
+        """self_score should score sequence against itself"""
+        self.assertEqual(self_score('ACG'), 3)
+        self.assertEqual(self_score('ACG', MatchScorer(2, -1)), 6)
+        self.assertEqual(self_score(''), 0)
+
+    def test_score_distance(self):
+        """score_distance should be 0 for identical sequences"""
+        self.assertEqual(score_distance(4, 'ACGT', 'ACGT'), 0)
+        self.assertEqual(score_distance(1, 'ACGT', 'AGT'), 1 - 1/3.5)
+        self.assertEqual(score_distance(-3, '', 'ACG'), 1 - -3/1.5)
+        self.assertEqual(score_distance(0, '', ''), 1)
+
+    def test_guide_tree(self):
+        """guide_tree should cluster similar sequences together"""
+        seqs = ['ACGTACGT', 'TTTTGGGG', 'ACGTACGA', 'TTTTGGGC']
+        tree = guide_tree(seqs)
+        groups = [[tip.Data for tip in child.TerminalDescendants] for child \
+            in tree.Children]
+        groups = map(sorted, groups)
+        groups.sort()
+        self.assertEqual(groups, [[0, 2], [1, 3]])
+        self.assertEqual(guide_tree(['ACG']).Data, 0)
+
+    def test_merge_groups(self):
+        """merge_groups of single sequences should match nw_align"""
+        symbols, codes = encode_symbols('ACGT')
+        table = score_table(MatchScorer(1, -1), symbols, symbols, -1)[0]
+        lookup = dict(zip(symbols, range(4)))
+        first = _leaf_group(0, [lookup[i] for i in 'ACGTT'], 4)
+        second = _leaf_group(1, [lookup[i] for i in 'AGT'], 4)
+        members, positions, counts = merge_groups(first, second, table, -1)
+        self.assertEqual(members, [0, 1])
+        self.assertEqual(map(list, positions), [[0, 1, 2, 3, 4], \
+            [0, -1, 1, -1, 2]])
+        self.assertEqual(counts, [[2,0,0,0], [0,1,0,0], [0,0,2,0], [0,0,0,1],
+            [0,0,0,2]])
+
+    def test_progressive_align_pair(self):
+        """progressive_align of two sequences should match nw_align"""
+        pairs = [('ACGTT', 'AGT'), ('AGCTAGCT', 'GCTTAG'), ('AAAA', 'CCCC'),
+            ('', 'ACG')]
+        for first, second in pairs:
+            result = progressive_align([first, second])
+            self.assertEqual((result[0], result[1]), nw_align(first, second))
+
+    def test_progressive_align(self):
+        """progressive_align should align family, keeping names and order"""
+        result = progressive_align(self.family)
+        assert isinstance(result, Alignment)
+        self.assertEqual(result.RowOrder, list('abcde'))
+        lengths = dict.fromkeys([len(seq) for seq in result.values()])
+        self.assertEqual(len(lengths), 1)
+        for name, seq in result.items():
+            self.assertEqual(seq.replace('-', ''), self.family[name])
+        self.assertEqual(result, {'a':'ACGTACGTTA', 'b':'ACGTACG-TA',
+            'c':'ACG-ACGTTA', 'd':'TTGCATGC-A', 'e':'TTGCAT-C-A'})
+
+    def test_progressive_align_float(self):
+        """progressive_align should give best alignments with float scores"""
+        scorer = MatchScorer(1.1, -0.9)
+        for first, second in [('ACGTT', 'AGT'), ('AGCTAGCT', 'GCTTAG'), \
+            ('GATTACAGATTACA', 'GCATGCTTACA')]:
+            result = progressive_align([first, second], scorer, -1.3)
+            self.assertEqual((result[0], result[1]), nw_align(first, \
+                second, scorer, -1.3))
+        #scaling the scores shouldn't change the alignment
+        self.assertEqual(progressive_align(self.family, scorer, -1.3), \
+            progressive_align(self.family, MatchScorer(11, -9), -13))
+
+    def test_progressive_align_unhashable(self):
+        """progressive_align should align sequences of unhashable items"""
+        first, second = [[1],[2],[3]], [[1],[3]]
+        result = progressive_align([first, second])
+        self.assertEqual((result[0], result[1]), nw_align(first, second))
+        self.assertEqual(result[1], [[1], '-', [3]])
+        result = progressive_align([first, second, [[2],[3]]])
+        self.assertEqual(result[0], first)
+        self.assertEqual(result[2], ['-', [2], [3]])
+
+    def test_progressive_align_tree(self):
+        """progressive_align should return guide tree labeled by name"""
+        result, tree = progressive_align(self.family, return_tree=True)
+        self.assertEqual(sorted([tip.Data for tip in \
+            tree.TerminalDescendants]), list('abcde'))
+        result, tree = progressive_align({'x':'ACG'}, return_tree=True)
+        self.assertEqual(result, {'x':'ACG'})
+        self.assertEqual(tree.Data, 'x')
+        self.assertEqual(progressive_align([]), {})
+
+    def test_progressive_align_classes(self):
+        """progressive_align should keep sequence classes and gap symbol"""
+        result = progressive_align([Rna('UCAG'), Rna('UAG')], gap_symbol='.')
+        self.assertEqual(result[1], 'U.AG')
+        assert isinstance(result[1], RnaSequence)
+
+    def test_progressive_align_workers(self):
+        """progressive_align should give same result with several workers"""
+        self.assertEqual(progressive_align(self.family, workers=2), \
+            progressive_align(self.family))
+
+if __name__ == '__main__':
+    main()
@@ -21,7 +21,7 @@ from old_cogent.base.alphabet import DnaAlphabet, RnaAlphabet
 from old_cogent.align.weights.util import Weights, number_of_pseudo_seqs,\
     pseudo_seqs_exact, pseudo_seqs_monte_carlo, row_to_vote, distance_matrix,\
     eigenvector_for_largest_eigenvalue, DNA_ORDER,RNA_ORDER,PROTEIN_ORDER,\
-    SeqToProfile,AlnToProfile, distance_to_closest
+    SeqToProfile,AlnToProfile, distance_to_closest, unique_distance_matrix
 
 
 class WeightsTests(TestCase):
@@ -95,6 +95,17 @@ class UtilTests(TestCase):
         a_exp = array([[0,1,2],[1,0,2],[2,2,0]])
         self.assertEqual(distance_matrix(a),a_exp)
 
+    def test_unique_distance_matrix(self):
+        """unique_distance_matrix should compare distinct rows once"""
+        a = Alignment({0:'ABC',1:'BCC',2:'ABC',3:'BAC'},RowOrder=[1,0,2,3])
+        distances, unique, counts, row_map = unique_distance_matrix(a)
+        self.assertEqual(distances, array([[0,2,1],[2,0,2],[1,2,0]]))
+        self.assertEqual(unique.RowOrder, [1,0,3])
+        self.assertEqual(counts, {1:1,0:2,3:1})
+        self.assertEqual(row_map, {0:0,1:1,2:0,3:3})
+        self.assertEqual(distance_matrix(a), array([[0,2,2,1],[2,0,0,2],
+            [2,0,0,2],[1,2,2,0]]))
+
     def test_eigenvector_for_largest_eigenvalue(self):
         """eigenvector_for_largest_eigenvalue: No idea how to test this"""
         pass
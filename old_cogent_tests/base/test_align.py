@@ -25,7 +25,8 @@ to_fasta and updated tests for omitGapCols
 """
 
 from old_cogent.util.unit_test import TestCase, main
-from old_cogent.base.align import Alignment, make_gap_filter
+from old_cogent.base.align import Alignment, DenseAlignment, make_gap_filter, \
+    eps, KmerIndex, kmer_counts
 from old_cogent.base.sequence import Rna, RnaSequence, frac_same
 from old_cogent.base.stats import Freqs, Numbers
 from old_cogent.base.alphabet import *
@@ -607,6 +608,71 @@ class AlignmentTests(TestCase):
                 'c':{'a':2/7.0,'b':3/7.0,'c':7/7.0},
             })
 
+    def test_distanceMatrix_batch(self):
+        """Alignment distanceMatrix should give same result with batch f"""
+        unbatched = lambda x, y: RnaSequence.fracSameNonGaps(x, y)
+        gaps = Alignment({'a':Rna('aaa-aaa'), 'b':Rna('a--a-ag'), 
+            'c':Rna('aa-----')})
+        for aln in [gaps, self.many, self.empty]:
+            self.assertEqual(aln.distanceMatrix(RnaSequence.fracSameNonGaps),
+                aln.distanceMatrix(unbatched))
+            self.assertEqual(aln.distanceMatrix(RnaSequence.distance),
+                aln.distanceMatrix(lambda x, y: RnaSequence.distance(x, y)))
+
+    def test_getSimilar_batch(self):
+        """Alignment getSimilar should give same result with batch metric"""
+        aln = self.many
+        for low, high in [(0.4, 0.7), (0.95, 1), (0, 0.2), (0.75, 0.85)]:
+            self.assertEqual(aln.getSimilar(aln['a'], low, high, 
+                RnaSequence.fracDiffNonGaps), aln.getSimilar(aln['a'], low, 
+                high, lambda x, y: RnaSequence.fracDiffNonGaps(x, y)))
+
+    def test_uniqueRows(self):
+        """Alignment uniqueRows should group identical rows of same class"""
+        aln = Alignment({'a':'ACG', 'b':'ACC', 'c':'ACG', 'd':Rna('ACG'),
+            'e':'ACC'}, RowOrder=list('edcba'))
+        unique, counts, row_map = aln.uniqueRows()
+        self.assertEqual(unique, {'e':'ACC', 'd':'ACG', 'c':'ACG'})
+        self.assertEqual(unique.RowOrder, ['e', 'd', 'c'])
+        self.assertEqual(counts, {'e':2, 'd':1, 'c':2})
+        self.assertEqual(row_map, {'a':'c', 'b':'e', 'c':'c', 'd':'d', 
+            'e':'e'})
+        lists = Alignment({'x':list('AC'), 'y':list('AC')}, \
+            RowOrder=['x', 'y'])
+        unique, counts, row_map = lists.uniqueRows()
+        self.assertEqual((unique, counts), ({'x':list('AC')}, {'x':2}))
+        self.assertEqual(self.empty.uniqueRows(), ({}, {}, {}))
+
+    def test_distanceMatrix_duplicates(self):
+        """Alignment distanceMatrix should compare identical rows once"""
+        calls = []
+        def f(x, y):
+            calls.append((x, y))
+            return len(x) * 10 + frac_same(x, y)
+        aln = Alignment({'a':'AC', 'b':'AG', 'c':'AC', 'd':'AC'})
+        expected = {}
+        for i in aln:
+            expected[i] = {}
+            for j in aln:
+                expected[i][j] = f(aln[i], aln[j])
+        calls[:] = []
+        self.assertEqual(aln.distanceMatrix(f), expected)
+        self.assertEqual(len(calls), 4)
+
+    def test_getSimilar_duplicates(self):
+        """Alignment getSimilar should compare identical rows once"""
+        calls = []
+        def metric(x, y):
+            calls.append(y)
+            return frac_same(x, y)
+        aln = Alignment({'a':'AC', 'b':'AG', 'c':'AC', 'd':'AC'})
+        self.assertEqual(aln.getSimilar('AC', 0.6, metric=metric), 
+            {'a':'AC', 'c':'AC', 'd':'AC'})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(aln.getSimilar('AC', 0.4, 0.6, metric=metric, 
+            transform=lambda x: x[1:]), {})
+        self.assertEqual(len(calls), 4)
+
     def test_IUPACConsensus_RNA(self):
         """Alignment IUPACConsensus should use RNA IUPAC symbols correctly"""
         alignmentUpper = Alignment( ['UCAGN-UCAGN-UCAGN-UCAGAGCAUN-',
@@ -810,6 +876,27 @@ class AlignmentTests(TestCase):
         obs = aln.uncertainties('abcdefghijklmnop')
         self.assertFloatEqual(obs, [2.0] * 3)
 
+    def test_sitePatterns(self):
+        """Alignment.sitePatterns should find distinct columns and counts"""
+        aln = Alignment({'a':'ACAGA', 'b':'AGAGA'}, RowOrder=['b', 'a'])
+        patterns, counts, site_map = aln.sitePatterns()
+        self.assertEqual(patterns, {'a':list('ACG'), 'b':list('AGG')})
+        self.assertEqual(patterns.RowOrder, ['b', 'a'])
+        self.assertEqual(counts, [3, 1, 1])
+        self.assertEqual(site_map, [0, 1, 0, 2, 0])
+        patterns, counts, site_map = self.empty.sitePatterns()
+        self.assertEqual((counts, site_map), ([], []))
+
+    def test_columnFrequencies_repeats(self):
+        """Alignment.columnFrequencies should give repeated columns copies"""
+        aln = Alignment(['AAGA', 'ACGA'])
+        freqs = aln.columnFrequencies()
+        self.assertEqual(freqs, map(Freqs, aln.Cols))
+        assert freqs[0] is not freqs[3]
+        freqs[0]['A'] = 5
+        self.assertEqual(freqs[3], Freqs('AA'))
+        self.assertEqual(aln.columnFrequencies(len), [2, 2, 2, 2])
+
     def test_omitRowsTemplate(self):
         """Alignment.omitRowsTemplate returns new aln with well-aln to temp"""
         aln = self.omitRowsTemplate_aln
@@ -872,6 +959,200 @@ class AlignmentTests(TestCase):
         self.assertEqual(ik,int_keys)
         self.assertEqual(im,int_map)
 
+class DenseAlignmentTests(TestCase):
+    """Tests that DenseAlignment gives the same results as Alignment."""
+
+    def setUp(self):
+        """Define data for alignments of several kinds"""
+        self.data = [
+            {'a':Rna('ucag-cagu'), 'b':Rna('uc-gucag.'), 'c':Rna('---gucAGN')},
+            {'a':'ACGT', 'b':'AC-T'},
+            {'a':list('ACGT'), 'b':list('AC-T')},
+            {'a':'ACGT', 'b':'AC'},
+            {}]
+
+    def test_array(self):
+        """DenseAlignment Array should hold byte values in RowOrder"""
+        aln = DenseAlignment({'x':'AC', 'y':'GT'}, RowOrder=['y', 'x'])
+        self.assertEqual(map(list, aln.Array), [[71, 84], [65, 67]])
+        aln.RowOrder = ['x', 'y']
+        self.assertEqual(map(list, aln.Array), [[65, 67], [71, 84]])
+        aln['x'] = 'CC'
+        self.assertEqual(map(list, aln.Array), [[67, 67], [71, 84]])
+        del aln['x']
+        aln.RowOrder = ['y']
+        self.assertEqual(map(list, aln.Array), [[71, 84]])
+        self.assertEqual(DenseAlignment({'a':'AC', 'b':'A'}).Array, None)
+        self.assertEqual(DenseAlignment({'a':list('AC')}).Array, None)
+
+    def test_same_as_alignment(self):
+        """DenseAlignment column methods should match Alignment"""
+        for data in self.data:
+            aln = Alignment(data)
+            dense = DenseAlignment(data, RowOrder=aln.RowOrder)
+            if not (aln and aln.isRagged()):
+                self.assertEqual(list(dense.Cols), list(aln.Cols))
+                self.assertEqual(list(dense.iterCols([2, 0, -1])), \
+                    list(aln.iterCols([2, 0, -1])))
+                for cols in [[0, 2], [], [-1, 1]]:
+                    for negate in [False, True]:
+                        result = dense.getCols(cols, negate)
+                        assert isinstance(result, DenseAlignment)
+                        self.assertEqual(result, aln.getCols(cols, negate))
+                self.assertEqual(dense.getCols([1], row_constructor=''.join),
+                    aln.getCols([1], row_constructor=''.join))
+                self.assertEqual(dense.omitGapCols(0.5), aln.omitGapCols(0.5))
+                for constructor in [Freqs, len]:
+                    self.assertEqual(dense.columnFrequencies(constructor), \
+                        aln.columnFrequencies(constructor))
+                self.assertEqual(dense.majorityConsensus(str), \
+                    aln.majorityConsensus(str))
+            else:
+                self.assertRaises(IndexError, list, dense.Cols)
+                self.assertRaises(IndexError, list, aln.Cols)
+
+    def test_gap_filters(self):
+        """DenseAlignment gap filters should match Alignment exactly"""
+        data = self.data[:2] + [{'a':'A--C~-', 'b':'---G-.', 'c':'AC-GU.',
+            'd':Rna('.--G-U'), 'e':'A---~~'}]
+        for d in data:
+            aln = Alignment(d)
+            dense = DenseAlignment(d, RowOrder=aln.RowOrder)
+            for frac in [0, 0.3, 0.5, 1 - eps, 1]:
+                result = dense.omitGapCols(frac)
+                assert isinstance(result, DenseAlignment)
+                self.assertEqual(result, aln.omitGapCols(frac))
+                self.assertEqual(dense.omitGapRows(frac), \
+                    aln.omitGapRows(frac))
+                for bad_frac in [0, 0.2, 0.5, 1]:
+                    self.assertEqual(dense.omitGapCols(frac, True, bad_frac), \
+                        aln.omitGapCols(frac, True, bad_frac))
+            for run in [-1, 0, 1, 2, 3, 10]:
+                self.assertEqual(dense.omitGapRuns(run), aln.omitGapRuns(run))
+        ragged = DenseAlignment({'a':'A--C', 'b':'A-'})
+        self.assertEqual(ragged.omitGapRuns(1), {'b':'A-'})
+
+    def test_columnCounts(self):
+        """DenseAlignment columnCounts should count symbols, reset on change"""
+        aln = DenseAlignment({'a':'AC-', 'b':'AGA', 'c':'CG-'}, \
+            RowOrder='abc')
+        symbols, counts = aln.columnCounts()
+        self.assertEqual(symbols, ['-', 'A', 'C', 'G'])
+        self.assertEqual(counts.tolist(), [[0,2,1,0], [0,0,1,2], [2,1,0,0]])
+        assert aln.columnCounts() is aln.columnCounts()
+        aln['c'] = 'AAA'
+        self.assertEqual(aln.columnCounts()[1].tolist(), [[0,3,0,0], \
+            [0,1,1,1], [1,2,0,0]])
+        self.assertEqual(DenseAlignment({'a':list('AC')}).columnCounts(), None)
+        freqs = list(aln.iterColumnFrequencies())
+        self.assertEqual(freqs, aln.columnFrequencies())
+        assert isinstance(freqs[0], Freqs)
+
+    def test_column_stats(self):
+        """DenseAlignment consensus and uncertainties should match Alignment"""
+        data = self.data[:2] + [{'a':'UCAGGA', 'b':'UCAGGC', 'c':'CAAGUU',
+            'd':'AGAG-U'}, {'a':'UAC', 'b':'CAG'}]
+        for d in data:
+            aln = Alignment(d)
+            dense = DenseAlignment(d, RowOrder=aln.RowOrder)
+            for transform in [None, str, list]:
+                self.assertEqual(dense.majorityConsensus(transform), \
+                    aln.majorityConsensus(transform))
+            try:
+                expected = aln.IUPACConsensus()
+            except KeyError:
+                self.assertRaises(KeyError, dense.IUPACConsensus)
+            else:
+                self.assertEqual(dense.IUPACConsensus(), expected)
+            self.assertEqual(dense.columnProbs(), aln.columnProbs())
+            for good_items in [None, 'ACGU', 'A', 'X']:
+                self.assertFloatEqual(dense.uncertainties(good_items), \
+                    aln.uncertainties(good_items))
+        dense = DenseAlignment(data[2])
+        dense.ColumnFrequencies = [Freqs('AAC')]
+        self.assertEqual(dense.majorityConsensus(), ['A'])
+
+    def test_sitePatterns(self):
+        """DenseAlignment sitePatterns should match Alignment"""
+        for d in self.data[:3]:
+            aln = Alignment(d)
+            dense = DenseAlignment(d, RowOrder=aln.RowOrder)
+            result = dense.sitePatterns()
+            assert isinstance(result[0], DenseAlignment)
+            self.assertEqual(result, aln.sitePatterns())
+
+    def test_getCols_index_error(self):
+        """DenseAlignment getCols should raise IndexError like Alignment"""
+        dense = DenseAlignment({'a':'ACGT', 'b':'AC-T'})
+        self.assertRaises(IndexError, dense.getCols, [4])
+        self.assertRaises(IndexError, list, dense.iterCols([-5]))
+
+class KmerIndexTests(TestCase):
+    """Tests of KmerIndex and its use by getSimilar."""
+
+    def setUp(self):
+        """Define an alignment with a few families of rows"""
+        self.aln = Alignment({'a':'ACGUACGUAC', 'b':'ACGUACGUAA', 
+            'c':'ACGUUCGUAC', 'd':'UUUUGGGGCC', 'e':'UUUUGGGGCA', 'f':'AC',
+            'g':''})
+
+    def test_kmer_counts(self):
+        """kmer_counts should count overlapping k-mers"""
+        self.assertEqual(kmer_counts('AAAC', 2), {'AA':2, 'AC':1})
+        self.assertEqual(kmer_counts(list('ACA'), 2), {('A','C'):1, 
+            ('C','A'):1})
+        self.assertEqual(kmer_counts('AC', 3), {})
+
+    def test_sharedCounts(self):
+        """KmerIndex sharedCounts should count k-mers shared with target"""
+        index = KmerIndex(self.aln, 3)
+        self.assertEqual(index.RowOrder, self.aln.RowOrder)
+        shared = index.sharedCounts('ACGUACG').tolist()
+        for key, count in zip(index.RowOrder, shared):
+            row_counts = kmer_counts(self.aln[key], 3)
+            target_counts = kmer_counts('ACGUACG', 3)
+            self.assertEqual(count, sum([min(n, target_counts.get(kmer, 0))
+                for kmer, n in row_counts.items()]))
+
+    def test_candidates(self):
+        """KmerIndex candidates should keep every row that can be similar"""
+        index = KmerIndex(self.aln, 3)
+        target = 'ACGUACGUAC'
+        for min_similarity in [0, 0.1, 0.5, 0.7, 0.8, 0.9, 1, 1.1]:
+            candidates = index.candidates(target, min_similarity)
+            for key in self.aln.RowOrder:
+                if frac_same(target, self.aln[key]) >= min_similarity:
+                    assert key in candidates
+        self.assertEqualItems(index.candidates(target, 0.8), ['a', 'b', 
+            'c', 'f'])
+        self.assertEqual(index.candidates(target, 0), self.aln.RowOrder)
+
+    def test_getSimilar_index(self):
+        """Alignment getSimilar should give same result with KmerIndex"""
+        aln = self.aln
+        targets = aln.values() + ['ACGU', 'UUUUGGGGCCAAA', Rna('ACGUACGUAC')]
+        for k in [1, 2, 4]:
+            index = KmerIndex(aln, k)
+            for target in targets:
+                for low, high in [(0, 1), (0.5, 1), (0.8, 0.95), (1, 1)]:
+                    for metric in [frac_same, RnaSequence.fracSame]:
+                        self.assertEqual(aln.getSimilar(target, low, high, 
+                            metric, index=index), aln.getSimilar(target, 
+                            low, high, metric))
+        #rows that aren't strings are indexed by item
+        lists = Alignment([('a', list('ACGU')), ('b', list('ACGA')), 
+            ('c', list('UUUU'))])
+        index = KmerIndex(lists, 2)
+        self.assertEqual(index.sharedCounts(list('ACGG')).tolist(), [2,2,0])
+        self.assertEqual(lists.getSimilar(list('ACGG'), 0.7, index=index), 
+            {'a':list('ACGU'), 'b':list('ACGA')})
+        self.assertRaises(ValueError, KmerIndex, aln, 30)
+        #index is not used for other metrics
+        index = KmerIndex(aln, 2)
+        self.assertEqual(aln.getSimilar('ACGUACGUAC', 0.7, 
+            metric=RnaSequence.fracDiff, index=index), {'d':'UUUUGGGGCC', 
+            'e':'UUUUGGGGCA'})
+
 #run tests if invoked from command line
 if __name__ == '__main__':
     main()
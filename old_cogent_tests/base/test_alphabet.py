@@ -23,7 +23,7 @@ tests for degenerateFromSequence.
 """
 
 from old_cogent.base.alphabet import AminoAcids, Monomer, MatchMaker, PairMaker, \
-    Alphabet, DnaAlphabet, RnaAlphabet, ProteinAlphabet
+    Alphabet, DnaAlphabet, RnaAlphabet, ProteinAlphabet, mark_table
 from old_cogent.util.unit_test import TestCase, main
 from sets import ImmutableSet
 
@@ -499,6 +499,51 @@ class AlphabetTests(TestCase):
         self.assertEqual(gm(end_gaps), ({0:0,1:1},{0:0,1:1}))
         self.assertEqual(gm(mid_gaps), ({0:2,1:5,2:7,3:8},{2:0,5:1,7:2,8:3}))
         
+    def test_encode_decode(self):
+        """Alphabet encode should give one-byte codes that decode back"""
+        a = RnaAlphabet
+        self.assertEqual(list(a.encode('UCAG')), [0, 1, 2, 3])
+        self.assertEqual(a.Codes[:4], 'UCAG')
+        self.assertEqual(len(a.Codes), 256)
+        codes = a.encode('ucag-N#jz')
+        assert max(codes[:-3]) < a.NumSymbols
+        assert min(codes[-3:]) >= a.NumSymbols
+        self.assertEqual(a.decode(codes), 'ucag-N#jz')
+        self.assertEqual(list(a.encode('')), [])
+        self.assertEqual(a.IsGapCode[a.encode('-')[0]], 1)
+        self.assertEqual(a.IsGapCode[a.encode('A')[0]], 0)
+        self.assertEqual(a.IsDegenerateCode[a.encode('n')[0]], 1)
+
+    def test_gapMapArrays(self):
+        """Alphabet gapMapArrays should return arrays like gapMaps dicts"""
+        gm = RnaAlphabet.gapMapArrays
+        gapped, ungapped = gm('--a--b-cd---')
+        self.assertEqual(list(gapped), [2,5,7,8])
+        self.assertEqual(list(ungapped), [-1,-1,0,-1,-1,1,-1,2,3,-1,-1,-1])
+        gapped, ungapped = gm('')
+        self.assertEqual((list(gapped), list(ungapped)), ([], []))
+        gapped, ungapped = gm(list('a-a'))
+        self.assertEqual((list(gapped), list(ungapped)), ([0,2], [0,-1,1]))
+
+    def test_mark_table(self):
+        """mark_table should mark single chars in symbols, or the others"""
+        t = mark_table({'a':1, 'b':1, 'cd':1})
+        self.assertEqual('abcdx'.translate(t), '\x01\x01\x00\x00\x00')
+        t = mark_table('ab', inverse=True)
+        self.assertEqual('abcdx'.translate(t), '\x00\x00\x01\x01\x01')
+
+    def test_string_tuple_agree(self):
+        """Alphabet methods should give same results for strings and tuples"""
+        for a in [RnaAlphabet, ProteinAlphabet, Alphabet(Monomers={'A':1}, \
+            Gaps=dict.fromkeys('!@#$%'))]:
+            for seq in ['', 'ACGU', '-AcGu--nNRy?x*!Z', '---', 'xx-@!a']:
+                for method in ['firstGap', 'firstDegenerate', 'firstInvalid',
+                    'firstNonStrict', 'firstNonValidStrict', 'gapList', 
+                    'gapVector', 'gapMaps', 'countGaps', 'countDegenerate',
+                    'isValid', 'isStrict', 'isGapped']:
+                    f = getattr(a, method)
+                    self.assertEqual(f(seq), f(tuple(seq)))
+
     def test_countGaps(self):
         """Alphabet countGaps should return correct gap count"""
         c = RnaAlphabet.countGaps
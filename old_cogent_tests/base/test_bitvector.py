@@ -23,7 +23,9 @@ from old_cogent.base.bitvector import is_nonzero_string_char, is_nonzero_char, \
     num_to_bitstring, bitcount, Bitvector, MutableBitvector, \
     ImmutableBitvector, VectorFromCases, VectorFromMatches, VectorFromRuns, \
     VectorFromSpans, VectorFromPositions, PackedBases, \
-    LongBitvector, ShortBitvector
+    LongBitvector, ShortBitvector, PackedSequence, save_packed, load_packed
+from tempfile import mktemp
+from os import remove
 import re
 
 class bitvectorTests(TestCase):
@@ -1047,7 +1049,67 @@ class PackedBasesTests(TestCase):
         r = PackedBases('CAAG')
         self.assertEqual((r^q).bitcount(), 1)
         
-    
+class PackedSequenceTests(TestCase):
+    """Tests of the PackedSequence class and its file functions."""
+
+    def setUp(self):
+        """Define a sequence with exceptions at odd places"""
+        self.seq = 'NNACGUacguRYN--AAAACCCCGGGGUUUUNNNNNN?'
+
+    def test_init(self):
+        """PackedSequence should pack bases and keep runs of other chars"""
+        p = PackedSequence(self.seq)
+        self.assertEqual(len(p), len(self.seq))
+        self.assertEqual(str(p), self.seq.replace('acgu', 'ACGU'))
+        self.assertEqual(p.Exceptions, [(0, 2, 'N'), (10, 11, 'R'), \
+            (11, 12, 'Y'), (12, 13, 'N'), (13, 15, '-'), (31, 37, 'N'), \
+            (37, 38, '?')])
+        self.assertEqual(str(PackedSequence('')), '')
+        self.assertEqual(str(PackedSequence('ACGTTT', Rna=False)), 'ACGTTT')
+        self.assertEqual(str(PackedSequence('ACGTTT')), 'ACGUUU')
+
+    def test_getitem(self):
+        """PackedSequence slices should match slices of the string"""
+        expected = self.seq.replace('acgu', 'ACGU')
+        p = PackedSequence(self.seq)
+        for start in range(len(expected) + 1):
+            for end in range(start - 1, len(expected) + 2):
+                self.assertEqual(p[start:end], expected[start:end])
+        self.assertEqual(p[4], 'G')
+        self.assertEqual(p[-1], '?')
+        self.assertEqual(p[::3], expected[::3])
+        self.assertRaises(IndexError, p.__getitem__, len(expected))
+
+    def test_getitem_negative(self):
+        """PackedSequence slices with negative bounds should match strings"""
+        seq = 'ACGUNNACGU'
+        p = PackedSequence(seq)
+        self.assertEqual(p[-15:-3], seq[-15:-3])
+        self.assertEqual(p[-15:-12], seq[-15:-12])
+        self.assertEqual(p[-15:], seq[-15:])
+        self.assertEqual(p[:-15], seq[:-15])
+        for start in range(-13, 13):
+            for end in range(-13, 13):
+                self.assertEqual(p[start:end], seq[start:end])
+
+    def test_save_load(self):
+        """load_packed should read back sequences from save_packed"""
+        filename = mktemp()
+        seqs = {'a':self.seq, 'b':'', 'c':PackedSequence('ACGT', Rna=False),
+            'd':'ACGU' * 1000 + 'N'}
+        try:
+            save_packed(seqs, filename)
+            result = load_packed(filename)
+        finally:
+            remove(filename)
+        self.assertEqual(sorted(result.keys()), list('abcd'))
+        self.assertEqual(str(result['a']), str(PackedSequence(self.seq)))
+        self.assertEqual(result['a'][13:33], self.seq[13:33])
+        self.assertEqual(str(result['b']), '')
+        self.assertEqual(str(result['c']), 'ACGT')
+        self.assertEqual(result['d'][3998:], 'GUN')
+        self.assertEqual(len(result['d']), 4001)
+
 #main loop of program
 if __name__ == "__main__":
     main()
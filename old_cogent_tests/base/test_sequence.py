@@ -22,7 +22,11 @@ from old_cogent.base.sequence import SequenceI, Sequence, RnaSequence, DnaSequen
     Rna, Dna, Protein, \
     RnaUngapped, DnaUngapped, ProteinUngapped, \
     MutableRna, MutableDna, MutableProtein, \
-    MutableRnaUngapped, MutableDnaUngapped, MutableProteinUngapped
+    MutableRnaUngapped, MutableDnaUngapped, MutableProteinUngapped, \
+    EncodedSequence, EncodedRnaSequence, EncodedDnaSequence, \
+    EncodedProteinSequence, encode_seqs, frac_same_many, frac_diff_many, \
+    frac_same_non_gaps_many, frac_diff_non_gaps_many, frac_similar_many, \
+    distance_many, pairwise_matrix, frac_same
 from old_cogent.util.misc import ConstraintError, Delegator, ConstrainedList, \
     ConstrainedString, FunctionWrapper
 from old_cogent.base.alphabet import RnaAlphabet, DnaAlphabet, ProteinAlphabet
@@ -755,6 +759,132 @@ class MutableSequenceTests(TestCase):
         else:
             self.fail('Failed to prevent addition of bad item')
 
+class EncodedSequenceTests(TestCase):
+    """Tests of the EncodedSequence classes."""
+    def setUp(self):
+        """Define some sequences"""
+        self.gapped = EncodedRnaSequence(Rna('-ucAG--gnN-'))
+        self.ungapped = EncodedRnaSequence('UCAGUAC')
+        self.bad = EncodedRnaSequence('UCxx-AG')
+        self.empty = EncodedRnaSequence('')
+
+    def test_init(self):
+        """EncodedSequence should encode strings, sequences and arrays"""
+        self.assertEqual(str(self.gapped), '-ucAG--gnN-')
+        self.assertEqual(str(EncodedRnaSequence(MutableRna('UC-A'))), 'UC-A')
+        self.assertEqual(list(self.ungapped.Data), [0,1,2,3,0,2,1])
+        self.assertEqual(str(EncodedRnaSequence(self.ungapped.Data[:3])),'UCA')
+        self.assertEqual(EncodedRnaSequence(self.ungapped).Data, \
+            self.ungapped.Data)
+        self.assertEqual(str(self.bad), 'UCxx-AG')
+        self.assertEqual(len(self.empty), 0)
+        self.assertRaises(TypeError, EncodedSequence, 'UCAG')
+
+    def test_sequence_interface(self):
+        """EncodedSequence should index, slice and compare like a string"""
+        s = self.ungapped
+        self.assertEqual(len(s), 7)
+        self.assertEqual(s[2], 'A')
+        self.assertEqual(s[-1], 'C')
+        self.assertEqual(s[1:4], 'CAG')
+        assert isinstance(s[1:4], EncodedRnaSequence)
+        self.assertEqual(list(s), list('UCAGUAC'))
+        self.assertEqual(s, 'UCAGUAC')
+        self.assertEqual(s, RnaSequence('UCAGUAC'))
+        self.assertNotEqual(s, 'UCAG')
+
+    def test_getslice_negative(self):
+        """EncodedSequence slices with negative bounds should match strings"""
+        seq = 'UCAGUACGGA'
+        s = EncodedRnaSequence(seq)
+        self.assertEqual(s[-15:-3], seq[-15:-3])
+        self.assertEqual(s[-15:-12], seq[-15:-12])
+        self.assertEqual(s[-15:], seq[-15:])
+        self.assertEqual(s[:-15], seq[:-15])
+        for start in range(-13, 13):
+            for end in range(-13, 13):
+                self.assertEqual(str(s[start:end]), seq[start:end])
+
+    def test_toSequence(self):
+        """EncodedSequence toSequence should return Sequence of right class"""
+        r = Rna('ucag')
+        r.Info.Name = 'x'
+        result = EncodedRnaSequence(r).toSequence()
+        self.assertEqual(result, 'ucag')
+        assert isinstance(result, RnaSequence)
+        self.assertEqual(result.Info.Name, 'x')
+        result = EncodedDnaSequence('TTAG').toSequence()
+        assert isinstance(result, DnaSequence)
+        result = EncodedProteinSequence('MKW').toSequence()
+        assert isinstance(result, ProteinSequence)
+
+    def test_gaps(self):
+        """EncodedSequence gap methods should match Sequence methods"""
+        for seq in ['-ucAG--gnN-', 'UCAGUAC', 'UCxx-AG', '', '---']:
+            e = EncodedRnaSequence(seq)
+            r = RnaSequence(seq)
+            self.assertEqual(e.countGaps(), r.countGaps())
+            self.assertEqual(e.gapVector(), r.gapVector())
+            self.assertEqual(e.gapList(), r.gapList())
+            self.assertEqual(e.isGapped(), r.isGapped())
+            self.assertEqual(e.countDegenerate(), r.countDegenerate())
+            self.assertEqual(e.isValid(), r.isValid())
+            degapped = e.degap()
+            assert isinstance(degapped, EncodedRnaSequence)
+            self.assertEqual(degapped, r.degap())
+
+class BatchDistanceTests(TestCase):
+    """Tests of the batch versions of the SequenceI distance methods."""
+    def setUp(self):
+        """Define sequences of different lengths, with gaps"""
+        self.seqs = map(RnaSequence, ['UCAGG-U', 'UCA', '', '--A-GGUUC', 
+            'ucagg-u', 'UUUUUUUUUUUU', '-------', 'NCAGG.U'])
+
+    def test_encode_seqs(self):
+        """encode_seqs should give padded byte array and lengths"""
+        data, lengths = encode_seqs(['AC', 'ACG', ''])
+        self.assertEqual(list(lengths), [2, 3, 0])
+        self.assertEqual(map(list, data), [[65, 67, 0], [65, 67, 71], \
+            [0, 0, 0]])
+        data, lengths = encode_seqs([])
+        self.assertEqual(list(lengths), [])
+
+    def test_batch_methods(self):
+        """batch functions should match the per-pair SequenceI methods"""
+        similar = {('U','C'):1, ('C','U'):1, ('A','G'):1, ('G','A'):1, 
+            ('U','U'):1, ('C','C'):1, ('A','A'):1, ('G','G'):1}
+        weights = {'U':1, 'C':2, 'A':3, 'G':4}
+        def weighted(x, y):
+            return weights.get(x, 0) * weights.get(y, 0.5)
+        data, lengths = encode_seqs(self.seqs)
+        for target in self.seqs:
+            for batch_f, method, args in [
+                (frac_same_many, RnaSequence.fracSame, ()),
+                (frac_diff_many, RnaSequence.fracDiff, ()),
+                (frac_same_non_gaps_many, RnaSequence.fracSameNonGaps, ()),
+                (frac_diff_non_gaps_many, RnaSequence.fracDiffNonGaps, ()),
+                (frac_similar_many, RnaSequence.fracSimilar, (similar,)),
+                (distance_many, RnaSequence.distance, ()),
+                (distance_many, RnaSequence.distance, (weighted,))]:
+                self.assertEqual(list(batch_f(target, data, lengths, *args)), 
+                    [method(target, other, *args) for other in self.seqs])
+
+    def test_gaps(self):
+        """gap-aware batch functions should use gaps if supplied"""
+        data, lengths = encode_seqs(['A.A-', 'AAAA'])
+        self.assertEqual(list(frac_same_non_gaps_many('AAAA', data, lengths, 
+            {'.':1})), [2/3.0, 1])
+        self.assertEqual(list(frac_diff_non_gaps_many(Rna('AAAA'), data, 
+            lengths)), [1/3.0, 0])
+
+    def test_pairwise_matrix(self):
+        """pairwise_matrix should give batch function for each pair"""
+        result = pairwise_matrix(self.seqs, frac_same_many)
+        for i, first in enumerate(self.seqs):
+            for j, second in enumerate(self.seqs):
+                self.assertEqual(result[i, j], frac_same(first, second))
+        self.assertEqual(pairwise_matrix([], frac_diff_many).shape, (0, 0))
+
 class SequenceCleanerTests(TestCase):
     """Tests of some of the products of the SequenceCleaner factory function."""
     def setUp(self):
@@ -39,7 +39,8 @@ branchlengths set to None are ignored
 2/8/06 Rob Knight: added tests for attrTable and friends.
 """
 from copy import copy, deepcopy
-from old_cogent.base.tree import TreeNode, TreeError, DuplicateNodeError, PhyloNode
+from old_cogent.base.tree import TreeNode, TreeError, DuplicateNodeError, \
+    PhyloNode, CompactTree, LcaIndex
 from old_cogent.parse.tree import DndParser
 from old_cogent.util.unit_test import TestCase, main
 from Numeric import array, resize, sqrt
@@ -659,6 +660,38 @@ class TreeNodeTests(TestCase):
         self.assertEqual([i.Data for i in r.traverse(False, False)], \
             ['d','e','g','h'])
 
+    def test_traverse_deep(self):
+        """TreeNode traverse should work on trees deeper than recursion limit"""
+        node = TreeNode('x')
+        for i in range(5000):
+            node = TreeNode(i, [node, TreeNode('y')])
+        self.assertEqual(len(list(node.traverse(True, True))), 15001)
+        self.assertEqual(len(node.TerminalDescendants), 5001)
+        self.assertEqual(node.TerminalDescendants[0].Data, 'x')
+        self.assertEqual(list(node.postorder())[-2].Data, 'y')
+
+    def test_traverse_changes(self):
+        """TreeNode traverse should see changes to children not yet visited"""
+        r = self.TreeRoot
+        seen = []
+        for node in r.traverse():
+            seen.append(node.Data)
+            if node.Data == 'b':
+                self.TreeNode['h'].append(TreeNode('x'))
+            if node.Data == 'c':
+                node.removeNode(self.TreeNode['f'])
+        self.assertEqual(seen, list('abcdehx'))
+
+    def test_walks(self):
+        """TreeNode preorder, postorder, levelorder, iterTips should work"""
+        r = self.TreeRoot
+        self.assertEqual([i.Data for i in r.preorder()], list('abcdefgh'))
+        self.assertEqual([i.Data for i in r.postorder()], list('degfcbha'))
+        self.assertEqual([i.Data for i in r.levelorder()], list('abhcdefg'))
+        self.assertEqual([i.Data for i in r.iterTips()], list('degh'))
+        self.assertEqual([i.Data for i in self.Single.iterTips()], ['a'])
+        self.assertEqual([i.Data for i in self.Single.levelorder()], ['a'])
+
     def test_Siblings(self):
         """TreeNode Siblings should return all siblings, not self"""
         self.assertEqual(self.Empty.Siblings, [])
@@ -1008,6 +1041,26 @@ class PhyloNodeTests(TestCase):
         self.assertEqual(h.distance(g), 10)
         self.assertEqual(h.distance(h), 0)
 
+    def test_tipToTipDistances(self):
+        """PhyloNode tipToTipDistances should match distance for all tips"""
+        tree = self.TreeRoot
+        result = tree.tipToTipDistances()
+        self.assertEqual(result.RowOrder, list('degh'))
+        self.assertEqual(result['d'], {'d':0, 'e':5, 'g':6, 'h':6})
+        self.assertEqual(result['g']['e'], 9)
+        self.assertEqual(result['h']['g'], 10)
+        for first in tree.TerminalDescendants:
+            for second in tree.TerminalDescendants:
+                self.assertEqual(result[first.Data][second.Data], \
+                    first.distance(second))
+        self.assertEqual(tree.tipToTipDistances(condensed=True), \
+            [5, 6, 6, 9, 9, 10])
+        self.assertEqual(tree.tipToTipDistances(block_size=3), result)
+        self.assertEqual(tree.tipToTipDistances(True, 1), [5, 6, 6, 9, 9, 10])
+        self.assertEqual(self.TreeNode['c'].tipToTipDistances(True), \
+            [5, 6, 9])
+        self.assertEqual(self.TreeNode['h'].tipToTipDistances(), {'h':{'h':0}})
+
     def test_str(self):
         """PhyloNode str should give expected results"""
         nodes, tree = self.TreeNode, self.TreeRoot
@@ -1066,6 +1119,154 @@ class PhyloNodeTests(TestCase):
         tree.collapseNode(c)
         self.assertEqual(str(tree), '((d:4,e:7,g:8)b:0,h:2)a')
 
+class CompactTreeTests(TestCase):
+    """Tests of the array-backed CompactTree."""
+    def setUp(self):
+        """Creates a standard tree and its CompactTree"""
+        self.TreeRoot = DndParser(
+            '((a:1,(b:2,c:3)d:4)e:5,f,(g:0,h:1.5)i:2)j;', PhyloNode)
+        self.Compact = CompactTree.fromTreeNode(self.TreeRoot)
+
+    def test_init(self):
+        """CompactTree should number nodes in preorder from parent list"""
+        c = CompactTree([2, 2, -1, 1, None, 4], list('abcdef'))
+        self.assertEqual(len(c), 4)
+        self.assertEqual(c.Data, list('cabd'))
+        self.assertEqual(c.Order, [2, 0, 1, 3])
+        self.assertEqual(c.Parent, [-1, 0, 0, 2])
+        self.assertEqual(c.FirstChild, [1, -1, 3, -1])
+        self.assertEqual(c.NextSibling, [-1, 2, -1, -1])
+        self.assertEqual(c.End, [4, 2, 4, 4])
+        self.assertEqual(c.HasBranchLength, [0, 0, 0, 0])
+        self.assertRaises(TreeError, CompactTree, [-1, -1])
+        self.assertRaises(TreeError, CompactTree, [1, 0])
+
+    def test_fromTreeNode(self):
+        """CompactTree.fromTreeNode should keep data and branch lengths"""
+        c = self.Compact
+        self.assertEqual(c.Data, list('jeadbcfigh'))
+        self.assertEqual(c.BranchLength, [0, 5, 1, 4, 2, 3, 0, 2, 0, 1.5])
+        self.assertEqual(c.HasBranchLength, [0, 1, 1, 1, 1, 1, 0, 1, 1, 1])
+        self.assertEqual(c.NodeClass, PhyloNode)
+        c = CompactTree.fromTreeNode(DndParser('(a,b)c;', TreeNode))
+        self.assertEqual(c.NodeClass, TreeNode)
+        self.assertEqual(c.HasBranchLength, [0, 0, 0])
+
+    def test_toTreeNode(self):
+        """CompactTree.toTreeNode should give back the original tree"""
+        c = self.Compact
+        result = c.toTreeNode()
+        assert isinstance(result, PhyloNode)
+        self.assertEqual(str(result), str(self.TreeRoot))
+        self.assertEqual(result[1].BranchLength, None)
+        self.assertEqual(result[2][0].BranchLength, 0)
+        self.assertEqual(str(c.toTreeNode(3)), '(b:2.0,c:3.0)d')
+        tree = DndParser('((a,b)c,(d)e)f;', TreeNode)
+        result = CompactTree.fromTreeNode(tree).toTreeNode()
+        assert not isinstance(result, PhyloNode)
+        self.assertEqual(str(result), str(tree))
+
+    def test_walks(self):
+        """CompactTree walks should match TreeNode walks"""
+        c, tree = self.Compact, self.TreeRoot
+        names = lambda indices: [c.Data[i] for i in indices]
+        for self_before in [True, False]:
+            for self_after in [True, False]:
+                self.assertEqual(names(c.traverse(0, self_before, \
+                    self_after)), [n.Data for n in tree.traverse( \
+                    self_before, self_after)])
+        self.assertEqual(names(c.traverse(3, False, True)), list('bcd'))
+        self.assertEqual(names(c.terminalDescendants()), \
+            [n.Data for n in tree.TerminalDescendants])
+        self.assertEqual(names(c.terminalDescendants(1)), list('abc'))
+        self.assertEqual(c.terminalDescendants(2), [])
+        self.assertEqual(names(c.ancestors(4)), list('dej'))
+        self.assertEqual(c.ancestors(0), [])
+        self.assertEqual(names(c.children(0)), list('efi'))
+        self.assertEqual(c.children(6), [])
+
+class LcaIndexTests(TestCase):
+    """Tests of the LcaIndex class."""
+    def setUp(self):
+        """Creates a standard tree and its LcaIndex"""
+        self.TreeRoot = DndParser(
+            '((a:1,(b:2,c:3)d:4)e:5,f,(g:0,h:1.5)i:2)j;', PhyloNode)
+        self.Nodes = dict([(n.Data, n) for n in self.TreeRoot.traverse()])
+        self.Index = LcaIndex(self.TreeRoot)
+
+    def test_lastCommonAncestor(self):
+        """LcaIndex lastCommonAncestor should match TreeNode version"""
+        nodes, index = self.Nodes, self.Index
+        for first in nodes.values():
+            for second in nodes.values():
+                assert index.lastCommonAncestor(first, second) is \
+                    first.lastCommonAncestor(second)
+        assert index.lastCommonAncestor(nodes['b'], nodes['a']) is nodes['e']
+
+    def test_distance(self):
+        """LcaIndex distance and separation should match PhyloNode versions"""
+        nodes, index = self.Nodes, self.Index
+        for first in nodes.values():
+            for second in nodes.values():
+                self.assertFloatEqual(index.distance(first, second), \
+                    first.distance(second))
+                self.assertEqual(index.separation(first, second), \
+                    first.separation(second))
+        self.assertEqual(index.distance(nodes['b'], nodes['h']), 14.5)
+        self.assertEqual(index.separation(nodes['b'], nodes['h']), 5)
+
+    def test_changes(self):
+        """LcaIndex should be rebuilt when the tree changes"""
+        nodes, index = self.Nodes, self.Index
+        assert index.lastCommonAncestor(nodes['a'], nodes['h']) is nodes['j']
+        nodes['a'].Parent = nodes['i']
+        assert index.lastCommonAncestor(nodes['a'], nodes['h']) is nodes['i']
+        self.assertEqual(index.distance(nodes['a'], nodes['h']), 2.5)
+        nodes['i'].removeNode(nodes['a'])
+        self.assertRaises(TreeError, index.lastCommonAncestor, nodes['a'], \
+            nodes['h'])
+        nodes['h'].BranchLength = 5
+        index.rebuild()
+        self.assertEqual(index.distance(nodes['g'], nodes['h']), 5)
+
+    def test_changes_subtree(self):
+        """LcaIndex should be rebuilt after repeated changes deep in tree"""
+        nodes, index = self.Nodes, self.Index
+        index.lastCommonAncestor(nodes['b'], nodes['c'])
+        nodes['d'].append(PhyloNode('x', BranchLength=1))
+        nodes['d'][-1].append(PhyloNode('y', BranchLength=1))
+        y = nodes['d'][-1][0]
+        assert index.lastCommonAncestor(y, nodes['b']) is nodes['d']
+        self.assertEqual(index.distance(y, nodes['b']), 4)
+        #tokens were cleared to the root by the first change after the rebuild
+        nodes['d'][-1].append(PhyloNode('z'))
+        assert index.lastCommonAncestor(nodes['d'][-1][-1], y) is \
+            nodes['d'][-1]
+        nodes['i'].pop()
+        self.assertRaises(TreeError, index.distance, nodes['h'], y)
+
+    def test_changes_other_tree(self):
+        """LcaIndex should not be rebuilt when a different tree changes"""
+        nodes, index = self.Nodes, self.Index
+        other = DndParser('((a,b)c,(d,e)f)g;', PhyloNode)
+        other_nodes = dict([(n.Data, n) for n in other.traverse()])
+        other_index = LcaIndex(other)
+        built = index.Nodes
+        other_nodes['c'].append(PhyloNode('x'))
+        other_nodes['f'].removeNode(other_nodes['e'])
+        other_nodes['d'].Parent = other_nodes['a']
+        assert index.lastCommonAncestor(nodes['a'], nodes['h']) is nodes['j']
+        assert index.Nodes is built
+        assert other_index.lastCommonAncestor(other_nodes['d'], \
+            other_nodes['b']) is other_nodes['c']
+        assert index.Nodes is built
+        #moving a node between trees changes both
+        nodes['h'].Parent = other_nodes['b']
+        assert index.lastCommonAncestor(nodes['a'], nodes['g']) is nodes['j']
+        assert index.Nodes is not built
+        assert other_index.lastCommonAncestor(nodes['h'], \
+            other_nodes['d']) is other_nodes['c']
+
 #run if called from command line
 if __name__ == '__main__':
     main()
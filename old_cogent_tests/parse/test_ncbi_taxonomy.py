@@ -12,7 +12,7 @@ Originally written by Jason Carnes: last modification 8-4-2003
 from old_cogent.parse.ncbi_taxonomy import MissingParentError, NcbiTaxon, \
     NcbiTaxonParser, NcbiTaxonLookup, NcbiName, NcbiNameParser, \
     NcbiNameLookup, \
-    NcbiTaxonomy, NcbiTaxonNode, NcbiTaxonomyFromFiles
+    NcbiTaxonomy, NcbiTaxonNode, NcbiTaxonomyFromFiles, NcbiCompactTaxonomy
 from old_cogent.util.unit_test import TestCase, main 
 
 good_nodes = '''1\t|\t1\t|\tno rank\t|\t\t|\t8\t|\t0\t|\t1\t|\t0\t|\t0\t|\t0\t|\t0\t|\t0\t|\t\t|
@@ -257,6 +257,49 @@ class NcbiTaxonomyTests(TestCase):
         assert self.tx[9].lastCommonAncestor(self.tx[10]) is self.tx[6]
         assert self.tx[9].lastCommonAncestor(self.tx[1]) is self.tx[1]
 
+class NcbiCompactTaxonomyTests(TestCase):
+    """Tests of the NcbiCompactTaxonomy class."""
+    def setUp(self):
+        self.taxa = NcbiTaxonLookup(NcbiTaxonParser(good_nodes))
+        self.names = NcbiNameLookup(NcbiNameParser(good_names))
+        self.tx = NcbiCompactTaxonomy(self.taxa, self.names)
+
+    def test_init_good(self):
+        """NcbiCompactTaxonomy should hold taxa in CompactTree"""
+        tx = self.tx
+        self.assertEqual(len(tx.ByName), 6)
+        self.assertEqual(len(tx.ById), 6)
+        self.assertEqual(tx.Root, 0)
+        self.assertEqual(tx['root'], 0)
+        self.assertEqual(tx.Tree.Data[tx[10]].Name, 'Fakus namus')
+        self.assertEqual(tx.Deadbeats, {})
+        ids = lambda indices: [tx.Tree.Data[i].TaxonId for i in indices]
+        self.assertEqual(ids(tx.Tree.ancestors(tx['7'])), [6, 2, 1])
+        self.assertEqual(ids(tx.Tree.children(tx[6])), [7, 10])
+        self.assertEqual(ids(tx.Tree.terminalDescendants()), [9, 10])
+        self.assertEqual(ids(tx.getRankedDescendants(0, 'species')), [7, 10])
+
+    def test_toTreeNode(self):
+        """NcbiCompactTaxonomy tree should convert to NcbiTaxonNode tree"""
+        tx = NcbiTaxonomyFromFiles(good_nodes, good_names)
+        root = self.tx.Tree.toTreeNode()
+        assert isinstance(root, NcbiTaxonNode)
+        self.assertEqual([n.TaxonId for n in root.traverse()], \
+            [n.TaxonId for n in tx['root'].traverse()])
+        self.assertEqual(root[0][0].Name, 'Azorhizobium')
+
+    def test_init_bad(self):
+        """NcbiCompactTaxonomy should leave deadbeats out of tree"""
+        taxa = NcbiTaxonLookup(NcbiTaxonParser(bad_nodes))
+        tx = NcbiCompactTaxonomy(taxa, self.names)
+        self.assertEqual(len(tx.Tree), 4)
+        self.assertEqual(len(tx.ById), 4)
+        self.assertEqual(tx.Deadbeats[777].TaxonId, 9)
+        self.assertEqual(tx.Deadbeats[666].TaxonId, 10)
+        self.assertRaises(KeyError, tx.__getitem__, 9)
+        self.assertRaises(MissingParentError, NcbiCompactTaxonomy, taxa, \
+            self.names, strict=True)
+
 class NcbiTaxonNodeTests(TestCase):
     """Tests of the NcbiTaxonNode class.
 
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+#file cogent_tests/parse/test_substitution_matrix.py
+
+"""Unit tests for the substitution matrix parser.
+"""
+from old_cogent.parse.substitution_matrix import SubstitutionMatrixParser
+from old_cogent.parse.record import RecordError
+from old_cogent.util.unit_test import TestCase, main
+
+class SubstitutionMatrixParserTests(TestCase):
+    """Tests of the SubstitutionMatrixParser."""
+
+    def test_empty(self):
+        """SubstitutionMatrixParser should return empty dict for no data"""
+        self.assertEqual(SubstitutionMatrixParser([]), {})
+        self.assertEqual(SubstitutionMatrixParser(['# comment', '  A C']), {})
+
+    def test_matrix(self):
+        """SubstitutionMatrixParser should read rows of scores"""
+        lines = """#  Matrix made by matblas from blosum62.iij
+#  * column uses minimum score
+   A  R  N
+A  4 -1 -2
+
+R -1  5  0
+N -2  0  6
+""".split('\n')
+        self.assertEqual(SubstitutionMatrixParser(lines), {
+            'A':{'A':4, 'R':-1, 'N':-2},
+            'R':{'A':-1, 'R':5, 'N':0},
+            'N':{'A':-2, 'R':0, 'N':6}})
+
+    def test_float_scores(self):
+        """SubstitutionMatrixParser should keep non-integer scores as floats"""
+        result = SubstitutionMatrixParser(['  A  C', 'A 1.5 -1', 'C -1 2'])
+        self.assertEqual(result, {'A':{'A':1.5, 'C':-1}, 'C':{'A':-1, 'C':2}})
+        assert isinstance(result['A']['C'], int)
+        assert isinstance(result['A']['A'], float)
+
+    def test_bad_rows(self):
+        """SubstitutionMatrixParser should raise RecordError on bad rows"""
+        self.assertRaises(RecordError, SubstitutionMatrixParser, \
+            ['  A  C', 'A 1 -1 3'])
+        self.assertRaises(RecordError, SubstitutionMatrixParser, \
+            ['  A  C', 'A 1 x'])
+
+if __name__ == '__main__':
+    main()
@@ -12,7 +12,7 @@ format for PhyloNode.
 11/4/04 Rob Knight: changed PhyloNode tests to reflect the new policy that
 branch lengths are suppressed in the output if they are None.
 """
-from old_cogent.parse.tree import DndTokenizer, DndParser
+from old_cogent.parse.tree import DndTokenizer, DndParser, MultiDndParser
 from old_cogent.parse.record import RecordError
 from old_cogent.base.tree import PhyloNode
 from old_cogent.util.unit_test import TestCase, main
@@ -76,6 +76,17 @@ class DndTokenizerTests(TestCase):
         #try it all in one go
         self.assertEqual(list(DndTokenizer(sample)), exp)
 
+    def test_quotes(self):
+        """DndTokenizer should keep punctuation within quotes in labels"""
+        self.assertEqual(list(DndTokenizer("('a,b (c)':1, d e)x;")), \
+            ['(', "'a,b (c)'", ':', '1', ',', 'd e', ')', 'x', ';'])
+        #text after the last punctuation or an unclosed quote is ignored
+        self.assertEqual(list(DndTokenizer("(a,b)c")), \
+            ['(', 'a', ',', 'b', ')'])
+        self.assertEqual(list(DndTokenizer("(a,'b)c;")), ['(', 'a', ','])
+        self.assertEqual(list(DndTokenizer(['(a,', 'b);'])), \
+            ['(', 'a', ',', 'b', ')', ';'])
+
 
 class DndParserTests(TestCase):
     """Tests of the DndParser factory function."""
@@ -138,6 +149,24 @@ class DndParserTests(TestCase):
         self.assertRaises(RecordError, DndParser, left)
         self.assertRaises(RecordError, DndParser, right)
 
+class MultiDndParserTests(TestCase):
+    """Tests of the MultiDndParser factory function."""
+    def test_trees(self):
+        """MultiDndParser should yield each tree as from DndParser"""
+        lines = [single + double + '\n'] + sample.splitlines(True) + \
+            [nodedata, ';\n', node_data_sample]
+        obs = map(str, MultiDndParser(lines))
+        exp = map(str, map(DndParser, [single, double, sample, nodedata, \
+            node_data_sample]))
+        self.assertEqual(obs, exp)
+        self.assertEqual(map(str, MultiDndParser(['(a,b)c:1'])), ['(a,b)c'])
+        self.assertEqual(list(MultiDndParser(['', '\n'])), [])
+
+    def test_bad(self):
+        """MultiDndParser should fail if parens in a tree unbalanced"""
+        self.assertRaises(RecordError, list, MultiDndParser([single, \
+            '((abc:3);', double]))
+
 class PhyloNodeTests(TestCase):
     """Check that PhyloNode works the way I think"""
     def test_ops(self):